@@ -0,0 +1,6 @@
+"""
+Micro-benchmarks for the todo API.
+
+Each module is runnable on its own, e.g. `python -m benchmarks.toggle`, and
+works against a throwaway database so it never touches db.sqlite3.
+"""
@@ -0,0 +1,95 @@
+"""
+List requests for a user with years of history, before and after
+`archive_todos` moves the old completed todos to the archive table, and with
+`?include_archived=true` afterwards.
+
+    python -m benchmarks.archive [--todos 200000] [--days 1095] [--iterations 50]
+"""
+import argparse
+import datetime
+import random
+
+from .utils import benchmark_database, create_user, summarize, timed
+
+QUERIES = [
+    ("first page", "/todos/"),
+    ("first page, cursor", "/todos/?pagination=cursor"),
+    ("open todos", "/todos/?completed=false"),
+    ("search", "/todos/?search=milk"),
+]
+
+
+def populate(owner, todos, days, batch_size=10000):
+    from django.db import connection, transaction
+    from django.utils import timezone
+
+    from todo.models import Todo
+
+    # Most todos older than a month are done, as in a long-used account.
+    table = connection.ops.quote_name(Todo._meta.db_table)
+    now = timezone.now()
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, todos, batch_size):
+            rows = []
+            for i in range(start, min(start + batch_size, todos)):
+                age = random.randint(0, days)
+                created = connection.ops.adapt_datetimefield_value(
+                    now - datetime.timedelta(days=age, seconds=random.randint(0, 86399))
+                )
+                completed = random.random() < (0.9 if age > 30 else 0.3)
+                title = f"Buy milk {i}" if i % 100 == 0 else f"Todo {i}"
+                rows.append((title, "", completed, created, created, owner.pk))
+            cursor.executemany(
+                f"INSERT INTO {table} (title, description, completed, date_created,"
+                " updated_at, owner_id, version) VALUES (%s, %s, %s, %s, %s, %s, 1)",
+                rows,
+            )
+
+
+def run(client, title, iterations, suffix=""):
+    print(f"\n{title}")
+    for name, url in QUERIES:
+        if suffix:
+            url += ("&" if "?" in url else "?") + suffix
+
+        def get():
+            response = client.get(url)
+            assert response.status_code == 200, response.status_code
+
+        rate, latencies = timed(get, iterations)
+        summarize(name, rate, latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--todos", type=int, default=200_000)
+    parser.add_argument("--days", type=int, default=3 * 365)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    with benchmark_database():
+        from django.test import override_settings
+        from rest_framework.test import APIClient
+
+        from todo.archive import archive_todos
+        from todo.models import ArchivedTodo, Todo
+
+        owner = create_user()
+        populate(owner, args.todos, args.days)
+        client = APIClient()
+        client.force_authenticate(user=owner)
+
+        with override_settings(TODO_RESPONSE_CACHE=None):
+            run(client, f"{Todo.objects.count()} todos in the todo table", args.iterations)
+            rate, _ = timed(archive_todos, 1)
+            print(
+                f"\nArchived {ArchivedTodo.objects.count()} todos in {1 / rate:.2f} s;"
+                f" {Todo.objects.count()} left"
+            )
+            run(client, "After archiving", args.iterations)
+            run(client, "After archiving, ?include_archived=true", args.iterations,
+                "include_archived=true")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Load test of the sync views against their /async/ counterparts, both served
+through Django's ASGI handler (`todoapi.asgi.application`) the way an ASGI
+server would call it, with many requests in flight at once.
+
+Under ASGI a sync view holds a worker thread for the whole request; an async
+view runs on the event loop and only borrows a thread for each query. Note
+that Django's async ORM still runs every query in a thread, so on an
+in-process database like SQLite both stacks end up CPU-bound.
+
+    python -m benchmarks.asgi [--requests 2000] [--concurrency 1,16,64] [--users 20]
+"""
+import argparse
+import asyncio
+import json
+import time
+from unittest import mock
+
+from .utils import benchmark_database, create_user, percentile
+
+
+async def call(app, method, path, headers=(), body=b""):
+    """One request through the ASGI app; returns the response status."""
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [
+            (b"host", b"testserver"),
+            (b"content-length", str(len(body)).encode()),
+            *headers,
+        ],
+        "client": ("127.0.0.1", 50000),
+        "server": ("testserver", 80),
+    }
+    received = False
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        # Never disconnect; Django cancels this once the response is sent.
+        await asyncio.Future()
+
+    status = None
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def load(app, requests, concurrency, make_request):
+    """
+    Run `requests` requests, `concurrency` at a time; return (requests per
+    second, latencies, statuses).
+    """
+    latencies, statuses = [], {}
+    counter = iter(range(requests))
+
+    async def worker():
+        for i in counter:
+            began = time.perf_counter()
+            status = await call(app, *make_request(i))
+            latencies.append(time.perf_counter() - began)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return requests / (time.perf_counter() - start), latencies, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", default="1,16,64")
+    parser.add_argument("--users", type=int, default=20)
+    args = parser.parse_args()
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    with benchmark_database():
+        from django.core.asgi import get_asgi_application
+        from rest_framework.throttling import SimpleRateThrottle
+
+        from todo.authentication import TodoRefreshToken
+        from todo.models import Todo
+
+        app = get_asgi_application()
+        users = []
+        for n in range(args.users):
+            user = create_user(f"asgi{n}@test.com")
+            todos = Todo.objects.bulk_create(
+                Todo(owner=user, title=f"Todo {i}", description="d") for i in range(50)
+            )
+            token = str(TodoRefreshToken.for_user(user).access_token)
+            auth = (b"authorization", f"Bearer {token}".encode())
+            users.append((auth, todos[0].id))
+
+        def get_list(prefix):
+            return lambda i: ("GET", f"{prefix}/todos/", [users[i % len(users)][0]])
+
+        def get_detail(prefix):
+            def make(i):
+                auth, todo_id = users[i % len(users)]
+                return "GET", f"{prefix}/todos/{todo_id}/", [auth]
+
+            return make
+
+        def toggle(prefix):
+            def make(i):
+                auth, todo_id = users[i % len(users)]
+                return "PUT", f"{prefix}/todos/{todo_id}/complete/", [auth]
+
+            return make
+
+        def create(prefix):
+            body = json.dumps({"title": "New", "description": "d"}).encode()
+            headers = [(b"content-type", b"application/json")]
+            return lambda i: (
+                "POST",
+                f"{prefix}/todos/",
+                [users[i % len(users)][0], *headers],
+                body,
+            )
+
+        scenarios = [
+            ("GET list", get_list),
+            ("GET detail", get_detail),
+            ("PUT toggle", toggle),
+            ("POST create", create),
+        ]
+        # Measure the views, not the rate limits.
+        rates = {"user": "1000000000/day", "anon": "1000000000/day"}
+        with mock.patch.object(SimpleRateThrottle, "THROTTLE_RATES", rates):
+            for name, scenario in scenarios:
+                print(f"\n{name} ({args.requests} requests)")
+                for concurrency in levels:
+                    for stack, prefix in [("sync", ""), ("async", "/async")]:
+                        rate, latencies, statuses = asyncio.run(
+                            load(app, args.requests, concurrency, scenario(prefix))
+                        )
+                        print(
+                            f"{stack:<6} x{concurrency:<4} {rate:>8.0f} req/s"
+                            f"  p50 {percentile(latencies, 50) * 1000:8.2f} ms"
+                            f"  p99 {percentile(latencies, 99) * 1000:8.2f} ms"
+                            f"  {statuses}"
+                        )
+
+
+if __name__ == "__main__":
+    main()
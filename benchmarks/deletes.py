@@ -0,0 +1,111 @@
+"""
+Latency of other users' writes while a user with many todos goes away: the
+old way (deleting all their todos in the user's transaction) against
+detaching them and running `purge_todos` in small batches. A writer thread
+keeps toggling todos of other users the whole time.
+
+    python -m benchmarks.deletes [--todos 50000] [--batch-size 500] [--pause 0.01]
+"""
+import argparse
+import threading
+import time
+
+from .utils import benchmark_database, create_user, percentile
+
+
+def measure(delete, owners):
+    """
+    Run `delete()` while toggling `owners`' todos; return (seconds, latencies,
+    errors).
+    """
+    from django.db import OperationalError, close_old_connections
+
+    from todo.models import Todo
+
+    latencies, errors = [], []
+    done = threading.Event()
+
+    def writer():
+        i = 0
+        while not done.is_set():
+            owner, todo_id = owners[i % len(owners)]
+            began = time.perf_counter()
+            try:
+                Todo.objects.set_completed(todo_id, owner)
+            except OperationalError as exc:
+                # Gave up after the busy timeout.
+                errors.append(exc)
+            latencies.append(time.perf_counter() - began)
+            i += 1
+            time.sleep(0.001)
+        close_old_connections()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    time.sleep(0.2)
+    began = time.perf_counter()
+    delete()
+    elapsed = time.perf_counter() - began
+    time.sleep(0.2)
+    done.set()
+    thread.join()
+    return elapsed, latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--todos", type=int, default=50000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--pause", type=float, default=0.01)
+    args = parser.parse_args()
+
+    with benchmark_database():
+        from django.db import transaction
+
+        from todo.models import Todo
+        from todo.purge import purge_todos
+
+        owners = []
+        for n in range(10):
+            owner = create_user(f"writer{n}@test.com")
+            owners.append((owner, Todo.objects.create(owner=owner, title="t", description="d").pk))
+
+        def doomed_user(email):
+            user = create_user(email)
+            Todo.objects.bulk_create(
+                (Todo(owner=user, title=f"Todo {i}", description="d") for i in range(args.todos)),
+                batch_size=1000,
+            )
+            return user
+
+        def cascade(user):
+            def delete():
+                with transaction.atomic():
+                    Todo.all_objects.filter(owner=user).delete()
+                    user.delete()
+
+            return delete
+
+        def detach(user):
+            def delete():
+                user.delete()
+                purge_todos(batch_size=args.batch_size, pause=args.pause)
+
+            return delete
+
+        print(f"Deleting a user with {args.todos} todos while another thread writes")
+        for name, strategy in [("cascade", cascade), ("detach + purge", detach)]:
+            user = doomed_user(f"{name.split()[0]}@test.com")
+            elapsed, latencies, errors = measure(strategy(user), owners)
+            print(
+                f"{name:<16} delete {elapsed:6.2f} s"
+                f"  writes {len(latencies):>5}"
+                f"  p50 {percentile(latencies, 50) * 1000:8.2f} ms"
+                f"  p99 {percentile(latencies, 99) * 1000:8.2f} ms"
+                f"  max {max(latencies) * 1000:8.2f} ms"
+                f"  errors {len(errors)}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Email lookups with many users: a case-insensitive `email__iexact` query on
+auth_user versus the point lookup on the unique `UserEmail` key used by
+registration and login.
+
+    python -m benchmarks.email_lookup [--users 1000000] [--iterations 200]
+"""
+import argparse
+import random
+
+from .utils import benchmark_database, summarize, timed
+
+
+def populate(users, batch_size=50000):
+    from django.db import connection, transaction
+    from django.utils import timezone
+
+    from django.contrib.auth.models import User
+
+    from todo.models import UserEmail
+
+    # Raw executemany: going through create_user would spend hours hashing.
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    user_table = connection.ops.quote_name(User._meta.db_table)
+    key_table = connection.ops.quote_name(UserEmail._meta.db_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, users, batch_size):
+            ids = range(start + 1, min(start + batch_size, users) + 1)
+            cursor.executemany(
+                f"INSERT INTO {user_table} (id, password, is_superuser, username,"
+                " first_name, last_name, email, is_staff, is_active, date_joined)"
+                " VALUES (%s, '!', false, %s, '', '', %s, false, true, %s)",
+                [(i, f"User{i}@Example.com", f"User{i}@Example.com", now) for i in ids],
+            )
+            cursor.executemany(
+                f"INSERT INTO {key_table} (user_id, email) VALUES (%s, %s)",
+                [(i, f"user{i}@example.com") for i in ids],
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    with benchmark_database():
+        from django.contrib.auth.models import User
+
+        from todo.backends import email_taken, get_user_by_email
+        from todo.models import UserEmail
+
+        populate(args.users)
+        emails = [
+            f"USER{random.randint(1, args.users)}@example.COM"
+            for _ in range(args.iterations)
+        ]
+
+        paths = [
+            ("email__iexact exists()", lambda: User.objects.filter(email__iexact=next(samples)).exists()),
+            ("UserEmail exists()", lambda: email_taken(next(samples))),
+        ]
+        print(f"Duplicate checks against {args.users} users")
+        for name, lookup in paths:
+            samples = iter(emails)
+            rate, latencies = timed(lookup, args.iterations)
+            summarize(name, rate, latencies)
+
+        paths = [
+            ("email__iexact get()", lambda: User.objects.get(email__iexact=next(samples))),
+            ("UserEmail select_related", lambda: get_user_by_email(next(samples))),
+        ]
+        print(f"\nLogin lookups against {args.users} users")
+        for name, lookup in paths:
+            samples = iter(emails)
+            rate, latencies = timed(lookup, args.iterations)
+            summarize(name, rate, latencies)
+
+        print("\nQuery plan of the login lookup:")
+        print(UserEmail.objects.select_related("user").filter(email=emails[0].lower()).explain())
+
+
+if __name__ == "__main__":
+    main()
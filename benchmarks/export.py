@@ -0,0 +1,58 @@
+"""
+Streaming export: peak Python memory and throughput of `/todos/export/` as the
+todo list grows.
+
+    python -m benchmarks.export [--sizes 1000 10000 50000] [--format ndjson]
+
+With rows streamed through a chunked iterator the peak should stay flat while
+the exported size grows linearly.
+"""
+import argparse
+import time
+import tracemalloc
+
+from .utils import benchmark_database, create_user
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    args = parser.parse_args()
+
+    with benchmark_database():
+        from rest_framework.test import APIClient
+
+        from todo.models import Todo
+
+        owner = create_user()
+        client = APIClient()
+        client.force_authenticate(user=owner)
+
+        created = 0
+        for size in sorted(args.sizes):
+            Todo.objects.bulk_create(
+                (
+                    Todo(owner=owner, title=f"Todo {i}", description="x" * 40)
+                    for i in range(created, size)
+                ),
+                batch_size=1000,
+            )
+            created = size
+
+            tracemalloc.start()
+            start = time.perf_counter()
+            response = client.get("/todos/export/", {"format": args.format})
+            exported = sum(len(chunk) for chunk in response.streaming_content)
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            print(
+                f"{size:>8} todos  {exported / 1e6:8.2f} MB exported"
+                f"  peak {peak / 1e6:7.2f} MB  {size / elapsed:10.0f} rows/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
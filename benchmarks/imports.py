@@ -0,0 +1,59 @@
+"""
+Todo import: one `POST /todos/`-style serializer save per row versus the
+batched `import_todos` path (validate with TodoSerializer, bulk_create).
+
+    python -m benchmarks.imports [--rows 20000] [--batch-size 1000]
+"""
+import argparse
+import io
+import json
+import time
+
+from .utils import benchmark_database, create_user
+
+
+def make_upload(rows):
+    lines = (
+        json.dumps({"title": f"Imported {i}", "description": "x" * 40, "completed": i % 2 == 0})
+        for i in range(rows)
+    )
+    return io.BytesIO("\n".join(lines).encode())
+
+
+def import_one_by_one(owner, upload):
+    from todo.serializers import TodoSerializer
+
+    for line in upload:
+        serializer = TodoSerializer(data=json.loads(line))
+        serializer.is_valid(raise_exception=True)
+        serializer.save(owner=owner)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    with benchmark_database():
+        from todo.imports import import_todos
+
+        # The per-row path is slow enough that a tenth of the rows suffices.
+        single_rows = max(args.rows // 10, 1)
+        owner = create_user()
+        start = time.perf_counter()
+        import_one_by_one(owner, make_upload(single_rows))
+        elapsed = time.perf_counter() - start
+        print(f"{'serializer.save() per row':<40} {single_rows / elapsed:>10.0f} rows/s")
+
+        owner = create_user("bench-import@test.com")
+        start = time.perf_counter()
+        report = import_todos(owner, make_upload(args.rows), batch_size=args.batch_size)
+        elapsed = time.perf_counter() - start
+        assert report["created"] == args.rows, report
+        name = f"import_todos (batch {args.batch_size})"
+        print(f"{name:<40} {args.rows / elapsed:>10.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
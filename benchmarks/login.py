@@ -0,0 +1,87 @@
+"""
+Login throughput per password hasher profile: `EmailLoginSerializer`
+validation (one authenticate() pass plus token issuance) in one process per
+core.
+
+    python -m benchmarks.login [--profiles fast pbkdf2 scrypt] [--seconds 3]
+        [--processes N]
+
+Cost knobs come from the settings (TODO_PBKDF2_ITERATIONS, ...), which can be
+set through the environment of the same name.
+"""
+import argparse
+import multiprocessing
+import os
+import time
+
+from .utils import benchmark_database
+
+
+PASSWORD = "benchmark-password"
+
+
+def login_worker(email, seconds, results):
+    from django.db import connections
+
+    from todo.serializers import EmailLoginSerializer
+
+    # Forked workers must not share the parent's database connection.
+    connections.close_all()
+    logins = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        serializer = EmailLoginSerializer(data={"email": email, "password": PASSWORD})
+        serializer.is_valid(raise_exception=True)
+        logins += 1
+    connections.close_all()
+    results.put(logins)
+
+
+def run(email, seconds, processes):
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    workers = [
+        context.Process(target=login_worker, args=(email, seconds, results))
+        for _ in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    total = sum(results.get() for _ in workers)
+    for worker in workers:
+        worker.join()
+    return total / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--profiles", nargs="+", default=["fast", "pbkdf2", "scrypt"])
+    parser.add_argument("--seconds", type=float, default=3)
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with benchmark_database():
+        from django.conf import settings
+        from django.contrib.auth.models import User
+        from django.db import connections
+        from django.test import override_settings
+
+        print(f"Logins per second ({args.processes} processes, {args.seconds:g}s each)")
+        for profile in args.profiles:
+            hasher = settings.PASSWORD_HASHER_PROFILES[profile]
+            with override_settings(PASSWORD_HASHERS=[hasher]):
+                email = f"{profile}@bench.test"
+                try:
+                    User.objects.create_user(username=email, email=email, password=PASSWORD)
+                except ValueError as exc:  # e.g. argon2-cffi is not installed
+                    print(f"{profile:<10} skipped: {exc}")
+                    continue
+                connections.close_all()
+                rate = run(email, args.seconds, args.processes)
+            print(
+                f"{profile:<10} {rate:>10.1f} logins/s"
+                f"  {rate / args.processes:>10.1f} per core"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+What the request metrics cost: the same requests with and without
+`metrics_middleware` (which also turns the per-query timing on).
+
+    python -m benchmarks.metrics [--iterations 2000] [--todos 100]
+"""
+import argparse
+from unittest import mock
+
+from .utils import benchmark_database, create_user, summarize, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--todos", type=int, default=100)
+    args = parser.parse_args()
+
+    with benchmark_database():
+        from django.conf import settings
+        from django.test import override_settings
+        from rest_framework.test import APIClient
+        from rest_framework.throttling import SimpleRateThrottle
+
+        from todo.models import Todo
+
+        owner = create_user()
+        Todo.objects.bulk_create(
+            Todo(owner=owner, title=f"Todo {i}", description="x")
+            for i in range(args.todos)
+        )
+        todo_id = Todo.objects.filter(owner=owner).values_list("id", flat=True)[0]
+        without = [
+            m for m in settings.MIDDLEWARE if m != "todo.middleware.metrics_middleware"
+        ]
+
+        # Measure the views, not the rate limits.
+        rates = {"user": "1000000000/day", "anon": "1000000000/day"}
+        stacks = [("without metrics", without), ("with metrics", settings.MIDDLEWARE)]
+        for name, middleware in stacks:
+            # No response cache, so every request runs the view and its queries.
+            with (
+                override_settings(MIDDLEWARE=middleware, TODO_RESPONSE_CACHE=None),
+                mock.patch.object(SimpleRateThrottle, "THROTTLE_RATES", rates),
+            ):
+                client = APIClient()
+                client.force_authenticate(user=owner)
+                for url in ["/todos/", f"/todos/{todo_id}/"]:
+                    client.get(url)
+                    rate, latencies = timed(lambda: client.get(url), args.iterations)
+                    summarize(f"{name} GET {url}", rate, latencies)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+List rendering: `TodoSerializer(many=True)` over model instances versus the
+precompiled row serializer over `values_list` rows used by the list view.
+
+    python -m benchmarks.serialization [--iterations 50] [--sizes 10 100 1000]
+
+Each path fetches a page and renders it to JSON; the outputs are checked to
+be byte-identical before timing.
+"""
+import argparse
+
+from .utils import benchmark_database, create_user, summarize, timed
+
+
+def render_with_serializer(queryset):
+    from rest_framework.renderers import JSONRenderer
+
+    from todo.serializers import TodoSerializer
+
+    return JSONRenderer().render(TodoSerializer(queryset, many=True).data)
+
+
+def render_with_rows(queryset):
+    from rest_framework.renderers import JSONRenderer
+
+    from todo.serializers import todo_rows
+
+    return JSONRenderer().render(todo_rows.render(todo_rows.values(queryset)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    args = parser.parse_args()
+
+    with benchmark_database():
+        from todo.models import Todo
+
+        owner = create_user()
+        Todo.objects.bulk_create(
+            Todo(owner=owner, title=f"Todo {i}", description="x" * 40, completed=i % 2)
+            for i in range(max(args.sizes))
+        )
+        paths = [("TodoSerializer", render_with_serializer), ("row serializer", render_with_rows)]
+
+        for size in args.sizes:
+            queryset = Todo.objects.filter(owner=owner).order_by("-date_created", "-id")[:size]
+            outputs = {render(queryset) for _, render in paths}
+            assert len(outputs) == 1, "fast path output differs"
+
+            print(f"\nPage of {size} todos ({args.iterations} renders per path)")
+            for name, render in paths:
+                rate, latencies = timed(lambda: render(queryset), args.iterations)
+                summarize(name, rate, latencies)
+
+
+if __name__ == "__main__":
+    main()
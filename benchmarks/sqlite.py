@@ -0,0 +1,112 @@
+"""
+Concurrent reads and writes against a file SQLite database with each
+`SQLITE_PROFILES` entry: worker threads play web requests (connection
+handling included, as the request_started/finished signals do it), each
+listing a page of todos or toggling one.
+
+    python -m benchmarks.sqlite [--threads 8] [--seconds 5] [--write-ratio 0.2]
+"""
+import argparse
+import random
+import threading
+import time
+
+from .utils import benchmark_database, create_user, percentile, setup_django
+
+
+def run(threads, seconds, write_ratio, owners):
+    from django.db import OperationalError, close_old_connections
+
+    from todo.models import Todo
+
+    results = {"read": [], "write": []}
+    errors = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker():
+        rng = random.Random()
+        latencies = {"read": [], "write": []}
+        while time.perf_counter() < deadline:
+            owner, todo_ids = rng.choice(owners)
+            kind = "write" if rng.random() < write_ratio else "read"
+            began = time.perf_counter()
+            close_old_connections()
+            try:
+                if kind == "read":
+                    list(Todo.objects.filter(owner_id=owner.pk).values()[:20])
+                else:
+                    Todo.objects.set_completed(rng.choice(todo_ids), owner)
+            except OperationalError as exc:
+                with lock:
+                    errors.append(exc)
+            else:
+                latencies[kind].append(time.perf_counter() - began)
+            finally:
+                close_old_connections()
+        with lock:
+            for kind, values in latencies.items():
+                results[kind].extend(values)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return results, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--users", type=int, default=50)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.db import connection
+
+    database = settings.DATABASES["default"]
+    base = {key: database.get(key) for key in ("OPTIONS", "CONN_MAX_AGE", "CONN_HEALTH_CHECKS")}
+
+    print(
+        f"{args.threads} threads, {args.seconds:g}s, "
+        f"{args.write_ratio:.0%} writes, {args.users} users"
+    )
+    for name, profile in settings.SQLITE_PROFILES.items():
+        # Connections pick up OPTIONS/CONN_MAX_AGE from this (shared) dict.
+        connection.close()
+        database.update({"OPTIONS": {}, "CONN_MAX_AGE": 0, "CONN_HEALTH_CHECKS": False})
+        database.update(profile)
+        with benchmark_database():
+            from todo.models import Todo
+
+            owners = []
+            for n in range(args.users):
+                owner = create_user(f"sqlite{n}@test.com")
+                todos = Todo.objects.bulk_create(
+                    Todo(owner=owner, title=f"Todo {i}", description="d") for i in range(50)
+                )
+                owners.append((owner, [todo.pk for todo in todos]))
+            connection.close()
+
+            results, errors = run(args.threads, args.seconds, args.write_ratio, owners)
+            connection.close()
+
+        print(f"\n{name}")
+        for kind, latencies in results.items():
+            print(
+                f"  {kind:<6} {len(latencies) / args.seconds:>8.0f} ops/s"
+                f"  p50 {percentile(latencies, 50) * 1000:7.2f} ms"
+                f"  p99 {percentile(latencies, 99) * 1000:7.2f} ms"
+            )
+        print(f"  errors {len(errors)}" + (f" ({errors[0]})" if errors else ""))
+
+    connection.close()
+    database.update(base)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Stats reads for a user with many todos: aggregating over todo_todo on every
+request versus reading the trigger-maintained summary tables, plus what the
+triggers add to inserts.
+
+    python -m benchmarks.stats [--todos 200000] [--iterations 100]
+"""
+import argparse
+import datetime
+import random
+
+from .utils import benchmark_database, create_user, summarize, timed
+
+
+def populate(owner, todos, batch_size=10000):
+    from django.db import connection, transaction
+    from django.utils import timezone
+
+    from todo.models import Todo
+
+    # Raw executemany so the triggers do the counting, as they would in use.
+    table = connection.ops.quote_name(Todo._meta.db_table)
+    now = timezone.now()
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, todos, batch_size):
+            rows = []
+            for i in range(start, min(start + batch_size, todos)):
+                created = connection.ops.adapt_datetimefield_value(
+                    now - datetime.timedelta(minutes=random.randint(0, 60 * 24 * 365))
+                )
+                rows.append(
+                    (f"Todo {i}", "", random.random() < 0.3, created, created, owner.pk)
+                )
+            cursor.executemany(
+                f"INSERT INTO {table} (title, description, completed, date_created,"
+                " updated_at, owner_id, version) VALUES (%s, %s, %s, %s, %s, %s, 1)",
+                rows,
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--todos", type=int, default=200_000)
+    parser.add_argument("--iterations", type=int, default=100)
+    args = parser.parse_args()
+
+    with benchmark_database():
+        from django.db import connection
+        from django.db.models import Count, Q
+        from django.db.models.functions import TruncDate
+
+        from todo.models import Todo
+        from todo.stats import get_stats, install_stats_triggers, remove_stats_triggers
+
+        owner = create_user("stats")
+        rate, _ = timed(lambda: populate(owner, args.todos), 1)
+        print(f"Inserted {args.todos} todos with stats triggers: {rate * args.todos:,.0f} rows/s")
+        with connection.schema_editor() as schema_editor:
+            remove_stats_triggers(schema_editor)
+        rate, _ = timed(lambda: populate(owner, args.todos), 1)
+        print(f"Inserted {args.todos} todos without triggers: {rate * args.todos:,.0f} rows/s")
+        # Triggers are off, so dropping the second batch leaves the counters alone.
+        Todo.objects.filter(id__gt=args.todos).delete()
+        with connection.schema_editor() as schema_editor:
+            install_stats_triggers(schema_editor)
+
+        since = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(weeks=12)
+
+        def aggregate():
+            todos = Todo.objects.filter(owner_id=owner.pk)
+            todos.aggregate(total=Count("id"), completed=Count("id", filter=Q(completed=True)))
+            list(
+                todos.filter(date_created__gte=since)
+                .annotate(day=TruncDate("date_created"))
+                .values("day")
+                .annotate(created=Count("id"))
+            )
+
+        paths = [
+            ("aggregate over todos", aggregate),
+            ("summary tables", lambda: get_stats(owner, days=30, weeks=12)),
+        ]
+        print(f"\nStats reads for a user with {args.todos} todos")
+        for name, read in paths:
+            rate, latencies = timed(read, args.iterations)
+            summarize(name, rate, latencies)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,419 @@
+"""
+The API benchmark suite behind `python manage.py bench`.
+
+It seeds a throwaway database with users x todos, then drives the real URLs
+(list, search, filter, detail, toggle, register, login) through three
+transports:
+
+- `client`: in-process, through Django's test client.
+- `wsgi`: over HTTP, to Django's threaded WSGI server on localhost.
+- `asgi`: through `get_asgi_application()`, the way an ASGI server calls it.
+
+It reports throughput, p50/p99 latency and queries per request (from
+todo.metrics) as JSON. `compare()` flags regressions against a stored run.
+"""
+import asyncio
+import http.client
+import json
+import platform
+import random
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
+from unittest import mock
+
+from .asgi import call
+from .utils import benchmark_database, percentile
+
+PASSWORD = "correct-horse-battery"
+WORDS = [
+    "milk", "report", "garden", "invoice", "dentist",
+    "groceries", "taxes", "laundry", "meeting", "birthday",
+]
+TRANSPORTS = ["client", "wsgi", "asgi"]
+SCENARIOS = ["list", "search", "filter", "detail", "toggle", "register", "login"]
+# These hash a password on every request, so they get `auth_requests` each.
+AUTH_SCENARIOS = {"register", "login"}
+
+# (metric, whether `new` is a regression from `old` given the tolerance).
+CHECKS = [
+    ("throughput", lambda old, new, tolerance: new < old / (1 + tolerance)),
+    ("p50_ms", lambda old, new, tolerance: new > old * (1 + tolerance)),
+    ("p99_ms", lambda old, new, tolerance: new > old * (1 + tolerance)),
+    # Query counts do not vary between runs: any increase is a regression.
+    ("queries_per_request", lambda old, new, tolerance: new > old),
+    ("errors", lambda old, new, tolerance: new > old),
+]
+
+
+@dataclass
+class Seeded:
+    email: str
+    token: str
+    todo_ids: list = field(default_factory=list)
+
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    route: str
+    headers: dict
+    body: bytes = b""
+
+
+def seed(users, todos_per_user, description_size, seed=0):
+    """
+    Create `users` users with `todos_per_user` todos each, whose descriptions
+    are `description_size` characters long. Returns a `Seeded` per user.
+    """
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import User
+
+    from todo.authentication import TodoRefreshToken
+    from todo.models import Todo, UserEmail, normalize_email
+    from todo.signals import notify_todos_changed
+
+    rng = random.Random(seed)
+    # Hashed once: seeding should not cost a password hash per user.
+    password = make_password(PASSWORD)
+    created = User.objects.bulk_create(
+        User(username=email, email=email, password=password)
+        for email in (f"bench{n}@test.com" for n in range(users))
+    )
+    # bulk_create skips the post_save receiver that adds these.
+    UserEmail.objects.bulk_create(
+        UserEmail(user=user, email=normalize_email(user.email)) for user in created
+    )
+
+    def description():
+        words = []
+        while sum(len(word) + 1 for word in words) < description_size:
+            words.append(rng.choice(WORDS))
+        return " ".join(words)[:description_size]
+
+    seeded = []
+    for user in created:
+        todos = Todo.objects.bulk_create(
+            (
+                Todo(
+                    owner=user,
+                    title=f"{rng.choice(WORDS).title()} {i}",
+                    description=description(),
+                    completed=rng.random() < 0.3,
+                )
+                for i in range(todos_per_user)
+            ),
+            batch_size=1000,
+        )
+        # As a real write would. A user's first write also creates their
+        # collection version row, which would otherwise land in whichever
+        # measured requests happen to write first for each user.
+        notify_todos_changed(Todo, user.pk, created=[todo.pk for todo in todos])
+        seeded.append(
+            Seeded(
+                email=user.email,
+                token=str(TodoRefreshToken.for_user(user).access_token),
+                todo_ids=[todo.pk for todo in todos[:10]],
+            )
+        )
+    return seeded
+
+
+def scenario_requests(name, users):
+    """A function building the `i`th request of scenario `name`."""
+    json_type = {"Content-Type": "application/json"}
+
+    def auth(i):
+        return {"Authorization": f"Bearer {users[i % len(users)].token}"}
+
+    def todo_id(i):
+        user = users[i % len(users)]
+        return user.todo_ids[(i // len(users)) % len(user.todo_ids)]
+
+    run = f"{time.time_ns():x}"
+    builders = {
+        "list": lambda i: Request("GET", "/todos/", "todos/", auth(i)),
+        "search": lambda i: Request(
+            "GET", f"/todos/?search={WORDS[i % len(WORDS)]}", "todos/", auth(i)
+        ),
+        "filter": lambda i: Request(
+            "GET", "/todos/?completed=true&ordering=title", "todos/", auth(i)
+        ),
+        "detail": lambda i: Request(
+            "GET", f"/todos/{todo_id(i)}/", "todos/<int:todo_id>/", auth(i)
+        ),
+        "toggle": lambda i: Request(
+            "PUT",
+            f"/todos/{todo_id(i)}/complete/",
+            "todos/<int:todo_id>/complete/",
+            auth(i),
+        ),
+        "register": lambda i: Request(
+            "POST",
+            "/register/",
+            "register/",
+            json_type,
+            json.dumps(
+                {
+                    "name": "Bench",
+                    "email": f"new{run}-{i}@test.com",
+                    "password": PASSWORD,
+                }
+            ).encode(),
+        ),
+        "login": lambda i: Request(
+            "POST",
+            "/login/",
+            "login/",
+            json_type,
+            json.dumps(
+                {"email": users[i % len(users)].email, "password": PASSWORD}
+            ).encode(),
+        ),
+    }
+    return builders[name]
+
+
+def send_client(client, request):
+    response = client.generic(
+        request.method,
+        request.path,
+        request.body,
+        content_type=request.headers.get("Content-Type", "application/octet-stream"),
+        headers={k: v for k, v in request.headers.items() if k != "Content-Type"},
+    )
+    return response.status_code
+
+
+def send_http(address, request):
+    connection = http.client.HTTPConnection(*address)
+    # The test environment only allows the test client's host name.
+    headers = {"Host": "testserver", **request.headers}
+    try:
+        connection.request(
+            request.method, request.path, body=request.body, headers=headers
+        )
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    finally:
+        connection.close()
+
+
+def run_threads(send, make_request, requests, concurrency):
+    """
+    Send `requests` requests from `concurrency` threads; return (requests per
+    second, latencies, statuses).
+    """
+    from django.db import connections
+
+    latencies, statuses = [], {}
+    counter = iter(range(requests))
+    lock = threading.Lock()
+
+    def worker():
+        try:
+            while True:
+                with lock:
+                    i = next(counter, None)
+                if i is None:
+                    return
+                began = time.perf_counter()
+                status = send(make_request(i))
+                elapsed = time.perf_counter() - began
+                with lock:
+                    latencies.append(elapsed)
+                    statuses[status] = statuses.get(status, 0) + 1
+        finally:
+            connections.close_all()
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return requests / (time.perf_counter() - start), latencies, statuses
+
+
+async def run_asgi(app, make_request, requests, concurrency):
+    latencies, statuses = [], {}
+    counter = iter(range(requests))
+
+    async def worker():
+        for i in counter:
+            request = make_request(i)
+            headers = [
+                (name.lower().encode(), value.encode())
+                for name, value in request.headers.items()
+            ]
+            began = time.perf_counter()
+            status = await call(
+                app, request.method, request.path, headers, request.body
+            )
+            latencies.append(time.perf_counter() - began)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return requests / (time.perf_counter() - start), latencies, statuses
+
+
+@contextmanager
+def wsgi_server():
+    """Serve `todoapi.wsgi` on a free localhost port; yields (host, port)."""
+    from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+    from django.core.wsgi import get_wsgi_application
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadedWSGIServer(("127.0.0.1", 0), QuietHandler)
+    server.set_app(get_wsgi_application())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server.server_address[:2]
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+def transport_runner(transport, stack, concurrency):
+    """A function running (make_request, requests) over `transport`."""
+    if transport == "client":
+        from django.test import Client
+
+        clients = threading.local()
+
+        def send(request):
+            if not hasattr(clients, "client"):
+                clients.client = Client()
+            return send_client(clients.client, request)
+
+        return lambda make, n: run_threads(send, make, n, concurrency)
+    if transport == "wsgi":
+        address = stack.enter_context(wsgi_server())
+        return lambda make, n: run_threads(
+            lambda request: send_http(address, request), make, n, concurrency
+        )
+    if transport == "asgi":
+        from django.core.asgi import get_asgi_application
+
+        app = get_asgi_application()
+        return lambda make, n: asyncio.run(run_asgi(app, make, n, concurrency))
+    raise ValueError(f"Unknown transport {transport!r}.")
+
+
+def summarize(rate, latencies, statuses, route):
+    from todo.metrics import metrics
+
+    count, queries = metrics.query_totals(route)
+    return {
+        "requests": len(latencies),
+        "throughput": round(rate, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        # None when metrics_middleware is not installed.
+        "queries_per_request": round(queries / count, 2) if count else None,
+        "errors": sum(n for status, n in statuses.items() if status >= 400),
+    }
+
+
+def run_suite(
+    users=20,
+    todos_per_user=200,
+    description_size=200,
+    requests=300,
+    auth_requests=20,
+    concurrency=1,
+    transports=TRANSPORTS,
+    scenarios=SCENARIOS,
+    response_cache=False,
+    log=print,
+):
+    """Seed a throwaway database, run every scenario over every transport."""
+    with benchmark_database():
+        import django
+        from django.conf import settings
+        from django.db import connection
+        from django.test import override_settings
+        from rest_framework.throttling import SimpleRateThrottle
+
+        from todo.metrics import metrics
+
+        log(f"Seeding {users} users x {todos_per_user} todos")
+        seeded = seed(users, todos_per_user, description_size)
+        report = {
+            "meta": {
+                "users": users,
+                "todos_per_user": todos_per_user,
+                "description_size": description_size,
+                "requests": requests,
+                "auth_requests": auth_requests,
+                "concurrency": concurrency,
+                "response_cache": response_cache,
+                "database": connection.vendor,
+                "password_hasher": settings.TODO_PASSWORD_HASHER,
+                "python": platform.python_version(),
+                "django": django.get_version(),
+            },
+            "results": {},
+        }
+
+        with ExitStack() as stack:
+            # Measure the views, not the rate limits.
+            rates = {"user": "1000000000/day", "anon": "1000000000/day"}
+            stack.enter_context(
+                mock.patch.object(SimpleRateThrottle, "THROTTLE_RATES", rates)
+            )
+            if not response_cache:
+                # Otherwise repeated reads measure the cache, not the views.
+                stack.enter_context(override_settings(TODO_RESPONSE_CACHE=None))
+
+            for transport in transports:
+                run = transport_runner(transport, stack, concurrency)
+                results = report["results"][transport] = {}
+                for name in scenarios:
+                    make_request = scenario_requests(name, seeded)
+                    count = auth_requests if name in AUTH_SCENARIOS else requests
+                    # One warm-up request, left out of the numbers.
+                    run(lambda i: make_request(count + i), 1)
+                    metrics.reset()
+                    rate, latencies, statuses = run(make_request, count)
+                    result = summarize(rate, latencies, statuses, make_request(0).route)
+                    results[name] = result
+                    log(
+                        f"{transport:<6} {name:<9} {result['throughput']:>9.1f} req/s"
+                        f"  p50 {result['p50_ms']:8.2f} ms"
+                        f"  p99 {result['p99_ms']:8.2f} ms"
+                        f"  queries {result['queries_per_request']}"
+                        f"  errors {result['errors']}"
+                    )
+        return report
+
+
+def compare(baseline, current, tolerance=0.25):
+    """
+    Compare two reports. Returns one row per metric measured in both:
+    (transport, scenario, metric, baseline value, current value, regressed).
+    Latency and throughput may be `tolerance` worse before they count as a
+    regression; query counts and errors may not grow at all.
+    """
+    rows = []
+    for transport, results in current["results"].items():
+        for scenario, result in results.items():
+            old_result = baseline["results"].get(transport, {}).get(scenario)
+            if old_result is None:
+                continue
+            for metric, regressed in CHECKS:
+                old, new = old_result.get(metric), result.get(metric)
+                if old is None or new is None:
+                    continue
+                regression = regressed(old, new, tolerance)
+                rows.append((transport, scenario, metric, old, new, regression))
+    return rows
@@ -0,0 +1,70 @@
+"""
+Throttle check cost: DRF's UserRateThrottle (a timestamp list per key in the
+cache) versus the GCRA throttle on each store, at a "1000/day" rate with the
+key's history already full.
+
+    python -m benchmarks.throttle [--iterations 20000]
+"""
+import argparse
+import os
+import tempfile
+from types import SimpleNamespace
+
+from .utils import setup_django, summarize, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test import override_settings
+    from rest_framework.throttling import UserRateThrottle
+
+    from todo.throttling import GCRAUserRateThrottle
+
+    request = SimpleNamespace(user=SimpleNamespace(pk=1, is_authenticated=True), META={})
+
+    def check(throttle_class):
+        throttle = throttle_class()
+        throttle.rate, throttle.num_requests = "1000/day", 10**9
+        # Fill the history up to the real limit first.
+        for _ in range(1000):
+            throttle.allow_request(request, None)
+        return lambda: throttle_class().allow_request(request, None)
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = [
+            ("UserRateThrottle (cache list)", UserRateThrottle, {}),
+            ("GCRA memory", GCRAUserRateThrottle, {"TODO_THROTTLE_STORE": "memory"}),
+            (
+                "GCRA sqlite",
+                GCRAUserRateThrottle,
+                {
+                    "TODO_THROTTLE_STORE": "sqlite",
+                    "TODO_THROTTLE_STORE_OPTIONS": {
+                        "path": os.path.join(directory, "throttle.sqlite3")
+                    },
+                },
+            ),
+            (
+                "GCRA shared_memory",
+                GCRAUserRateThrottle,
+                {
+                    "TODO_THROTTLE_STORE": "shared_memory",
+                    "TODO_THROTTLE_STORE_OPTIONS": {
+                        "path": os.path.join(directory, "throttle.shm")
+                    },
+                },
+            ),
+        ]
+        print(f"Throttle checks ({args.iterations} per path)")
+        for name, throttle_class, overrides in paths:
+            with override_settings(**overrides):
+                rate, latencies = timed(check(throttle_class), args.iterations)
+            summarize(name, rate, latencies)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Completion toggle: read-modify-write `save()` versus the single conditional
+`UPDATE ... RETURNING` used by TodoCompletedUpdateView.
+
+    python -m benchmarks.toggle [--iterations 2000] [--threads 8]
+
+Reports sequential throughput, and with several threads toggling the same
+todo it reports how many toggles were lost or failed.
+"""
+import argparse
+import threading
+
+from .utils import benchmark_database, create_user, summarize, timed
+
+
+def toggle_with_save(todo_id, owner):
+    from todo.models import Todo
+
+    todo = Todo.objects.get(id=todo_id, owner=owner)
+    todo.completed = not todo.completed
+    todo.save()
+
+
+def toggle_atomic(todo_id, owner):
+    from todo.models import Todo
+
+    Todo.objects.set_completed(todo_id, owner)
+
+
+def run_concurrently(toggle, todo_id, owner, threads, per_thread):
+    from django.db import OperationalError, connections
+
+    errors = []
+
+    def worker():
+        try:
+            for _ in range(per_thread):
+                try:
+                    toggle(todo_id, owner)
+                except OperationalError as exc:  # e.g. "database is locked"
+                    errors.append(exc)
+        finally:
+            connections.close_all()
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    with benchmark_database():
+        from todo.models import Todo
+
+        owner = create_user()
+        paths = [("get + save()", toggle_with_save), ("UPDATE ... RETURNING", toggle_atomic)]
+
+        print(f"Sequential toggles ({args.iterations} per path)")
+        for name, toggle in paths:
+            todo = Todo.objects.create(owner=owner, title=name, description="")
+            rate, latencies = timed(lambda: toggle(todo.id, owner), args.iterations)
+            summarize(name, rate, latencies)
+
+        per_thread = args.iterations // args.threads
+        total = per_thread * args.threads
+        print(f"\nConcurrent toggles on one todo ({args.threads} threads, {total} total)")
+        for name, toggle in paths:
+            todo = Todo.objects.create(owner=owner, title=name, description="")
+            failed = run_concurrently(toggle, todo.id, owner, args.threads, per_thread)
+            todo.refresh_from_db()
+            applied = todo.version - 1
+            lost = total - failed - applied
+            print(f"{name:<40} applied {applied:>6}  lost {lost:>6}  failed {failed:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import os
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+
+
+def setup_django():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "todoapi.settings")
+    import django
+
+    django.setup()
+
+
+@contextmanager
+def benchmark_database():
+    """
+    Create a migrated, file-backed test database (so several threads can share
+    it) and destroy it afterwards.
+    """
+    setup_django()
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    with tempfile.TemporaryDirectory() as directory:
+        if connection.vendor == "sqlite":
+            connection.settings_dict["TEST"]["NAME"] = os.path.join(
+                directory, "benchmark.sqlite3"
+            )
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            yield
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+
+def create_user(email="bench@test.com"):
+    from django.contrib.auth.models import User
+
+    # Skip the password hasher: it is not what these benchmarks measure.
+    user = User(username=email, email=email, first_name="Bench")
+    user.set_unusable_password()
+    user.save()
+    return user
+
+
+def timed(func, iterations):
+    """
+    Run `func` `iterations` times; return (operations per second, latencies).
+    """
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        began = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - began)
+    elapsed = time.perf_counter() - start
+    return iterations / elapsed, latencies
+
+
+def percentile(latencies, pct):
+    if not latencies:
+        return 0.0
+    ordered = sorted(latencies)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(name, ops_per_second, latencies):
+    print(
+        f"{name:<40} {ops_per_second:>10.0f} ops/s"
+        f"  p50 {percentile(latencies, 50) * 1000:7.3f} ms"
+        f"  p99 {percentile(latencies, 99) * 1000:7.3f} ms"
+        f"  mean {statistics.fmean(latencies) * 1000:7.3f} ms"
+    )
@@ -0,0 +1,133 @@
+"""
+Writes under contention: each toggle and edit committing its own transaction
+(TODO_WRITE_MODE = "direct") versus the write-behind queue, which group
+commits the writes arriving within a short window (todo.writebehind).
+
+    python -m benchmarks.writebehind [--threads 16] [--writes 200] [--todos 4]
+        [--window 0.002]
+
+Each thread makes `--writes` writes, toggles and title edits alternately, to
+`--todos` shared todos. Reports writes per second and latency, then checks
+that every write was applied: direct edits read, then save(), so concurrent
+ones can overwrite each other's version bumps ("lost").
+"""
+import argparse
+import threading
+import time
+
+from .utils import benchmark_database, create_user, summarize
+
+
+def toggle_direct(todo_id, owner, n):
+    from todo.models import Todo
+
+    Todo.objects.set_completed(todo_id, owner)
+
+
+def edit_direct(todo_id, owner, n):
+    from todo.models import Todo
+
+    # As TodoRetrieveUpdateDestroyAPIView.put: read, then save().
+    todo = Todo.objects.get(id=todo_id, owner=owner)
+    todo.title = f"Edit {n}"
+    todo.save()
+
+
+def toggle_write_behind(todo_id, owner, n):
+    from todo import writebehind
+
+    writebehind.set_completed(todo_id, owner)
+
+
+def edit_write_behind(todo_id, owner, n):
+    from todo import writebehind
+    from todo.models import Todo
+
+    todo = Todo.objects.get(id=todo_id, owner=owner)
+    writebehind.update(todo, {"title": f"Edit {n}"})
+
+
+MODES = {
+    "direct": (toggle_direct, edit_direct),
+    "write_behind": (toggle_write_behind, edit_write_behind),
+}
+
+
+def run_concurrently(toggle, edit, todo_ids, owner, threads, per_thread):
+    """Returns (writes per second, latencies, failures)."""
+    from django.db import connections
+
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def worker(offset):
+        try:
+            for n in range(per_thread):
+                todo_id = todo_ids[(offset + n) % len(todo_ids)]
+                write = toggle if n % 2 else edit
+                began = time.perf_counter()
+                try:
+                    write(todo_id, owner, n)
+                except Exception as exc:  # e.g. "database is locked"
+                    with lock:
+                        errors.append(exc)
+                    continue
+                elapsed = time.perf_counter() - began
+                with lock:
+                    latencies.append(elapsed)
+        finally:
+            connections.close_all()
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return threads * per_thread / (time.perf_counter() - start), latencies, len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--writes", type=int, default=200, help="Writes per thread.")
+    parser.add_argument("--todos", type=int, default=4, help="Todos written to.")
+    parser.add_argument(
+        "--window", type=float, default=0.002, help="TODO_WRITE_BEHIND_WINDOW."
+    )
+    args = parser.parse_args()
+
+    with benchmark_database():
+        from django.test import override_settings
+
+        from todo.models import Todo
+
+        owner = create_user()
+        total = args.threads * args.writes
+        print(
+            f"{args.threads} threads x {args.writes} writes to {args.todos} todos"
+            f" (window {args.window * 1000:g} ms)"
+        )
+        with override_settings(TODO_WRITE_BEHIND_WINDOW=args.window):
+            for mode, (toggle, edit) in MODES.items():
+                todos = Todo.objects.bulk_create(
+                    Todo(owner=owner, title=mode, description="")
+                    for _ in range(args.todos)
+                )
+                todo_ids = [todo.pk for todo in todos]
+                rate, latencies, failed = run_concurrently(
+                    toggle, edit, todo_ids, owner, args.threads, args.writes
+                )
+                summarize(f"{mode} (writes)", rate, latencies)
+                applied = sum(
+                    version - 1
+                    for version in Todo.objects.filter(pk__in=todo_ids).values_list(
+                        "version", flat=True
+                    )
+                )
+                lost = total - failed - applied
+                print(f"{'':<40} applied {applied:>6}  lost {lost:>6}  failed {failed:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate, pre_migrate
 
 
 class TodoConfig(AppConfig):
@@ -12,3 +13,13 @@ class TodoConfig(AppConfig):
             return self.first_name or self.username
 
         User.add_to_class("__str__", get_display_name)
+
+        from . import receivers  # noqa: F401
+        from .archive import drop_archive_view, ensure_archive_view
+        from .search import ensure_search_triggers
+        from .stats import ensure_stats_triggers
+
+        post_migrate.connect(ensure_search_triggers, sender=self)
+        post_migrate.connect(ensure_stats_triggers, sender=self)
+        pre_migrate.connect(drop_archive_view, sender=self)
+        post_migrate.connect(ensure_archive_view, sender=self)
@@ -0,0 +1,136 @@
+import datetime
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from .models import ArchivedTodo, Todo, TodoWithArchive
+from .signals import batch_todo_changes, notify_todos_changed
+from .transactions import write_atomic
+
+
+# The columns both tables share, in the order of the view.
+ARCHIVE_COLUMNS = [
+    "id",
+    "owner_id",
+    "title",
+    "description",
+    "completed",
+    "date_created",
+    "updated_at",
+    "version",
+]
+
+# Plain SQL that SQLite and PostgreSQL (and MySQL) all accept.
+CREATE_ARCHIVE_VIEW = """
+    CREATE VIEW {view} AS
+    SELECT {columns}, NULL AS archived_at FROM {todos} WHERE deleted_at IS NULL
+    UNION ALL
+    SELECT {columns}, archived_at FROM {archive}
+""".format(
+    view=TodoWithArchive._meta.db_table,
+    columns=", ".join(ARCHIVE_COLUMNS),
+    todos=Todo._meta.db_table,
+    archive=ArchivedTodo._meta.db_table,
+)
+
+DROP_ARCHIVE_VIEW = f"DROP VIEW IF EXISTS {TodoWithArchive._meta.db_table}"
+
+
+def drop_archive_view(using="default", **kwargs):
+    """
+    `pre_migrate` receiver: drop the view while migrations run. SQLite cannot
+    rebuild todo_todo while a view refers to it, and PostgreSQL will not alter
+    a column a view uses.
+    """
+    db = connections[using]
+    if TodoWithArchive._meta.db_table in db.introspection.table_names(include_views=True):
+        with db.schema_editor() as schema_editor:
+            schema_editor.execute(DROP_ARCHIVE_VIEW)
+
+
+def ensure_archive_view(using="default", **kwargs):
+    """`post_migrate` receiver: (re)create the view once both tables exist."""
+    db = connections[using]
+    tables = db.introspection.table_names(include_views=True)
+    if ArchivedTodo._meta.db_table not in tables:
+        return
+    with db.schema_editor() as schema_editor:
+        if TodoWithArchive._meta.db_table in tables:
+            schema_editor.execute(DROP_ARCHIVE_VIEW)
+        schema_editor.execute(CREATE_ARCHIVE_VIEW)
+
+
+def archive_cutoff(days=None, now=None):
+    if days is None:
+        days = getattr(settings, "TODO_ARCHIVE_AFTER_DAYS", 90)
+    return (now or timezone.now()) - datetime.timedelta(days=days)
+
+
+def archive_batch(after_id, cutoff, batch_size, using="default", now=None):
+    """
+    Move the todos completed before `cutoff` among the next `batch_size` ids
+    after `after_id` to the archive table, in one transaction. Returns (the
+    last id looked at, or None past the end of the table; how many todos
+    were archived).
+
+    Walking the primary key keeps each batch to one bounded range scan, with
+    no index on completion times for every write to maintain.
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    columns = ", ".join(quote(column) for column in ARCHIVE_COLUMNS)
+    todos = quote(Todo._meta.db_table)
+    archive = quote(ArchivedTodo._meta.db_table)
+
+    with write_atomic(using=using), batch_todo_changes():
+        window = list(
+            Todo.all_objects.using(using)
+            .select_for_update()
+            .filter(id__gt=after_id)
+            .order_by("id")
+            .values_list("id", "owner_id", "completed", "deleted_at", "updated_at")[
+                :batch_size
+            ]
+        )
+        if not window:
+            return None, 0
+
+        moved = defaultdict(list)
+        for todo_id, owner_id, completed, deleted_at, updated_at in window:
+            if completed and deleted_at is None and updated_at < cutoff:
+                moved[owner_id].append(todo_id)
+        ids = [todo_id for owner_ids in moved.values() for todo_id in owner_ids]
+        if ids:
+            placeholders = ", ".join(["%s"] * len(ids))
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"INSERT INTO {archive} ({columns}, {quote('archived_at')}) "
+                    f"SELECT {columns}, %s FROM {todos} WHERE id IN ({placeholders})",
+                    [now or timezone.now(), *ids],
+                )
+                cursor.execute(f"DELETE FROM {todos} WHERE id IN ({placeholders})", ids)
+            # To clients (lists, the change feed) they are gone like deleted ones.
+            for owner_id, owner_ids in moved.items():
+                notify_todos_changed(Todo, owner_id, deleted=owner_ids)
+    return window[-1][0], len(ids)
+
+
+def archive_todos(days=None, batch_size=500, pause=0.01, using="default", now=None):
+    """
+    Move the todos completed more than `days` (TODO_ARCHIVE_AFTER_DAYS) ago
+    out of the todo table, looking at `batch_size` rows per transaction and
+    pausing `pause` seconds after those that wrote. Returns the number of
+    todos archived.
+    """
+    cutoff = archive_cutoff(days, now)
+    after_id, archived = 0, 0
+    while True:
+        after_id, moved = archive_batch(after_id, cutoff, batch_size, using, now)
+        archived += moved
+        if after_id is None:
+            return archived
+        if pause and moved:
+            time.sleep(pause)
@@ -0,0 +1,23 @@
+from django.urls import path
+
+from . import async_views
+
+
+# The async views, mounted under /async/ (see todoapi/urls.py) so both stacks
+# can be served, and compared, side by side.
+urlpatterns = [
+    path("todos/", async_views.AsyncTodoListCreateView.as_view(), name="async-todo-list"),
+    path(
+        "todos/<int:todo_id>/",
+        async_views.AsyncTodoDetailView.as_view(),
+        name="async-todo-detail",
+    ),
+    path(
+        "todos/<int:todo_id>/complete/",
+        async_views.AsyncTodoCompletedUpdateView.as_view(),
+        name="async-todo-complete-toggle",
+    ),
+    path("register/", async_views.AsyncRegisterView.as_view(), name="async-user-register"),
+    path("login/", async_views.AsyncEmailLoginView.as_view(), name="async-token-obtain-pair"),
+    path("refresh/", async_views.AsyncTokenRefreshView.as_view(), name="async-token-refresh"),
+]
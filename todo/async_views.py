@@ -0,0 +1,430 @@
+import asyncio
+import math
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import aauthenticate, alogin
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework import exceptions, generics, permissions, serializers, status
+from rest_framework.fields import empty
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import AUTH_HEADER_TYPES
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from .authentication import TodoTokenRefreshSerializer
+from .cache import detail_key, response_cache
+from .events import event_data, format_sse, hub
+from .metrics import phase
+from .models import Todo
+from .pagination import AsyncPageNumberPagination, KeysetCursorPagination
+from .serializers import (
+    EmailLoginSerializer,
+    RegisterSerializer,
+    TodoDetailSerializer,
+    TodoSerializer,
+    todo_rows,
+)
+from .throttling import GCRAScopedRateThrottle
+from . import writebehind
+from .versioning import (
+    aget_collection_state,
+    detail_etag,
+    list_etag,
+    matches_detail_etag,
+    not_modified_since,
+)
+from .views import TodoQueryMixin, parse_if_match
+
+
+class AsyncAPIView(APIView):
+    """
+    APIView whose handlers are coroutines. Under ASGI, Django runs a sync view
+    in a worker thread for the whole request, so the size of that thread pool
+    caps how many requests are in progress at once; these run on the event
+    loop and only borrow a thread for each query. Authentication and
+    throttling use the classes' `aauthenticate()` / `aallow_request()` when
+    they have one, and fall back to running the sync method in a thread.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await self.ainitial(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(
+                    self, request.method.lower(), self.http_method_not_allowed
+                )
+            else:
+                handler = self.http_method_not_allowed
+
+            response = await handler(request, *args, **kwargs)
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def options(self, request, *args, **kwargs):
+        return super().options(request, *args, **kwargs)
+
+    async def ainitial(self, request, *args, **kwargs):
+        self.format_kwarg = self.get_format_suffix(**kwargs)
+
+        neg = self.perform_content_negotiation(request)
+        request.accepted_renderer, request.accepted_media_type = neg
+
+        version, scheme = self.determine_version(request, *args, **kwargs)
+        request.version, request.versioning_scheme = version, scheme
+
+        with phase("auth"):
+            await self.aperform_authentication(request)
+            self.check_permissions(request)
+            await self.acheck_throttles(request)
+
+    async def aperform_authentication(self, request):
+        """
+        Request._authenticate(), awaiting each authenticator, so that
+        `request.user` is set before the permission checks touch it.
+        """
+        for authenticator in request.authenticators:
+            try:
+                if hasattr(authenticator, "aauthenticate"):
+                    user_auth_tuple = await authenticator.aauthenticate(request)
+                else:
+                    user_auth_tuple = await sync_to_async(authenticator.authenticate)(
+                        request
+                    )
+            except exceptions.APIException:
+                request._not_authenticated()
+                raise
+
+            if user_auth_tuple is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth_tuple
+                return
+
+        request._not_authenticated()
+
+    async def acheck_throttles(self, request):
+        throttle_durations = []
+        for throttle in self.get_throttles():
+            if hasattr(throttle, "aallow_request"):
+                allowed = await throttle.aallow_request(request, self)
+            else:
+                allowed = await sync_to_async(throttle.allow_request)(request, self)
+            if not allowed:
+                throttle_durations.append(throttle.wait())
+
+        if throttle_durations:
+            durations = [d for d in throttle_durations if d is not None]
+            self.throttled(request, max(durations, default=None))
+
+
+class AsyncGenericAPIView(AsyncAPIView, generics.GenericAPIView):
+    pass
+
+
+## Todo
+class AsyncTodoListCreateView(TodoQueryMixin, AsyncGenericAPIView):
+    """
+    Async `GET/POST /todos/`: same filters, pagination, conditional requests
+    and response cache as the sync view.
+    """
+
+    serializer_class = TodoSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    async def get(self, request):
+        if request.user.is_superuser:
+            return await self.list(request)
+
+        version, updated_at = await aget_collection_state(request.user)
+        etag = list_etag(request, version, updated_at)
+        last_modified = updated_at and int(updated_at.timestamp())
+        not_modified = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if not_modified is not None:
+            return not_modified
+
+        data = await response_cache.aget("list", etag)
+        if data is not None:
+            response = Response(data)
+        else:
+            response = await self.list(request)
+            if response.status_code == status.HTTP_200_OK:
+                await response_cache.aset("list", etag, response.data)
+        response["ETag"] = etag
+        if last_modified:
+            response["Last-Modified"] = http_date(last_modified)
+        return response
+
+    async def list(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        fast = getattr(settings, "TODO_FAST_SERIALIZATION", True)
+        if fast:
+            queryset = todo_rows.values(queryset)
+
+        with phase("paginate"):
+            page = await self.paginator.apaginate_queryset(queryset, request, view=self)
+        if page is not None:
+            return self.get_paginated_response(self.render(page, fast))
+        return Response(self.render([row async for row in queryset], fast))
+
+    def render(self, rows, fast):
+        with phase("serialize"):
+            if fast:
+                return todo_rows.render(rows)
+            return self.get_serializer(rows, many=True).data
+
+    async def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.instance = await Todo.objects.acreate(
+            owner_id=request.user.pk, **serializer.validated_data
+        )
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            params = self.request.query_params
+            if params.get("pagination") == "cursor" or "cursor" in params:
+                self._paginator = KeysetCursorPagination()
+            else:
+                self._paginator = AsyncPageNumberPagination()
+        return self._paginator
+
+
+class AsyncTodoDetailView(AsyncAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    async def get(self, request, todo_id):
+        version, updated_at = await aget_collection_state(request.user)
+        cache_key = detail_key(request.user, todo_id, version, updated_at)
+        cached = await response_cache.aget("detail", cache_key)
+        if cached is None:
+            # Before any 304: the collection's state says nothing about
+            # whether this id is one of the user's todos.
+            todo = await aget_object_or_404(Todo, id=todo_id, owner_id=request.user.pk)
+
+        last_modified = updated_at and int(updated_at.timestamp())
+        if matches_detail_etag(request, todo_id, version) or (
+            "If-None-Match" not in request.headers
+            and not_modified_since(request, last_modified)
+        ):
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+
+        if cached is not None:
+            data, etag = cached
+        else:
+            with phase("serialize"):
+                data = TodoDetailSerializer(todo).data
+            etag = detail_etag(todo, version)
+            await response_cache.aset("detail", cache_key, (data, etag))
+
+        headers = {"ETag": etag}
+        if last_modified:
+            headers["Last-Modified"] = http_date(last_modified)
+        return Response(data, headers=headers)
+
+    async def put(self, request, todo_id):
+        todo = await aget_object_or_404(Todo, id=todo_id, owner_id=request.user.pk)
+        serializer = TodoDetailSerializer(instance=todo, data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        if writebehind.enabled():
+            todo = await writebehind.aupdate(todo, serializer.validated_data)
+            if todo is None:
+                raise Http404
+            serializer.instance = todo
+        else:
+            # ModelSerializer.update(), with the save awaited.
+            for attr, value in serializer.validated_data.items():
+                setattr(todo, attr, value)
+            await todo.asave()
+        return Response(
+            serializer.data, status=status.HTTP_200_OK, headers={"ETag": todo.etag}
+        )
+
+    async def delete(self, request, todo_id):
+        todo = await aget_object_or_404(Todo, id=todo_id, owner_id=request.user.pk)
+        await sync_to_async(todo.soft_delete)()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class AsyncTodoCompletedUpdateView(AsyncAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    async def put(self, request, todo_id):
+        return await self.set_completed(request, todo_id)
+
+    async def patch(self, request, todo_id):
+        field = serializers.BooleanField()
+        try:
+            completed = field.run_validation(request.data.get("completed", empty))
+        except serializers.ValidationError as exc:
+            return Response(
+                {"completed": exc.detail}, status=status.HTTP_400_BAD_REQUEST
+            )
+        return await self.set_completed(request, todo_id, completed)
+
+    async def set_completed(self, request, todo_id, completed=None):
+        version = parse_if_match(request, todo_id)
+        aset_completed = (
+            writebehind.aset_completed
+            if writebehind.enabled()
+            else Todo.objects.aset_completed
+        )
+        todo = await aset_completed(
+            todo_id, request.user, completed=completed, version=version
+        )
+        if todo is None:
+            if version is not None and await Todo.objects.filter(
+                id=todo_id, owner_id=request.user.pk
+            ).aexists():
+                return Response(status=status.HTTP_412_PRECONDITION_FAILED)
+            raise Http404
+
+        return Response(
+            TodoSerializer(todo).data,
+            status=status.HTTP_200_OK,
+            headers={"ETag": todo.etag},
+        )
+
+
+class TodoEventsView(AsyncAPIView):
+    """
+    `GET /todos/events/`: change notifications for the user's todos, so
+    clients hold one mostly idle connection instead of polling the list.
+    Events say which todos were created, updated or deleted; clients fetch
+    them from `/todos/changes/`, and do a full sync on `resync`.
+
+    With `Accept: text/event-stream` under ASGI this is a server-sent events
+    stream with a heartbeat comment every `TODO_EVENTS_HEARTBEAT_SECONDS`,
+    closed after `TODO_EVENTS_STREAM_SECONDS` so the client reconnects (and
+    re-authenticates) with `Last-Event-ID`. Otherwise it is a long poll: it
+    answers as soon as there are events after `?cursor=` (or `Last-Event-ID`),
+    or after `?timeout=` seconds (at most `TODO_EVENTS_LONG_POLL_SECONDS`),
+    as JSON or as one batch of server-sent events. An async view, so that
+    waiting connections hold no thread under ASGI.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_classes = [GCRAScopedRateThrottle]
+    throttle_scope = "events"
+
+    def perform_content_negotiation(self, request, force=False):
+        # No renderer offers text/event-stream; those responses bypass them.
+        return super().perform_content_negotiation(request, force=True)
+
+    async def get(self, request):
+        owner_id = request.user.pk
+        after = hub.read_cursor(
+            request.headers.get("Last-Event-ID") or request.query_params.get("cursor")
+        )
+        longest = getattr(settings, "TODO_EVENTS_LONG_POLL_SECONDS", 25)
+        try:
+            timeout = float(request.query_params.get("timeout", longest))
+        except ValueError:
+            timeout = longest
+        if not math.isfinite(timeout):
+            # NaN would slip through min() and max() and never time out.
+            timeout = longest
+        timeout = min(max(timeout, 0), longest)
+        if after is None:
+            # From now: pinned here, so nothing is missed before the first wait.
+            _, after = hub.read(owner_id, after)
+        sse = "text/event-stream" in request.headers.get("Accept", "")
+
+        if sse and isinstance(request._request, ASGIRequest):
+            return self.stream(owner_id, after)
+
+        events, after = await hub.wait(owner_id, after, timeout)
+        if sse:
+            # Ends after one batch: the client reconnects with Last-Event-ID.
+            body = "retry: 0\n\n" + (format_sse(events) or ": heartbeat\n\n")
+            return HttpResponse(body, content_type="text/event-stream")
+        return Response(
+            {
+                "events": [event_data(kind, ids) for _, kind, ids in events],
+                "cursor": hub.make_cursor(after),
+            }
+        )
+
+    def stream(self, owner_id, after):
+        heartbeat = getattr(settings, "TODO_EVENTS_HEARTBEAT_SECONDS", 15)
+        lifetime = getattr(settings, "TODO_EVENTS_STREAM_SECONDS", 300)
+
+        async def events():
+            nonlocal after
+            loop = asyncio.get_running_loop()
+            closes = loop.time() + lifetime
+            yield "retry: 1000\n\n"
+            while (left := closes - loop.time()) > 0:
+                batch, after = await hub.wait(owner_id, after, min(heartbeat, left))
+                yield format_sse(batch) or ": heartbeat\n\n"
+
+        response = StreamingHttpResponse(events(), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        # Tell nginx not to buffer the stream.
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+
+## User Authentication
+class AsyncRegisterView(AsyncAPIView):
+    permission_classes = [permissions.AllowAny]
+
+    async def post(self, request):
+        serializer = RegisterSerializer(data=request.data)
+        # The email check, the password hash and the inserts are one unit in
+        # the sync serializer; run it as such in the database thread.
+        if not await sync_to_async(serializer.is_valid)():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        await sync_to_async(serializer.save)()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class AsyncEmailLoginView(AsyncAPIView):
+    permission_classes = [permissions.AllowAny]
+
+    async def post(self, request):
+        serializer = EmailLoginSerializer(data=request.data, context={"request": request})
+        attrs = serializer.to_internal_value(request.data)
+        user = await aauthenticate(
+            request, email=attrs["email"], password=attrs["password"]
+        )
+        data = serializer.issue_tokens(user)
+        await alogin(request, data.pop("user"))
+        return Response(data, status=status.HTTP_200_OK)
+
+
+class AsyncTokenRefreshView(AsyncAPIView):
+    permission_classes = ()
+    authentication_classes = ()
+    www_authenticate_realm = "api"
+
+    def get_authenticate_header(self, request):
+        return f'{AUTH_HEADER_TYPES[0]} realm="{self.www_authenticate_realm}"'
+
+    async def post(self, request):
+        serializer = TodoTokenRefreshSerializer(data=request.data)
+        attrs = serializer.to_internal_value(request.data)
+        try:
+            data = await serializer.avalidate(attrs)
+        except TokenError as e:
+            raise InvalidToken(e.args[0]) from e
+        return Response(data, status=status.HTTP_200_OK)
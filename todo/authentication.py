@@ -0,0 +1,247 @@
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+# Claims copied into every token so requests can be authorized without
+# loading the user.
+USER_CLAIMS = ("is_active", "is_staff", "is_superuser")
+# Saving any of these fields revokes the user's outstanding access tokens (as
+# does a full save(), which does not say what changed).
+REVOKING_FIELDS = frozenset({"is_active", "is_staff", "is_superuser", "password"})
+
+
+class TodoRefreshToken(RefreshToken):
+    """
+    Refresh token (and, through it, access token) carrying `USER_CLAIMS`.
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for claim in USER_CLAIMS:
+            token[claim] = getattr(user, claim)
+        return token
+
+
+class LazyTokenUser(TokenUser):
+    """
+    The authenticated user as described by the token's claims. Everything the
+    todo views need (pk, is_active, is_staff, is_superuser) comes straight from
+    the token; any other attribute loads the `User` row on first access.
+    """
+
+    @cached_property
+    def id(self):
+        # TokenUser's is the claim as issued, a string; `User.pk` is an int.
+        return int(self.token[api_settings.USER_ID_CLAIM])
+
+    @cached_property
+    def pk(self):
+        return self.id
+
+    @cached_property
+    def is_active(self):
+        return self.token.get("is_active", False)
+
+    @cached_property
+    def username(self):
+        return self.user.get_username()
+
+    @cached_property
+    def user(self):
+        return User.objects.get(pk=self.pk)
+
+    def __getattr__(self, attr):
+        if attr.startswith("_") or attr in ("token", "user"):
+            raise AttributeError(attr)
+        if attr in self.token:
+            return self.token[attr]
+        return getattr(self.user, attr)
+
+
+class TodoTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Token refresh that re-reads `USER_CLAIMS` from the user, so access tokens
+    never outlive a permission change by more than their own lifetime.
+    """
+
+    token_class = TodoRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        user = User.objects.filter(pk=self.get_user_id(refresh)).first()
+        data = self.reissue(refresh, user)
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            data["refresh"] = self.rotate(refresh)
+        return data
+
+    async def avalidate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        user = await User.objects.filter(pk=self.get_user_id(refresh)).afirst()
+        data = self.reissue(refresh, user)
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            # Blacklisting and outstanding tokens write to the database.
+            data["refresh"] = await sync_to_async(self.rotate)(refresh)
+        return data
+
+    def get_user_id(self, refresh):
+        return refresh.payload.get(api_settings.USER_ID_CLAIM)
+
+    def reissue(self, refresh, user):
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(
+                self.error_messages["no_active_account"], "no_active_account"
+            )
+        for claim in USER_CLAIMS:
+            refresh[claim] = getattr(user, claim)
+        return {"access": str(refresh.access_token)}
+
+    def rotate(self, refresh):
+        """
+        As `TokenRefreshSerializer` with `ROTATE_REFRESH_TOKENS`: a new refresh
+        token (with the re-read claims), blacklisting the old one when
+        `BLACKLIST_AFTER_ROTATION` is set.
+        """
+        if api_settings.BLACKLIST_AFTER_ROTATION:
+            try:
+                refresh.blacklist()
+            except AttributeError:
+                # The token_blacklist app is not installed.
+                pass
+        refresh.set_jti()
+        refresh.set_exp()
+        refresh.set_iat()
+        refresh.outstand()
+        return str(refresh)
+
+
+def revocation_cache():
+    return caches[getattr(settings, "TODO_AUTH_CACHE", "default")]
+
+
+def revocation_key(user_id):
+    return f"todo:auth:revoked:{user_id}"
+
+
+def revoke_tokens(user_id):
+    """
+    Reject every token issued to the user so far. The entry only has to
+    outlive the access tokens it revokes; later logins issue fresh tokens.
+    """
+    lifetime = api_settings.ACCESS_TOKEN_LIFETIME.total_seconds()
+    revocation_cache().set(revocation_key(user_id), time.time(), int(lifetime) + 1)
+
+
+def is_revoked(user_id, issued_at):
+    return revoked_before(revocation_cache().get(revocation_key(user_id)), issued_at)
+
+
+async def ais_revoked(user_id, issued_at):
+    revoked_at = await revocation_cache().aget(revocation_key(user_id))
+    return revoked_before(revoked_at, issued_at)
+
+
+def revoked_before(revoked_at, issued_at):
+    # `iat` has a one-second resolution; a token issued in the same second
+    # as the revocation is rejected too.
+    return revoked_at is not None and (issued_at or 0) <= int(revoked_at)
+
+
+def revoke_on_user_change(sender, instance, created=False, update_fields=None, **kwargs):
+    """
+    `post_save`/`post_delete` receiver for `User`: deactivating, deleting,
+    promoting or demoting a user, or changing their password, revokes their
+    tokens.
+    """
+    if created:
+        return
+    fields = REVOKING_FIELDS if update_fields is None else REVOKING_FIELDS & set(update_fields)
+    # `_password` holds the new raw password until the save completes; it is
+    # None when check_password() merely re-hashes the same one on login.
+    if not fields or (fields == {"password"} and instance._password is None):
+        return
+    revoke_tokens(instance.pk)
+
+
+class StatelessJWTAuthentication(JWTStatelessUserAuthentication):
+    """
+    JWT authentication without the per-request `User` lookup: the user is a
+    `LazyTokenUser` built from the token's claims. Tokens are checked against
+    a short-lived revocation cache instead, filled whenever a user is
+    deactivated, deleted, has their permissions changed or changes their
+    password.
+
+    Tokens issued before the claims were added fall back to the database.
+    """
+
+    def get_user(self, validated_token):
+        user = self.get_token_user(validated_token)
+        if user is None:
+            return self.load_user(validated_token)
+        if is_revoked(user.pk, validated_token.get("iat")):
+            raise AuthenticationFailed(_("Token has been revoked"), code="token_revoked")
+        return user
+
+    def load_user(self, validated_token):
+        try:
+            user = User.objects.get(pk=validated_token[api_settings.USER_ID_CLAIM])
+        except User.DoesNotExist:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        return self.check_active(user)
+
+    async def aauthenticate(self, request):
+        """
+        `authenticate()` for async views: the revocation check and the
+        fallback user lookup are awaited instead of blocking the event loop.
+        """
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user = self.get_token_user(validated_token)
+        if user is None:
+            return await self.aload_user(validated_token)
+        if await ais_revoked(user.pk, validated_token.get("iat")):
+            raise AuthenticationFailed(_("Token has been revoked"), code="token_revoked")
+        return user
+
+    async def aload_user(self, validated_token):
+        try:
+            user = await User.objects.aget(pk=validated_token[api_settings.USER_ID_CLAIM])
+        except User.DoesNotExist:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        return self.check_active(user)
+
+    def get_token_user(self, validated_token):
+        """
+        The `LazyTokenUser` for the token, or None for tokens issued before the
+        claims were added, whose user has to be loaded.
+        """
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+        if not all(claim in validated_token for claim in USER_CLAIMS):
+            return None
+        return self.check_active(api_settings.TOKEN_USER_CLASS(validated_token))
+
+    def check_active(self, user):
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
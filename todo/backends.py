@@ -0,0 +1,109 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import verify_password
+from django.contrib.auth.models import User
+
+from .models import UserEmail, normalize_email
+
+_strict_emails = ContextVar("todo_strict_emails", default=False)
+
+
+class EmailBackend(ModelBackend):
+    """
+    Authenticate by email through the unique `UserEmail` key: one indexed
+    point lookup, whatever the case of the address. Identifiers without an
+    "@" (e.g. an admin's username) go through the usual username lookup.
+    """
+
+    def authenticate(self, request, username=None, password=None, email=None, **kwargs):
+        email = email or username
+        if email is None or password is None:
+            return None
+        if "@" not in email:
+            return super().authenticate(request, username=email, password=password)
+
+        user = get_user_by_email(email)
+        if user is None:
+            # Run the hasher anyway so unknown emails take as long as wrong
+            # passwords (see ModelBackend.authenticate).
+            User().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
+
+    async def aauthenticate(
+        self, request, username=None, password=None, email=None, **kwargs
+    ):
+        email = email or username
+        if email is None or password is None:
+            return None
+        if "@" not in email:
+            return await super().aauthenticate(
+                request, username=email, password=password
+            )
+
+        user = await aget_user_by_email(email)
+        if user is None:
+            await sync_to_async(User().set_password, thread_sensitive=False)(password)
+            return None
+        if await acheck_password(user, password) and self.user_can_authenticate(user):
+            return user
+        return None
+
+
+def get_user_by_email(email):
+    key = normalize_email(email)
+    if not key:
+        return None
+    entry = UserEmail.objects.select_related("user").filter(email=key).first()
+    return entry.user if entry else None
+
+
+async def aget_user_by_email(email):
+    key = normalize_email(email)
+    if not key:
+        return None
+    entry = await UserEmail.objects.select_related("user").filter(email=key).afirst()
+    return entry.user if entry else None
+
+
+async def acheck_password(user, raw_password):
+    """
+    `User.acheck_password()` with the hash computed in a worker thread: it
+    is CPU-bound (and hashlib releases the GIL), so running it on the event
+    loop would stall every other request for its whole duration.
+    """
+    is_correct, must_update = await sync_to_async(
+        verify_password, thread_sensitive=False
+    )(raw_password, user.password)
+    if is_correct and must_update:
+        await sync_to_async(user.set_password, thread_sensitive=False)(raw_password)
+        user._password = None
+        await user.asave(update_fields=["password"])
+    return is_correct
+
+
+def email_taken(email):
+    return UserEmail.objects.filter(email=normalize_email(email)).exists()
+
+
+@contextmanager
+def unique_emails():
+    """
+    Inside the block, saving a user whose email another user already has
+    raises IntegrityError (see `sync_user_email`) instead of leaving the
+    user without a lookup key.
+    """
+    token = _strict_emails.set(True)
+    try:
+        yield
+    finally:
+        _strict_emails.reset(token)
+
+
+def emails_must_be_unique():
+    return _strict_emails.get()
@@ -0,0 +1,82 @@
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .metrics import record_cache
+
+
+class ResponseCache:
+    """
+    Read-through cache for serialized todo responses.
+
+    Keys embed the owner's collection version (see todo.versioning), so any
+    write to an owner's todos makes exactly that owner's entries unreachable
+    while everybody else's stay warm; stale entries age out through the
+    backend's LRU/TTL eviction. The backend is the `CACHES` alias named by
+    `TODO_RESPONSE_CACHE` (None disables caching).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = Counter()
+
+    @property
+    def backend(self):
+        alias = getattr(settings, "TODO_RESPONSE_CACHE", None)
+        return caches[alias] if alias else None
+
+    def get(self, kind, key):
+        backend = self.backend
+        if backend is None:
+            return None
+        value = backend.get(f"todo:{kind}:{key}")
+        self.count(kind, "hit" if value is not None else "miss")
+        return value
+
+    def set(self, kind, key, value):
+        backend = self.backend
+        if backend is not None:
+            backend.set(f"todo:{kind}:{key}", value)
+
+    async def aget(self, kind, key):
+        backend = self.backend
+        if backend is None:
+            return None
+        value = await backend.aget(f"todo:{kind}:{key}")
+        self.count(kind, "hit" if value is not None else "miss")
+        return value
+
+    async def aset(self, kind, key, value):
+        backend = self.backend
+        if backend is not None:
+            await backend.aset(f"todo:{kind}:{key}", value)
+
+    def count(self, kind, outcome):
+        with self._lock:
+            self._counters[(kind, outcome)] += 1
+        record_cache(kind, outcome)
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+        return {
+            kind: {
+                "hits": counters.get((kind, "hit"), 0),
+                "misses": counters.get((kind, "miss"), 0),
+            }
+            for kind in sorted({kind for kind, _ in counters})
+        }
+
+    def reset_stats(self):
+        with self._lock:
+            self._counters.clear()
+
+
+response_cache = ResponseCache()
+
+
+def detail_key(user, todo_id, version, updated_at):
+    stamp = updated_at.timestamp() if updated_at else 0
+    return f"{user.pk}:{version}:{stamp}:{todo_id}"
@@ -0,0 +1,92 @@
+from django.core import signing
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Todo, TodoChange
+
+
+TOKEN_SALT = "todo.changes"
+
+
+def record_changes(sender, owner_id, created=(), updated=(), deleted=(), **kwargs):
+    """
+    `todos_changed` receiver: move the touched todos to the head of the change
+    log, in the same transaction as the write.
+    """
+    changed = [*created, *updated]
+    if not changed and not deleted:
+        return
+
+    now = timezone.now()
+    TodoChange.objects.filter(todo_id__in=[*changed, *deleted]).delete()
+    TodoChange.objects.bulk_create(
+        [
+            TodoChange(owner_id=owner_id, todo_id=todo_id, changed_at=now)
+            for todo_id in dict.fromkeys(changed)
+            if todo_id not in deleted
+        ]
+        + [
+            TodoChange(owner_id=owner_id, todo_id=todo_id, deleted=True, changed_at=now)
+            for todo_id in dict.fromkeys(deleted)
+        ]
+    )
+
+
+def make_token(user, sequence):
+    return signing.dumps({"u": user.pk, "s": sequence}, salt=TOKEN_SALT, compress=True)
+
+
+def read_token(user, token):
+    """
+    Return the change sequence number a token stands for, or raise
+    `signing.BadSignature` if it was tampered with or issued to someone else.
+    """
+    payload = signing.loads(token, salt=TOKEN_SALT)
+    if payload.get("u") != user.pk or not isinstance(payload.get("s"), int):
+        raise signing.BadSignature("Token was not issued to this user.")
+    return payload["s"]
+
+
+def get_changes(user, since=None, limit=100):
+    """
+    Return (todos, deleted_ids, sequence, has_more) for the changes after the
+    `since` sequence number, at most `limit` of them. Without `since` this is a
+    full sync, which has no use for tombstones.
+
+    The cost depends on the number of changes, not on the size of the list:
+    one range scan over the (owner, id) index plus one primary key lookup for
+    the todos that still exist.
+
+    Sequence numbers are assigned at insert time. SQLite serializes writers, so
+    they also commit in order; on databases with concurrent writers a
+    slow transaction can commit a lower number after a client synced past it.
+    """
+    log = TodoChange.objects.filter(owner_id=user.pk).order_by("id")
+    if since is None:
+        log = log.filter(deleted=False)
+    else:
+        log = log.filter(id__gt=since)
+
+    entries = list(log.values_list("id", "todo_id", "deleted")[: limit + 1])
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    alive = [todo_id for _, todo_id, deleted in entries if not deleted]
+    todos = list(Todo.objects.filter(owner_id=user.pk, id__in=alive).order_by("id"))
+    found = {todo.id for todo in todos}
+
+    # Anything that vanished between the log read and the todo read is gone.
+    deleted_ids = [
+        todo_id for _, todo_id, deleted in entries if deleted or todo_id not in found
+    ]
+    if has_more:
+        sequence = entries[-1][0]
+    elif since is None:
+        # A finished full sync is current up to the newest entry, tombstones
+        # included.
+        sequence = TodoChange.objects.filter(owner_id=user.pk).aggregate(
+            sequence=Max("id")
+        )["sequence"] or 0
+    else:
+        sequence = entries[-1][0] if entries else since
+    return todos, deleted_ids, sequence, has_more
@@ -0,0 +1,173 @@
+import asyncio
+import json
+import os
+import threading
+from collections import OrderedDict, deque
+
+from django.conf import settings
+from django.db import transaction
+
+
+# Event types; each carries the ids of the todos concerned. `resync` has no
+# ids: the client missed events and should sync through /todos/changes/.
+EVENT_TYPES = ("created", "updated", "deleted")
+RESYNC = "resync"
+
+
+class Channel:
+    """One user's recent events, and the connections waiting for more."""
+
+    __slots__ = ("events", "floor", "waiters")
+
+    def __init__(self, floor):
+        # (sequence, type, ids), oldest first.
+        self.events = deque()
+        # Events up to this sequence number may have been dropped.
+        self.floor = floor
+        # (loop, asyncio.Event) per waiting connection.
+        self.waiters = set()
+
+
+class EventHub:
+    """
+    In-process pub/sub for todo change notifications, with a channel per user.
+
+    Readers hold a cursor, the sequence number of the last event they saw,
+    rather than a queue of their own: however many connections a user has
+    open, each event is stored once, in a buffer of `TODO_EVENTS_BUFFER`
+    events per user. That buffer is the backpressure: a reader that falls
+    further behind (or one whose cursor is from another process or an
+    evicted channel) gets a single `resync` instead of everything it missed.
+    At most `TODO_EVENTS_MAX_USERS` channels are kept, least recently used
+    first out.
+    """
+
+    def __init__(self):
+        # Tells this process's cursors from those of other processes.
+        self.id = os.urandom(4).hex()
+        self._lock = threading.Lock()
+        self._channels = OrderedDict()
+        self._sequence = 0
+
+    def _channel(self, owner_id):
+        channel = self._channels.get(owner_id)
+        if channel is not None:
+            self._channels.move_to_end(owner_id)
+            return channel
+        channel = self._channels[owner_id] = Channel(self._sequence)
+        limit = getattr(settings, "TODO_EVENTS_MAX_USERS", 10000)
+        while len(self._channels) > limit:
+            _, evicted = self._channels.popitem(last=False)
+            # Wake its readers, who will resync from a new channel.
+            wake(evicted.waiters)
+        return channel
+
+    def make_cursor(self, sequence):
+        return f"{self.id}.{sequence}"
+
+    def read_cursor(self, cursor):
+        """
+        The sequence number in `cursor`; None without one (start from now), -1
+        for one this process did not issue (resync).
+        """
+        if not cursor:
+            return None
+        hub_id, _, sequence = cursor.partition(".")
+        if hub_id != self.id or not sequence.isdigit():
+            return -1
+        return int(sequence)
+
+    def publish(self, owner_id, changes):
+        """Add `changes`, (type, ids) pairs, to the owner's channel."""
+        with self._lock:
+            channel = self._channel(owner_id)
+            for kind, ids in changes:
+                self._sequence += 1
+                channel.events.append((self._sequence, kind, ids))
+            limit = getattr(settings, "TODO_EVENTS_BUFFER", 100)
+            while len(channel.events) > limit:
+                channel.floor = channel.events.popleft()[0]
+            waiters = list(channel.waiters)
+        wake(waiters)
+
+    def read(self, owner_id, after):
+        """
+        ([(sequence, type, ids)], sequence to read after next time) for the
+        owner's events after the sequence number `after` (None: from now).
+        """
+        with self._lock:
+            return self._read(owner_id, after)
+
+    def _read(self, owner_id, after):
+        channel = self._channel(owner_id)
+        if after is None:
+            return [], self._sequence
+        if after < channel.floor or after > self._sequence:
+            return [(self._sequence, RESYNC, None)], self._sequence
+        events = [event for event in channel.events if event[0] > after]
+        return events, events[-1][0] if events else after
+
+    async def wait(self, owner_id, after, timeout):
+        """`read()`, waiting up to `timeout` seconds for an event to arrive."""
+        loop = asyncio.get_running_loop()
+        waiter = (loop, asyncio.Event())
+        with self._lock:
+            events, after = self._read(owner_id, after)
+            if events or timeout <= 0:
+                return events, after
+            channel = self._channels[owner_id]
+            channel.waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter[1].wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._lock:
+                channel.waiters.discard(waiter)
+        return self.read(owner_id, after)
+
+    def clear(self):
+        with self._lock:
+            for channel in self._channels.values():
+                wake(channel.waiters)
+            self._channels.clear()
+
+
+def wake(waiters):
+    for loop, event in waiters:
+        try:
+            loop.call_soon_threadsafe(event.set)
+        except RuntimeError:
+            # The loop closed: that connection is gone.
+            pass
+
+
+hub = EventHub()
+
+
+def publish_changes(sender, owner_id, created=(), updated=(), deleted=(), **kwargs):
+    """
+    `todos_changed` receiver: notify the owner's open connections once the
+    write commits. Completion toggles are `updated` events like other edits.
+    """
+    changes = [
+        (kind, list(dict.fromkeys(ids)))
+        for kind, ids in zip(EVENT_TYPES, (created, updated, deleted))
+        if ids
+    ]
+    if changes:
+        transaction.on_commit(lambda: hub.publish(owner_id, changes))
+
+
+def event_data(kind, ids):
+    return {"type": kind} if ids is None else {"type": kind, "ids": ids}
+
+
+def format_sse(events):
+    """Server-sent events text for `read()`'s events; their ids are cursors."""
+    return "".join(
+        f"id: {hub.make_cursor(sequence)}\n"
+        f"event: {kind}\n"
+        f"data: {json.dumps(event_data(kind, ids))}\n\n"
+        for sequence, kind, ids in events
+    )
@@ -0,0 +1,75 @@
+import abc
+import csv
+from itertools import islice
+
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class ExportRenderer(BaseRenderer, metaclass=abc.ABCMeta):
+    """
+    Renders todo rows for `/todos/export/`. `stream()` yields the encoded
+    output batch by batch so the whole list never sits in memory; `render()`
+    only handles the small payloads DRF renders itself (errors).
+    """
+
+    charset = "utf-8"
+    batch_size = 500
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        items = [data] if isinstance(data, dict) else list(data)
+        names = list(items[0]) if items else []
+        return b"".join([*self.start(names), *self.encode(items)])
+
+    def stream(self, row_serializer, rows):
+        yield from self.start(row_serializer.names)
+        for batch in batches(rows, self.batch_size):
+            yield b"".join(self.encode(row_serializer.render(batch)))
+
+    def start(self, names):
+        return []
+
+    @abc.abstractmethod
+    def encode(self, items):
+        """Yield the encoded bytes of each of `items` (dicts)."""
+
+
+class NDJSONRenderer(ExportRenderer):
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+
+    def encode(self, items):
+        encode = JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+        for item in items:
+            yield encode(item).encode() + b"\n"
+
+
+class Echo:
+    """
+    File-like object for `csv.writer` that hands each row back instead of
+    buffering it.
+    """
+
+    def write(self, value):
+        return value
+
+
+class CSVRenderer(ExportRenderer):
+    media_type = "text/csv"
+    format = "csv"
+
+    def start(self, names):
+        yield csv.writer(Echo()).writerow(names).encode()
+
+    def encode(self, items):
+        writer = csv.writer(Echo())
+        for item in items:
+            yield writer.writerow(item.values()).encode()
@@ -0,0 +1,109 @@
+from operator import attrgetter
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import ISO_8601, fields as drf_fields
+from rest_framework.settings import api_settings
+
+
+def _datetime_handler(field):
+    """
+    Equivalent of `DateTimeField.to_representation` for the default ISO 8601
+    output, without the per-value format and timezone lookups. Returns a
+    factory taking the current timezone, or None if the field is customised.
+    """
+    output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+    if (
+        output_format is None
+        or output_format.lower() != ISO_8601
+        or hasattr(field, "timezone")
+        or not settings.USE_TZ
+    ):
+        return None
+
+    def factory(tz):
+        def represent(value):
+            if isinstance(value, str):
+                return value
+            if timezone.is_aware(value):
+                value = value.astimezone(tz)
+            else:
+                value = field.enforce_timezone(value)
+            value = value.isoformat()
+            if value.endswith("+00:00"):
+                value = value[:-6] + "Z"
+            return value
+
+        return represent
+
+    return factory
+
+
+class RowSerializer:
+    """
+    Precompiled, read-only rendering of a ModelSerializer.
+
+    Built once per serializer class from its declared fields: each field gets
+    a specialised handler when it is a plain DRF field (ints, strings,
+    booleans, ISO 8601 datetimes) and falls back to the field's own
+    `to_representation` otherwise. Rows can be model instances or the named
+    tuples of `.values_list(named=True)`; the output is identical to the
+    serializer's `.data`.
+    """
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        readable = [
+            field
+            for field in serializer_class().fields.values()
+            if not field.write_only
+        ]
+        self.names = [field.field_name for field in readable]
+        self.sources = [field.source for field in readable]
+        if any("." in source or source == "*" for source in self.sources):
+            raise ValueError("RowSerializer only supports plain model fields.")
+        self.getter = attrgetter(*self.sources)
+        self.factories = [self.compile(field) for field in readable]
+
+    def compile(self, field):
+        field_type = type(field)
+        handler = field.to_representation
+        if field_type is drf_fields.IntegerField:
+            handler = int
+        elif field_type is drf_fields.CharField:
+            handler = str
+        elif field_type is drf_fields.BooleanField:
+            handler = bool
+        elif field_type is drf_fields.DateTimeField:
+            factory = _datetime_handler(field)
+            if factory is not None:
+                return factory
+        return lambda tz: handler
+
+    def values(self, queryset):
+        """
+        `queryset` reduced to exactly the declared columns, keeping any
+        annotations (e.g. a search rank) that ordering and pagination use.
+        """
+        return queryset.values_list(
+            *self.sources, *queryset.query.annotations, named=True
+        )
+
+    def render(self, rows):
+        tz = timezone.get_current_timezone()
+        fields = list(zip(self.names, [factory(tz) for factory in self.factories]))
+        getter = self.getter
+        single = len(fields) == 1
+
+        data = []
+        for row in rows:
+            values = getter(row)
+            if single:
+                values = (values,)
+            data.append(
+                {
+                    name: None if value is None else handler(value)
+                    for (name, handler), value in zip(fields, values)
+                }
+            )
+        return data
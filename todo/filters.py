@@ -1,9 +1,10 @@
 import django_filters
 from django_filters import FilterSet
-from .models import Todo
+from .models import Todo, TodoWithArchive
 
 
 class TodoFilter(FilterSet):
+    # Substring matches, unlike the full-text `?search=`.
     title_search = django_filters.CharFilter(
         field_name="title", lookup_expr="icontains"
     )
@@ -14,3 +15,8 @@ class TodoFilter(FilterSet):
     class Meta:
         model = Todo
         fields = ["title_search", "description_search", "completed", "date_created"]
+
+
+class TodoWithArchiveFilter(TodoFilter):
+    class Meta(TodoFilter.Meta):
+        model = TodoWithArchive
@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher,
+    PBKDF2PasswordHasher,
+    ScryptPasswordHasher,
+)
+
+
+# Each hasher keeps Django's algorithm name, so existing hashes still verify;
+# when the configured cost changes, `must_update` notices and the hash is
+# upgraded on the user's next successful login.
+
+
+class TunablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 with `TODO_PBKDF2_ITERATIONS` iterations."""
+
+    @property
+    def iterations(self):
+        return getattr(settings, "TODO_PBKDF2_ITERATIONS", PBKDF2PasswordHasher.iterations)
+
+
+class TunableScryptPasswordHasher(ScryptPasswordHasher):
+    """scrypt with an N of `TODO_SCRYPT_WORK_FACTOR` (a power of two)."""
+
+    @property
+    def work_factor(self):
+        return getattr(
+            settings, "TODO_SCRYPT_WORK_FACTOR", ScryptPasswordHasher.work_factor
+        )
+
+
+class TunableArgon2PasswordHasher(Argon2PasswordHasher):
+    """
+    Argon2id with `TODO_ARGON2_TIME_COST` passes over `TODO_ARGON2_MEMORY_COST`
+    KiB. Needs the optional `argon2-cffi` package.
+    """
+
+    @property
+    def time_cost(self):
+        return getattr(settings, "TODO_ARGON2_TIME_COST", Argon2PasswordHasher.time_cost)
+
+    @property
+    def memory_cost(self):
+        return getattr(
+            settings, "TODO_ARGON2_MEMORY_COST", Argon2PasswordHasher.memory_cost
+        )
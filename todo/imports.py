@@ -0,0 +1,134 @@
+import codecs
+import csv
+import json
+from itertools import islice
+
+from rest_framework import serializers
+
+from .models import Todo
+from .serializers import TodoSerializer
+from .signals import notify_todos_changed
+from .transactions import write_atomic
+
+
+IMPORT_FORMATS = ("ndjson", "csv")
+DEFAULT_BATCH_SIZE = 1000
+# Only the first errors are reported in full; the rest are just counted.
+MAX_REPORTED_ERRORS = 100
+
+
+def guess_format(filename, default="ndjson"):
+    if filename and filename.lower().endswith(".csv"):
+        return "csv"
+    return default
+
+
+INVALID_UTF8 = {"non_field_errors": ["Invalid UTF-8."]}
+
+
+def decode_lines(stream, invalid):
+    """
+    Decode byte lines as UTF-8 (with or without a BOM). Lines that are not
+    valid UTF-8 are decoded with replacement characters and their numbers
+    added to `invalid`, so the rows on them are reported rather than the
+    whole upload failing halfway through.
+    """
+    for number, line in enumerate(stream, 1):
+        if number == 1:
+            line = line.removeprefix(codecs.BOM_UTF8)
+        try:
+            yield line.decode("utf-8")
+        except UnicodeDecodeError:
+            invalid.add(number)
+            yield line.decode("utf-8", "replace")
+
+
+def read_ndjson(lines, invalid):
+    for number, line in enumerate(lines, 1):
+        if number in invalid:
+            yield number, None, INVALID_UTF8
+            continue
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError:
+            yield number, None, {"non_field_errors": ["Invalid JSON."]}
+            continue
+        if not isinstance(item, dict):
+            yield number, None, {"non_field_errors": ["Expected a JSON object."]}
+            continue
+        yield number, item, None
+
+
+def read_csv(lines, invalid):
+    reader = csv.DictReader(lines)
+    reader.fieldnames  # Reads the header.
+    last = reader.line_num
+    for row in reader:
+        # A quoted field can span several lines.
+        first, last = last + 1, reader.line_num
+        if any(number in invalid for number in range(first, last + 1)):
+            yield last, None, INVALID_UTF8
+        else:
+            yield last, row, None
+
+
+def read_rows(stream, format):
+    """
+    Lazily parse an uploaded file (any iterable of byte lines) into
+    `(line number, item, parse errors)` tuples.
+    """
+    if format not in IMPORT_FORMATS:
+        raise ValueError(f"Unsupported import format {format!r}.")
+    invalid = set()
+    lines = decode_lines(stream, invalid)
+    return read_ndjson(lines, invalid) if format == "ndjson" else read_csv(lines, invalid)
+
+
+def validate_rows(rows):
+    """
+    Run every parsed row through `TodoSerializer` validation, yielding
+    `(line number, validated data, errors)`.
+    """
+    serializer = TodoSerializer()
+    for number, item, errors in rows:
+        if errors is None:
+            try:
+                item = serializer.run_validation(item)
+            except serializers.ValidationError as exc:
+                item, errors = None, exc.detail
+        yield number, item, errors
+
+
+def import_todos(owner, stream, format="ndjson", batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Create todos for `owner` from an NDJSON or CSV upload.
+
+    The file is parsed and validated row by row and written with one
+    `bulk_create` per batch, each batch in its own transaction, so memory
+    stays bounded and earlier batches are kept when a later one fails.
+    Invalid rows are skipped and reported with their line number.
+    """
+    report = {"created": 0, "failed": 0, "errors": []}
+    rows = validate_rows(read_rows(stream, format))
+
+    while batch := list(islice(rows, batch_size)):
+        todos = []
+        for number, item, errors in batch:
+            if errors is not None:
+                report["failed"] += 1
+                if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                    report["errors"].append({"line": number, "errors": errors})
+            else:
+                todos.append(Todo(owner_id=owner.pk, **item))
+
+        if todos:
+            with write_atomic():
+                created = Todo.objects.bulk_create(todos, batch_size=batch_size)
+                notify_todos_changed(
+                    Todo, owner.pk, created=[todo.pk for todo in created]
+                )
+            report["created"] += len(created)
+
+    return report
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from todo.archive import archive_todos
+
+
+class Command(BaseCommand):
+    help = (
+        "Move todos completed more than TODO_ARCHIVE_AFTER_DAYS days ago to the "
+        "archive table, in small batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, help="Override TODO_ARCHIVE_AFTER_DAYS."
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.01,
+            help="Seconds to sleep after each batch that archived something.",
+        )
+        parser.add_argument("--database", default="default")
+
+    def handle(self, days, batch_size, pause, database, **options):
+        archived = archive_todos(
+            days=days, batch_size=batch_size, pause=pause, using=database
+        )
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} todos."))
@@ -0,0 +1,125 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.suite import SCENARIOS, TRANSPORTS, compare, run_suite
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the API's list, search, filter, detail, toggle, register and "
+        "login endpoints on a seeded throwaway database, in-process and over "
+        "WSGI/ASGI, and report throughput, latency and queries per request as "
+        "JSON. With --compare, fail on regressions against a stored run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=20)
+        parser.add_argument("--todos-per-user", type=int, default=200)
+        parser.add_argument(
+            "--description-size",
+            type=int,
+            default=200,
+            help="Characters per description.",
+        )
+        parser.add_argument(
+            "--requests", type=int, default=300, help="Requests per scenario."
+        )
+        parser.add_argument(
+            "--auth-requests",
+            type=int,
+            default=20,
+            help="Requests for register and login, which hash a password each.",
+        )
+        parser.add_argument("--concurrency", type=int, default=1)
+        parser.add_argument(
+            "--transport", nargs="+", choices=TRANSPORTS, default=TRANSPORTS
+        )
+        parser.add_argument(
+            "--scenario", nargs="+", choices=SCENARIOS, default=SCENARIOS
+        )
+        parser.add_argument(
+            "--response-cache",
+            action="store_true",
+            help="Keep the response cache on (repeated reads then measure it).",
+        )
+        parser.add_argument(
+            "--output", help="Write the results here instead of to stdout."
+        )
+        parser.add_argument(
+            "--input", help="Compare the results in this file instead of running."
+        )
+        parser.add_argument("--compare", metavar="BASELINE", help="A stored run.")
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.25,
+            help="How much worse latency and throughput may get (default 0.25). "
+            "Queries per request and errors may not grow at all.",
+        )
+
+    def handle(self, **options):
+        if options["input"]:
+            with open(options["input"]) as f:
+                report = json.load(f)
+        else:
+            report = run_suite(
+                users=options["users"],
+                todos_per_user=options["todos_per_user"],
+                description_size=options["description_size"],
+                requests=options["requests"],
+                auth_requests=options["auth_requests"],
+                concurrency=options["concurrency"],
+                transports=options["transport"],
+                scenarios=options["scenario"],
+                response_cache=options["response_cache"],
+                # Progress goes to stderr, so stdout stays valid JSON.
+                log=self.stderr.write,
+            )
+            output = json.dumps(report, indent=2)
+            if options["output"]:
+                with open(options["output"], "w") as f:
+                    f.write(output + "\n")
+            else:
+                self.stdout.write(output)
+
+        if options["compare"]:
+            with open(options["compare"]) as f:
+                baseline = json.load(f)
+            self.compare(baseline, report, options["tolerance"], options["verbosity"])
+
+    def compare(self, baseline, report, tolerance, verbosity=1):
+        dataset = [
+            "users",
+            "todos_per_user",
+            "description_size",
+            "requests",
+            "auth_requests",
+            "concurrency",
+        ]
+        if "meta" in baseline:
+            differing = [
+                key
+                for key in dataset
+                if baseline["meta"].get(key) != report["meta"].get(key)
+            ]
+            if differing:
+                self.stderr.write(
+                    self.style.WARNING(
+                        f"The baseline used a different {', '.join(differing)}."
+                    )
+                )
+
+        regressions = 0
+        for transport, scenario, metric, old, new, regressed in compare(
+            baseline, report, tolerance
+        ):
+            line = f"{transport:<6} {scenario:<9} {metric:<20} {old:>10} -> {new:>10}"
+            if regressed:
+                regressions += 1
+                self.stderr.write(self.style.ERROR(f"{line}  REGRESSION"))
+            elif verbosity > 1:
+                self.stderr.write(line)
+        if regressions:
+            raise CommandError(f"{regressions} regressions against the baseline.")
+        self.stderr.write(self.style.SUCCESS("No regressions."))
@@ -0,0 +1,49 @@
+import sys
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from todo.imports import DEFAULT_BATCH_SIZE, IMPORT_FORMATS, guess_format, import_todos
+
+
+class Command(BaseCommand):
+    help = "Import todos for a user from an NDJSON or CSV file ('-' reads stdin)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--owner", required=True, help="Username or email.")
+        parser.add_argument("--format", choices=IMPORT_FORMATS)
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, path, owner, format, batch_size, **options):
+        user = (
+            User.objects.filter(username=owner).first()
+            or User.objects.filter(email__iexact=owner).first()
+        )
+        if user is None:
+            raise CommandError(f"No user {owner!r}.")
+        if batch_size < 1:
+            raise CommandError("--batch-size must be positive.")
+
+        format = format or guess_format(path)
+        if path == "-":
+            report = import_todos(user, sys.stdin.buffer, format, batch_size)
+        else:
+            try:
+                stream = open(path, "rb")
+            except OSError as exc:
+                raise CommandError(exc)
+            with stream:
+                report = import_todos(user, stream, format, batch_size)
+
+        for error in report["errors"]:
+            messages = "; ".join(
+                f"{field}: {' '.join(map(str, details))}"
+                for field, details in error["errors"].items()
+            )
+            self.stderr.write(f"line {error['line']}: {messages}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {report['created']} todos, skipped {report['failed']}."
+            )
+        )
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from todo.purge import purge_todos
+
+
+class Command(BaseCommand):
+    help = (
+        "Hard-delete todos soft-deleted longer ago than TODO_DELETE_UNDO_SECONDS, "
+        "and those of deleted users, in small batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.01,
+            help="Seconds to sleep between batches, to let other writers in.",
+        )
+        parser.add_argument("--database", default="default")
+
+    def handle(self, batch_size, pause, database, **options):
+        purged = purge_todos(batch_size=batch_size, pause=pause, using=database)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Purged {purged['expired']} deleted todos, "
+                f"{purged['orphaned']} todos and {purged['changes']} change log "
+                f"entries of deleted users."
+            )
+        )
@@ -0,0 +1,30 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from todo.stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the todo stats summary tables from the todos themselves."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--owner", action="append", help="Username or email (repeatable)."
+        )
+        parser.add_argument("--database", default="default")
+
+    def handle(self, owner, database, **options):
+        owner_ids = None
+        if owner:
+            owner_ids = []
+            for name in owner:
+                user = (
+                    User.objects.filter(username=name).first()
+                    or User.objects.filter(email__iexact=name).first()
+                )
+                if user is None:
+                    raise CommandError(f"No user {name!r}.")
+                owner_ids.append(user.pk)
+
+        count = rebuild_stats(owner_ids, using=database)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stats for {count} users."))
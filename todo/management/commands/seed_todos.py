@@ -0,0 +1,83 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from todo.seed import seed_todos
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with generated users and todos for reproducing "
+        "production-scale slowdowns: a few heavy users and a long tail, long-tail "
+        "descriptions, a mix of completed todos and creation dates spread over "
+        "--days days. The same options and --seed give the same data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--todos", type=int, default=1_000_000)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help="Processes generating todos (default: one per CPU).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10_000,
+            help="Rows per insert and per worker transaction.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=100_000,
+            help="Todos per worker file, each merged in one transaction.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--days", type=int, default=730)
+        parser.add_argument(
+            "--skew",
+            type=float,
+            default=1.0,
+            help="Zipf exponent of todos per user; 0 spreads them evenly.",
+        )
+        parser.add_argument("--password", default="seed-password")
+        parser.add_argument("--database", default="default")
+
+    def handle(self, **options):
+        for option in ["users", "workers", "batch_size", "chunk_size", "days"]:
+            if options[option] is not None and options[option] < 1:
+                raise CommandError(f"--{option.replace('_', '-')} must be at least 1.")
+        if options["todos"] < 0:
+            raise CommandError("--todos must not be negative.")
+        prefix = f"seed{options['seed']}-"
+        database = options["database"]
+        if User.objects.using(database).filter(username__startswith=prefix).exists():
+            raise CommandError(
+                f"Users {prefix}*@example.com exist already; pick another --seed."
+            )
+
+        began = time.perf_counter()
+        seed_todos(
+            users=options["users"],
+            todos=options["todos"],
+            workers=options["workers"],
+            batch_size=options["batch_size"],
+            chunk_size=options["chunk_size"],
+            seed=options["seed"],
+            days=options["days"],
+            skew=options["skew"],
+            password=options["password"],
+            using=database,
+            log=self.stdout.write if options["verbosity"] > 1 else None,
+        )
+        seconds = time.perf_counter() - began
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Seeded {options['todos']} todos for {options['users']} users "
+                f"in {seconds:.1f} s ({options['todos'] * 60 / seconds:,.0f} "
+                f"todos/minute). They log in as {prefix}<n>@example.com with "
+                f"password {options['password']!r}."
+            )
+        )
@@ -0,0 +1,56 @@
+import sqlite3
+import time
+from contextlib import closing
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+def copy_sqlite_database(source, target):
+    """
+    Overwrite the `target` alias's SQLite file with a consistent snapshot of
+    the `source` database, through SQLite's online backup API, so that writers
+    on the source carry on meanwhile.
+    """
+    for alias in (source, target):
+        if connections[alias].vendor != "sqlite":
+            raise CommandError(f"{alias!r} is not a SQLite database.")
+    wrapper = connections[source]
+    wrapper.ensure_connection()
+    with closing(sqlite3.connect(connections[target].settings_dict["NAME"])) as copy:
+        wrapper.connection.backup(copy)
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database over its local stand-in replicas "
+        "(TODO_SQLITE_REPLICAS)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "aliases", nargs="*", help="Replica aliases (default: all of them)."
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            help="Keep copying every this many seconds, as a lagging replica would.",
+        )
+
+    def handle(self, aliases, interval, **options):
+        replicas = list(getattr(settings, "TODO_DATABASE_REPLICAS", ()))
+        aliases = aliases or replicas
+        for alias in aliases:
+            if alias not in replicas:
+                raise CommandError(f"{alias!r} is not in TODO_DATABASE_REPLICAS.")
+        if not aliases:
+            raise CommandError("No replicas configured; set TODO_SQLITE_REPLICAS.")
+
+        while True:
+            for alias in aliases:
+                copy_sqlite_database(DEFAULT_DB_ALIAS, alias)
+            self.stdout.write(self.style.SUCCESS(f"Synced {', '.join(aliases)}."))
+            if interval is None:
+                return
+            time.sleep(interval)
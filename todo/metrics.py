@@ -0,0 +1,351 @@
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# The RequestMetrics of the request being handled. A ContextVar rather than a
+# thread local, so it follows async views into the threads running their
+# queries.
+_current = ContextVar("todo_request_metrics", default=None)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self):
+        """(le, cumulative count) pairs, ending with +Inf."""
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            yield format_value(bound), total
+        yield "+Inf", self.count
+
+
+class RequestMetrics:
+    """What one request spent, collected while it runs."""
+
+    __slots__ = ("phase", "queries", "query_seconds", "phases", "cache")
+
+    def __init__(self):
+        self.phase = "other"
+        # phase -> number of queries / seconds in them.
+        self.queries = {}
+        self.query_seconds = {}
+        # phase -> [times entered, seconds spent in it but not in nested ones].
+        self.phases = {}
+        # (kind, outcome) -> count, from the response cache.
+        self.cache = {}
+
+    @property
+    def query_count(self):
+        return sum(self.queries.values())
+
+    def add_query(self, seconds):
+        phase = self.phase
+        self.queries[phase] = self.queries.get(phase, 0) + 1
+        self.query_seconds[phase] = self.query_seconds.get(phase, 0.0) + seconds
+
+
+class Metrics:
+    """
+    Per-route request metrics for this process, rendered in the Prometheus
+    text format. Requests only touch the shared state once, when they finish,
+    under one lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._requests = {}
+            self._latency = {}
+            self._query_counts = {}
+            self._queries = {}
+            self._phases = {}
+            self._cache = {}
+            self._over_budget = {}
+
+    def record(self, route, method, status, seconds, request_metrics):
+        with self._lock:
+            key = (route, method, str(status))
+            self._requests[key] = self._requests.get(key, 0) + 1
+            histogram = self._latency.get((route, method))
+            if histogram is None:
+                histogram = self._latency[(route, method)] = Histogram(LATENCY_BUCKETS)
+            histogram.observe(seconds)
+            histogram = self._query_counts.get(route)
+            if histogram is None:
+                histogram = self._query_counts[route] = Histogram(QUERY_BUCKETS)
+            histogram.observe(request_metrics.query_count)
+            for phase, count in request_metrics.queries.items():
+                totals = self._queries.setdefault((route, phase), [0, 0.0])
+                totals[0] += count
+                totals[1] += request_metrics.query_seconds[phase]
+            for phase, (count, spent) in request_metrics.phases.items():
+                totals = self._phases.setdefault((route, phase), [0, 0.0])
+                totals[0] += count
+                totals[1] += spent
+            for (kind, outcome), count in request_metrics.cache.items():
+                key = (route, kind, outcome)
+                self._cache[key] = self._cache.get(key, 0) + count
+
+    def query_totals(self, route):
+        """(requests, queries) recorded for `route` so far."""
+        with self._lock:
+            histogram = self._query_counts.get(route)
+            if histogram is None:
+                return 0, 0
+            return histogram.count, int(histogram.sum)
+
+    def count_over_budget(self, route):
+        with self._lock:
+            self._over_budget[route] = self._over_budget.get(route, 0) + 1
+
+    def render(self):
+        with self._lock:
+            lines = []
+            family(
+                lines,
+                "todo_http_requests_total",
+                "counter",
+                "Requests handled, by route, method and status.",
+                (
+                    ({"route": r, "method": m, "status": s}, count)
+                    for (r, m, s), count in sorted(self._requests.items())
+                ),
+            )
+            histogram_family(
+                lines,
+                "todo_http_request_duration_seconds",
+                "Request latency, by route and method.",
+                (
+                    ({"route": r, "method": m}, histogram)
+                    for (r, m), histogram in sorted(self._latency.items())
+                ),
+            )
+            histogram_family(
+                lines,
+                "todo_http_request_queries",
+                "Database queries per request, by route.",
+                (
+                    ({"route": r}, histogram)
+                    for r, histogram in sorted(self._query_counts.items())
+                ),
+            )
+            summary_family(
+                lines,
+                "todo_db_query_duration_seconds",
+                "Time in database queries, by route and view phase.",
+                sorted(self._queries.items()),
+            )
+            summary_family(
+                lines,
+                "todo_view_phase_duration_seconds",
+                "Time in each view phase outside nested phases, by route.",
+                sorted(self._phases.items()),
+            )
+            family(
+                lines,
+                "todo_response_cache_requests_total",
+                "counter",
+                "Response cache lookups, by route, kind and outcome.",
+                (
+                    ({"route": r, "kind": k, "outcome": o}, count)
+                    for (r, k, o), count in sorted(self._cache.items())
+                ),
+            )
+            family(
+                lines,
+                "todo_query_budget_exceeded_total",
+                "counter",
+                "Requests that made more queries than their route's budget.",
+                (
+                    ({"route": r}, count)
+                    for r, count in sorted(self._over_budget.items())
+                ),
+            )
+        return "\n".join(lines) + "\n"
+
+
+def format_value(value):
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def format_labels(labels):
+    pairs = []
+    for name, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"')
+        value = value.replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def family(lines, name, kind, help, samples):
+    lines.append(f"# HELP {name} {help}")
+    lines.append(f"# TYPE {name} {kind}")
+    for labels, value in samples:
+        lines.append(f"{name}{format_labels(labels)} {format_value(value)}")
+
+
+def histogram_family(lines, name, help, histograms):
+    lines.append(f"# HELP {name} {help}")
+    lines.append(f"# TYPE {name} histogram")
+    for labels, histogram in histograms:
+        for le, count in histogram.samples():
+            lines.append(f"{name}_bucket{format_labels({**labels, 'le': le})} {count}")
+        lines.append(f"{name}_sum{format_labels(labels)} {format_value(histogram.sum)}")
+        lines.append(f"{name}_count{format_labels(labels)} {histogram.count}")
+
+
+def summary_family(lines, name, help, totals):
+    lines.append(f"# HELP {name} {help}")
+    lines.append(f"# TYPE {name} summary")
+    for (route, phase), (count, seconds) in totals:
+        labels = format_labels({"route": route, "phase": phase})
+        lines.append(f"{name}_sum{labels} {format_value(seconds)}")
+        lines.append(f"{name}_count{labels} {count}")
+
+
+metrics = Metrics()
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Execute wrapper (see `connection.execute_wrapper()`) timing each query
+    into the current request's metrics. Installed on every connection by
+    `install_query_recorder`.
+    """
+    request_metrics = _current.get()
+    if request_metrics is None:
+        return execute(sql, params, many, context)
+    began = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        request_metrics.add_query(time.perf_counter() - began)
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """
+    `connection_created` receiver. The wrapper goes first, so that code
+    popping its own `execute_wrapper()` off the end never removes it.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+def record_cache(kind, outcome):
+    request_metrics = _current.get()
+    if request_metrics is not None:
+        key = (kind, outcome)
+        request_metrics.cache[key] = request_metrics.cache.get(key, 0) + 1
+
+
+@contextmanager
+def phase(name):
+    """
+    Attribute the time spent and the queries made inside the block to the
+    view phase `name` (nested phases are taken out of the outer one's time).
+    """
+    request_metrics = _current.get()
+    if request_metrics is None:
+        yield
+        return
+    outer = request_metrics.phase
+    request_metrics.phase = name
+    began = time.perf_counter()
+    try:
+        yield
+    finally:
+        spent = time.perf_counter() - began
+        request_metrics.phase = outer
+        phases = request_metrics.phases
+        totals = phases.setdefault(name, [0, 0.0])
+        totals[0] += 1
+        totals[1] += spent
+        if outer in phases:
+            phases[outer][1] -= spent
+
+
+def start_request():
+    """Start collecting a request's metrics; pass the result to `finish_request`."""
+    return time.perf_counter(), _current.set(RequestMetrics())
+
+
+def finish_request(request, response, started):
+    began, token = started
+    seconds = time.perf_counter() - began
+    request_metrics = _current.get()
+    _current.reset(token)
+
+    match = getattr(request, "resolver_match", None)
+    route = match.route if match is not None else "unmatched"
+    metrics.record(
+        route, request.method, response.status_code, seconds, request_metrics
+    )
+    check_query_budget(route, request_metrics.query_count)
+
+
+def check_query_budget(route, queries):
+    """
+    Flag requests making more queries than `TODO_QUERY_BUDGETS` allows their
+    route, as an N+1 query usually does: a warning, or an exception when
+    `TODO_QUERY_BUDGET_STRICT` is on (as under `manage.py test`).
+    """
+    budget = getattr(settings, "TODO_QUERY_BUDGETS", {}).get(route)
+    if budget is None or queries <= budget:
+        return
+    metrics.count_over_budget(route)
+    message = f"{route} made {queries} queries, over its budget of {budget}."
+    if getattr(settings, "TODO_QUERY_BUDGET_STRICT", False):
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+
+class MetricsMixin:
+    """
+    Time the phases of an APIView request: authentication, permissions and
+    throttling (`auth`), filtering and pagination. Views mark their
+    serialization with `phase("serialize")`.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        with phase("auth"):
+            super().initial(request, *args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        with phase("filter"):
+            return super().filter_queryset(queryset)
+
+    def paginate_queryset(self, queryset):
+        with phase("paginate"):
+            return super().paginate_queryset(queryset)
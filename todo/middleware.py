@@ -0,0 +1,52 @@
+from asgiref.sync import iscoroutinefunction
+from django.utils.decorators import sync_and_async_middleware
+
+from .metrics import finish_request, start_request
+from .routers import routing_context
+
+
+@sync_and_async_middleware
+def metrics_middleware(get_response):
+    """
+    Record each request's latency, queries and cache lookups per route, for
+    `/metrics`. Goes first in MIDDLEWARE, so the other middleware is timed too.
+    """
+    if iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            started = start_request()
+            response = await get_response(request)
+            finish_request(request, response, started)
+            return response
+
+    else:
+
+        def middleware(request):
+            started = start_request()
+            response = get_response(request)
+            finish_request(request, response, started)
+            return response
+
+    return middleware
+
+
+@sync_and_async_middleware
+def replica_routing_middleware(get_response):
+    """
+    Let `ReplicaRouter` route the request's todo reads to the replicas. DRF
+    sets `request.user` before the views query anything, which is how the
+    router finds out whether the user wrote recently.
+    """
+    if iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            with routing_context(request):
+                return await get_response(request)
+
+    else:
+
+        def middleware(request):
+            with routing_context(request):
+                return get_response(request)
+
+    return middleware
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0002_todo_owner'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(fields=['owner', 'date_created', 'id'], name='todo_owner_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(fields=['owner', 'title', 'id'], name='todo_owner_title_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(fields=['owner', 'completed', 'id'], name='todo_owner_completed_id_idx'),
+        ),
+    ]
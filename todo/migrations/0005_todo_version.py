@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0004_todo_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='todo',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
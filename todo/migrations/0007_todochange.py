@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:28
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_changes(apps, schema_editor):
+    # Existing todos become "changed" entries so a first sync picks them up.
+    Todo = apps.get_model("todo", "Todo")
+    TodoChange = apps.get_model("todo", "TodoChange")
+    rows = Todo.objects.order_by("id").values_list("id", "owner_id", "updated_at")
+    TodoChange.objects.bulk_create(
+        (
+            TodoChange(todo_id=todo_id, owner_id=owner_id, changed_at=updated_at)
+            for todo_id, owner_id, updated_at in rows.iterator(chunk_size=2000)
+        ),
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0006_todo_updated_at_collection_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TodoChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('todo_id', models.BigIntegerField(unique=True)),
+                ('deleted', models.BooleanField(default=False)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='todo_changes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['owner', 'id'], name='todo_change_owner_seq_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_changes, migrations.RunPython.noop),
+    ]
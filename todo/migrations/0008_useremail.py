@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_emails(apps, schema_editor):
+    # Only the oldest of several accounts whose emails differ just in case
+    # gets the key; the others can still log in by username.
+    User = apps.get_model("auth", "User")
+    UserEmail = apps.get_model("todo", "UserEmail")
+    seen = set()
+    batch = []
+    rows = User.objects.exclude(email="").order_by("id").values_list("id", "email")
+    for user_id, email in rows.iterator(chunk_size=2000):
+        key = email.strip().lower()
+        if key and key not in seen:
+            seen.add(key)
+            batch.append(UserEmail(user_id=user_id, email=key))
+        if len(batch) >= 2000:
+            UserEmail.objects.bulk_create(batch)
+            batch = []
+    UserEmail.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('todo', '0007_todochange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserEmail',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='email_key', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('email', models.CharField(max_length=254, unique=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_emails, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,169 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:53
+
+import datetime
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+
+# Frozen copies of the trigger definitions in todo.stats as of this
+# migration (before soft deletes), so that later changes to that module do
+# not change what this migration does.
+SQLITE_STATS_SCHEMA = [
+    """
+    CREATE TRIGGER IF NOT EXISTS todo_stats_ai AFTER INSERT ON todo_todo BEGIN
+        INSERT INTO todo_todostats (owner_id, total, completed)
+        VALUES (new.owner_id, 1, new.completed)
+        ON CONFLICT (owner_id) DO UPDATE
+        SET total = total + 1, completed = completed + excluded.completed;
+        INSERT INTO todo_tododailystats (owner_id, day, created)
+        VALUES (new.owner_id, date(new.date_created), 1)
+        ON CONFLICT (owner_id, day) DO UPDATE SET created = created + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS todo_stats_ad AFTER DELETE ON todo_todo BEGIN
+        UPDATE todo_todostats
+        SET total = total - 1, completed = completed - old.completed
+        WHERE owner_id = old.owner_id;
+        UPDATE todo_tododailystats SET created = created - 1
+        WHERE owner_id = old.owner_id AND day = date(old.date_created);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS todo_stats_au AFTER UPDATE OF completed ON todo_todo
+    WHEN old.completed <> new.completed BEGIN
+        UPDATE todo_todostats SET completed = completed + new.completed - old.completed
+        WHERE owner_id = new.owner_id;
+    END
+    """,
+]
+
+SQLITE_STATS_TEARDOWN = [
+    "DROP TRIGGER IF EXISTS todo_stats_ai",
+    "DROP TRIGGER IF EXISTS todo_stats_ad",
+    "DROP TRIGGER IF EXISTS todo_stats_au",
+]
+
+POSTGRES_STATS_SCHEMA = [
+    """
+    CREATE OR REPLACE FUNCTION todo_stats_sync() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            INSERT INTO todo_todostats (owner_id, total, completed)
+            VALUES (NEW.owner_id, 1, NEW.completed::int)
+            ON CONFLICT (owner_id) DO UPDATE
+            SET total = todo_todostats.total + 1,
+                completed = todo_todostats.completed + EXCLUDED.completed;
+            INSERT INTO todo_tododailystats (owner_id, day, created)
+            VALUES (NEW.owner_id, (NEW.date_created AT TIME ZONE 'UTC')::date, 1)
+            ON CONFLICT (owner_id, day) DO UPDATE
+            SET created = todo_tododailystats.created + 1;
+        ELSIF TG_OP = 'DELETE' THEN
+            UPDATE todo_todostats
+            SET total = total - 1, completed = completed - OLD.completed::int
+            WHERE owner_id = OLD.owner_id;
+            UPDATE todo_tododailystats SET created = created - 1
+            WHERE owner_id = OLD.owner_id
+            AND day = (OLD.date_created AT TIME ZONE 'UTC')::date;
+        ELSIF NEW.completed IS DISTINCT FROM OLD.completed THEN
+            UPDATE todo_todostats
+            SET completed = completed + NEW.completed::int - OLD.completed::int
+            WHERE owner_id = NEW.owner_id;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS todo_stats_sync ON todo_todo",
+    """
+    CREATE TRIGGER todo_stats_sync
+    AFTER INSERT OR DELETE OR UPDATE OF completed ON todo_todo
+    FOR EACH ROW EXECUTE FUNCTION todo_stats_sync()
+    """,
+]
+
+POSTGRES_STATS_TEARDOWN = [
+    "DROP TRIGGER IF EXISTS todo_stats_sync ON todo_todo",
+    "DROP FUNCTION IF EXISTS todo_stats_sync()",
+]
+
+
+def fill_stats(apps, using):
+    """The summary tables, counted from the todos as this migration sees them."""
+    Todo = apps.get_model("todo", "Todo")
+    TodoStats = apps.get_model("todo", "TodoStats")
+    TodoDailyStats = apps.get_model("todo", "TodoDailyStats")
+    todos = Todo.objects.using(using).order_by()
+    TodoStats.objects.using(using).bulk_create(
+        (
+            TodoStats(owner_id=row["owner_id"], total=row["total"], completed=row["done"])
+            for row in todos.values("owner_id").annotate(
+                total=Count("id"), done=Count("id", filter=Q(completed=True))
+            )
+        ),
+        batch_size=1000,
+    )
+    TodoDailyStats.objects.using(using).bulk_create(
+        (
+            TodoDailyStats(owner_id=row["owner_id"], day=row["day"], created=row["created"])
+            for row in todos.annotate(
+                day=TruncDate("date_created", tzinfo=datetime.timezone.utc)
+            )
+            .values("owner_id", "day")
+            .annotate(created=Count("id"))
+        ),
+        batch_size=1000,
+    )
+
+
+def install_stats_triggers(schema_editor):
+    statements = {"sqlite": SQLITE_STATS_SCHEMA, "postgresql": POSTGRES_STATS_SCHEMA}
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def create_stats_triggers(apps, schema_editor):
+    install_stats_triggers(schema_editor)
+    fill_stats(apps, schema_editor.connection.alias)
+
+
+def drop_stats_triggers(apps, schema_editor):
+    statements = {"sqlite": SQLITE_STATS_TEARDOWN, "postgresql": POSTGRES_STATS_TEARDOWN}
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('todo', '0008_useremail'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TodoStats',
+            fields=[
+                ('owner', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='todo_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total', models.BigIntegerField(default=0)),
+                ('completed', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TodoDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('created', models.BigIntegerField(default=0)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='todo_daily_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('owner', 'day'), name='todo_daily_stats_owner_day_uniq')],
+            },
+        ),
+        migrations.RunPython(create_stats_triggers, drop_stats_triggers),
+    ]
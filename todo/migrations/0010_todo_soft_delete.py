@@ -0,0 +1,213 @@
+# Generated by Django 5.2.8 on 2026-10-18 20:21
+
+import importlib
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Frozen copies of the trigger definitions in todo.stats as of this
+# migration, so that later changes to that module do not change what this
+# migration does. Only live todos count: a soft delete subtracts the todo
+# like a delete and a restore adds it back like an insert.
+SQLITE_ADD_TODO = """
+        INSERT INTO todo_todostats (owner_id, total, completed)
+        VALUES (new.owner_id, 1, new.completed)
+        ON CONFLICT (owner_id) DO UPDATE
+        SET total = total + 1, completed = completed + excluded.completed;
+        INSERT INTO todo_tododailystats (owner_id, day, created)
+        VALUES (new.owner_id, date(new.date_created), 1)
+        ON CONFLICT (owner_id, day) DO UPDATE SET created = created + 1;
+"""
+
+SQLITE_REMOVE_TODO = """
+        UPDATE todo_todostats
+        SET total = total - 1, completed = completed - old.completed
+        WHERE owner_id = old.owner_id;
+        UPDATE todo_tododailystats SET created = created - 1
+        WHERE owner_id = old.owner_id AND day = date(old.date_created);
+"""
+
+SQLITE_STATS_SCHEMA = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS todo_stats_ai AFTER INSERT ON todo_todo
+    WHEN new.deleted_at IS NULL BEGIN {SQLITE_ADD_TODO}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS todo_stats_ad AFTER DELETE ON todo_todo
+    WHEN old.deleted_at IS NULL BEGIN {SQLITE_REMOVE_TODO}
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS todo_stats_au AFTER UPDATE OF completed ON todo_todo
+    WHEN old.completed <> new.completed
+    AND old.deleted_at IS NULL AND new.deleted_at IS NULL BEGIN
+        UPDATE todo_todostats SET completed = completed + new.completed - old.completed
+        WHERE owner_id = new.owner_id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS todo_stats_soft_delete AFTER UPDATE OF deleted_at
+    ON todo_todo WHEN old.deleted_at IS NULL AND new.deleted_at IS NOT NULL
+    BEGIN {SQLITE_REMOVE_TODO}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS todo_stats_restore AFTER UPDATE OF deleted_at
+    ON todo_todo WHEN old.deleted_at IS NOT NULL AND new.deleted_at IS NULL
+    BEGIN {SQLITE_ADD_TODO}
+    END
+    """,
+]
+
+SQLITE_STATS_TEARDOWN = [
+    "DROP TRIGGER IF EXISTS todo_stats_ai",
+    "DROP TRIGGER IF EXISTS todo_stats_ad",
+    "DROP TRIGGER IF EXISTS todo_stats_au",
+    "DROP TRIGGER IF EXISTS todo_stats_soft_delete",
+    "DROP TRIGGER IF EXISTS todo_stats_restore",
+]
+
+POSTGRES_ADD_TODO = """
+            INSERT INTO todo_todostats (owner_id, total, completed)
+            VALUES (NEW.owner_id, 1, NEW.completed::int)
+            ON CONFLICT (owner_id) DO UPDATE
+            SET total = todo_todostats.total + 1,
+                completed = todo_todostats.completed + EXCLUDED.completed;
+            INSERT INTO todo_tododailystats (owner_id, day, created)
+            VALUES (NEW.owner_id, (NEW.date_created AT TIME ZONE 'UTC')::date, 1)
+            ON CONFLICT (owner_id, day) DO UPDATE
+            SET created = todo_tododailystats.created + 1;
+"""
+
+POSTGRES_REMOVE_TODO = """
+            UPDATE todo_todostats
+            SET total = total - 1, completed = completed - OLD.completed::int
+            WHERE owner_id = OLD.owner_id;
+            UPDATE todo_tododailystats SET created = created - 1
+            WHERE owner_id = OLD.owner_id
+            AND day = (OLD.date_created AT TIME ZONE 'UTC')::date;
+"""
+
+POSTGRES_STATS_SCHEMA = [
+    f"""
+    CREATE OR REPLACE FUNCTION todo_stats_sync() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            IF NEW.deleted_at IS NULL THEN {POSTGRES_ADD_TODO}
+            END IF;
+        ELSIF TG_OP = 'DELETE' THEN
+            IF OLD.deleted_at IS NULL THEN {POSTGRES_REMOVE_TODO}
+            END IF;
+        ELSIF OLD.deleted_at IS NULL AND NEW.deleted_at IS NOT NULL THEN
+            {POSTGRES_REMOVE_TODO}
+        ELSIF OLD.deleted_at IS NOT NULL AND NEW.deleted_at IS NULL THEN
+            {POSTGRES_ADD_TODO}
+        ELSIF NEW.deleted_at IS NULL
+        AND NEW.completed IS DISTINCT FROM OLD.completed THEN
+            UPDATE todo_todostats
+            SET completed = completed + NEW.completed::int - OLD.completed::int
+            WHERE owner_id = NEW.owner_id;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS todo_stats_sync ON todo_todo",
+    """
+    CREATE TRIGGER todo_stats_sync
+    AFTER INSERT OR DELETE OR UPDATE ON todo_todo
+    FOR EACH ROW EXECUTE FUNCTION todo_stats_sync()
+    """,
+]
+
+POSTGRES_STATS_TEARDOWN = [
+    "DROP TRIGGER IF EXISTS todo_stats_sync ON todo_todo",
+    "DROP FUNCTION IF EXISTS todo_stats_sync()",
+]
+
+
+def install_stats_triggers(schema_editor):
+    statements = {"sqlite": SQLITE_STATS_SCHEMA, "postgresql": POSTGRES_STATS_SCHEMA}
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def remove_stats_triggers(schema_editor):
+    statements = {"sqlite": SQLITE_STATS_TEARDOWN, "postgresql": POSTGRES_STATS_TEARDOWN}
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def replace_stats_triggers(apps, schema_editor):
+    # The triggers now skip soft-deleted todos.
+    remove_stats_triggers(schema_editor)
+    install_stats_triggers(schema_editor)
+
+
+def drop_stats_triggers(apps, schema_editor):
+    remove_stats_triggers(schema_editor)
+
+
+def restore_stats_triggers(apps, schema_editor):
+    # Back to 0009's triggers, which know nothing of soft deletes. Run last
+    # when unapplying, after SQLite's rebuilds of todo_todo dropped triggers.
+    previous = importlib.import_module("todo.migrations.0009_todo_stats")
+    previous.install_stats_triggers(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0009_todo_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, restore_stats_triggers),
+        migrations.RemoveIndex(
+            model_name='todo',
+            name='todo_owner_created_id_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='todo',
+            name='todo_owner_title_id_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='todo',
+            name='todo_owner_completed_id_idx',
+        ),
+        migrations.AddField(
+            model_name='todo',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='todo',
+            name='owner',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='todos', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='todochange',
+            name='owner',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='todo_changes', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['owner', 'date_created', 'id'], name='todo_owner_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['owner', 'title', 'id'], name='todo_owner_title_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['owner', 'completed', 'id'], name='todo_owner_completed_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', False)), fields=['deleted_at'], name='todo_deleted_at_idx'),
+        ),
+        migrations.RunPython(replace_stats_triggers, drop_stats_triggers),
+    ]
@@ -0,0 +1,147 @@
+# Generated by Django 5.2.8 on 2026-10-18 20:29
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+# Frozen copies of the trigger definitions in todo.stats as of this
+# migration, so that later changes to that module do not change what this
+# migration does. Archived todos still count: moving a todo to
+# todo_archivedtodo removes it from todo_todo and adds it here, which nets out.
+SQLITE_ARCHIVE_STATS_SCHEMA = [
+    """
+    CREATE TRIGGER IF NOT EXISTS todo_stats_archive_ai AFTER INSERT
+    ON todo_archivedtodo BEGIN
+        INSERT INTO todo_todostats (owner_id, total, completed)
+        VALUES (new.owner_id, 1, new.completed)
+        ON CONFLICT (owner_id) DO UPDATE
+        SET total = total + 1, completed = completed + excluded.completed;
+        INSERT INTO todo_tododailystats (owner_id, day, created)
+        VALUES (new.owner_id, date(new.date_created), 1)
+        ON CONFLICT (owner_id, day) DO UPDATE SET created = created + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS todo_stats_archive_ad AFTER DELETE
+    ON todo_archivedtodo BEGIN
+        UPDATE todo_todostats
+        SET total = total - 1, completed = completed - old.completed
+        WHERE owner_id = old.owner_id;
+        UPDATE todo_tododailystats SET created = created - 1
+        WHERE owner_id = old.owner_id AND day = date(old.date_created);
+    END
+    """,
+]
+
+SQLITE_ARCHIVE_STATS_TEARDOWN = [
+    "DROP TRIGGER IF EXISTS todo_stats_archive_ai",
+    "DROP TRIGGER IF EXISTS todo_stats_archive_ad",
+]
+
+POSTGRES_ARCHIVE_STATS_SCHEMA = [
+    """
+    CREATE OR REPLACE FUNCTION todo_stats_archive_sync() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            INSERT INTO todo_todostats (owner_id, total, completed)
+            VALUES (NEW.owner_id, 1, NEW.completed::int)
+            ON CONFLICT (owner_id) DO UPDATE
+            SET total = todo_todostats.total + 1,
+                completed = todo_todostats.completed + EXCLUDED.completed;
+            INSERT INTO todo_tododailystats (owner_id, day, created)
+            VALUES (NEW.owner_id, (NEW.date_created AT TIME ZONE 'UTC')::date, 1)
+            ON CONFLICT (owner_id, day) DO UPDATE
+            SET created = todo_tododailystats.created + 1;
+        ELSE
+            UPDATE todo_todostats
+            SET total = total - 1, completed = completed - OLD.completed::int
+            WHERE owner_id = OLD.owner_id;
+            UPDATE todo_tododailystats SET created = created - 1
+            WHERE owner_id = OLD.owner_id
+            AND day = (OLD.date_created AT TIME ZONE 'UTC')::date;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS todo_stats_archive_sync ON todo_archivedtodo",
+    """
+    CREATE TRIGGER todo_stats_archive_sync
+    AFTER INSERT OR DELETE ON todo_archivedtodo
+    FOR EACH ROW EXECUTE FUNCTION todo_stats_archive_sync()
+    """,
+]
+
+POSTGRES_ARCHIVE_STATS_TEARDOWN = [
+    "DROP TRIGGER IF EXISTS todo_stats_archive_sync ON todo_archivedtodo",
+    "DROP FUNCTION IF EXISTS todo_stats_archive_sync()",
+]
+
+
+def create_archive_stats_triggers(apps, schema_editor):
+    statements = {
+        "sqlite": SQLITE_ARCHIVE_STATS_SCHEMA,
+        "postgresql": POSTGRES_ARCHIVE_STATS_SCHEMA,
+    }
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def drop_archive_stats_triggers(apps, schema_editor):
+    statements = {
+        "sqlite": SQLITE_ARCHIVE_STATS_TEARDOWN,
+        "postgresql": POSTGRES_ARCHIVE_STATS_TEARDOWN,
+    }
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0010_todo_soft_delete'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    # TodoWithArchive's view is created after every migrate instead, by
+    # todo.archive.ensure_archive_view, so it never blocks a table rebuild.
+    operations = [
+        migrations.CreateModel(
+            name='TodoWithArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=100)),
+                ('description', models.TextField()),
+                ('completed', models.BooleanField()),
+                ('date_created', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('version', models.PositiveIntegerField()),
+                ('archived_at', models.DateTimeField(null=True)),
+            ],
+            options={
+                'db_table': 'todo_todowitharchive',
+                'ordering': ['-date_created'],
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedTodo',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=100)),
+                ('description', models.TextField()),
+                ('completed', models.BooleanField(default=True)),
+                ('date_created', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('version', models.PositiveIntegerField(default=1)),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('owner', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='archived_todos', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-date_created'],
+                'indexes': [models.Index(fields=['owner', 'date_created', 'id'], name='todo_archived_owner_idx')],
+            },
+        ),
+        migrations.RunPython(create_archive_stats_triggers, drop_archive_stats_triggers),
+    ]
@@ -1,17 +1,351 @@
-from django.db import models
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.db import models, connections
+from django.db.models import F, Q
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+from .signals import batch_todo_changes, notify_todos_changed
+from .transactions import write_atomic
+
+
+class TodoQuerySet(models.QuerySet):
+    def set_completed(self, todo_id, owner, completed=None, version=None):
+        """
+        Flip (or, with `completed`, set) the completion state of one todo in a
+        single `UPDATE ... RETURNING` scoped to its owner and optionally to an
+        expected `version`. Returns the updated Todo, or None when no row matched.
+        """
+        # A write: route it (and the raw queryset reading the RETURNING row)
+        # like update() would, not to a read replica.
+        self._for_write = True
+        connection = connections[self.db]
+        table = connection.ops.quote_name(Todo._meta.db_table)
+        if completed is None:
+            assignment, params = "completed = NOT completed", []
+        else:
+            assignment, params = "completed = %s", [completed]
+        assignment += ", version = version + 1, updated_at = %s"
+        params.append(timezone.now())
+        where = "id = %s AND owner_id = %s AND deleted_at IS NULL"
+        params += [todo_id, owner.pk]
+        if version is not None:
+            where += " AND version = %s"
+            params.append(version)
+
+        if connection.vendor in ("sqlite", "postgresql") and (
+            connection.features.can_return_columns_from_insert
+        ):
+            columns = ", ".join(
+                connection.ops.quote_name(field.column)
+                for field in Todo._meta.concrete_fields
+            )
+            sql = f"UPDATE {table} SET {assignment} WHERE {where} RETURNING {columns}"
+            with write_atomic(using=self.db):
+                todo = next(iter(self.raw(sql, params)), None)
+                if todo is not None:
+                    notify_todos_changed(Todo, todo.owner_id, updated=[todo.pk])
+                return todo
+
+        # Databases without UPDATE ... RETURNING: update, then read back.
+        with write_atomic(using=self.db):
+            with connection.cursor() as cursor:
+                cursor.execute(f"UPDATE {table} SET {assignment} WHERE {where}", params)
+                if not cursor.rowcount:
+                    return None
+            notify_todos_changed(Todo, owner.pk, updated=[todo_id])
+            return self.get(id=todo_id)
+
+    async def aset_completed(self, todo_id, owner, completed=None, version=None):
+        # Like Django's own a*() queryset methods: the UPDATE and its
+        # transaction run together in the thread that owns the connection.
+        return await sync_to_async(self.set_completed)(
+            todo_id, owner, completed=completed, version=version
+        )
+
+    def soft_delete(self):
+        """
+        Mark the todos deleted in one UPDATE. They disappear from
+        `Todo.objects` at once and are hard-deleted by `manage.py purge_todos`
+        after the undo window. Returns the number of todos deleted.
+        """
+        now = timezone.now()
+        # The rows are read to be written: from the primary, not a replica.
+        self._for_write = True
+        with write_atomic(using=self.db), batch_todo_changes():
+            rows = list(
+                self.filter(deleted_at__isnull=True)
+                .order_by()
+                .values_list("id", "owner_id")
+            )
+            if not rows:
+                return 0
+            Todo.all_objects.using(self.db).filter(
+                id__in=[todo_id for todo_id, _ in rows]
+            ).update(deleted_at=now, version=F("version") + 1, updated_at=now)
+
+            deleted = defaultdict(list)
+            for todo_id, owner_id in rows:
+                deleted[owner_id].append(todo_id)
+            for owner_id, ids in deleted.items():
+                notify_todos_changed(Todo, owner_id, deleted=ids)
+        return len(rows)
+
+
+class TodoManager(models.Manager.from_queryset(TodoQuerySet)):
+    """Todos that are not (soft-)deleted."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
 
 
 # Create your models here.
 class Todo(models.Model):
     class Meta:
         ordering = ["-date_created"]
+        # Composite indexes backing keyset pagination for every ordering
+        # exposed by the list endpoint (see todo.pagination).
+        # They only cover live todos, matching what `Todo.objects` reads.
+        indexes = [
+            models.Index(
+                fields=["owner", "date_created", "id"],
+                name="todo_owner_created_id_idx",
+                condition=Q(deleted_at__isnull=True),
+            ),
+            models.Index(
+                fields=["owner", "title", "id"],
+                name="todo_owner_title_id_idx",
+                condition=Q(deleted_at__isnull=True),
+            ),
+            models.Index(
+                fields=["owner", "completed", "id"],
+                name="todo_owner_completed_id_idx",
+                condition=Q(deleted_at__isnull=True),
+            ),
+            # What `purge_todos` scans for.
+            models.Index(
+                fields=["deleted_at"],
+                name="todo_deleted_at_idx",
+                condition=Q(deleted_at__isnull=False),
+            ),
+        ]
 
-    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='todos')
+    # Deleting a user leaves their todos behind for `purge_todos` to remove
+    # in batches, instead of deleting them all in the user's transaction.
+    owner = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, db_constraint=False, related_name='todos'
+    )
     title = models.CharField(max_length=100)
     description = models.TextField()
     completed = models.BooleanField(default=False)
     date_created = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Bumped on every write; exposed to clients through the ETag header.
+    version = models.PositiveIntegerField(default=1)
+    # Set by soft deletes; see TodoQuerySet.soft_delete().
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+    objects = TodoManager()
+    # Including the soft-deleted todos.
+    all_objects = TodoQuerySet.as_manager()
+
+    def __str__(self):
+        return self.title
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            self.version += 1
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {
+                    *kwargs["update_fields"],
+                    "version",
+                    "updated_at",
+                }
+        super().save(*args, **kwargs)
+
+    def soft_delete(self):
+        self.deleted_at = timezone.now()
+        self.save(update_fields=["deleted_at"])
+
+    def restore(self):
+        self.deleted_at = None
+        self.save(update_fields=["deleted_at"])
+
+    @property
+    def etag(self):
+        return f'"{self.pk}.{self.version}"'
+
+
+class ArchivedTodo(models.Model):
+    """
+    Completed todos moved out of `Todo` by `manage.py archive_todos`, with
+    their ids, so the hot table and its indexes only hold what clients
+    usually look at. Counted in the stats like live todos.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    owner = models.ForeignKey(
+        User,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="archived_todos",
+    )
+    title = models.CharField(max_length=100)
+    description = models.TextField()
+    completed = models.BooleanField(default=True)
+    date_created = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    version = models.PositiveIntegerField(default=1)
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["-date_created"]
+        indexes = [
+            models.Index(
+                fields=["owner", "date_created", "id"],
+                name="todo_archived_owner_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return self.title
+
+
+class TodoWithArchive(models.Model):
+    """
+    Live and archived todos together: a read-only UNION ALL view over both
+    tables (created by `todo.archive`), queried by `?include_archived=true` with
+    the same filters, ordering and pagination as the todo table. Archived
+    rows have an `archived_at`.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    owner = models.ForeignKey(
+        User,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="+",
+    )
+    title = models.CharField(max_length=100)
+    description = models.TextField()
+    completed = models.BooleanField()
+    date_created = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    version = models.PositiveIntegerField()
+    archived_at = models.DateTimeField(null=True)
+
+    class Meta:
+        managed = False
+        db_table = "todo_todowitharchive"
+        ordering = ["-date_created"]
 
     def __str__(self):
         return self.title
+
+
+class TodoCollectionVersion(models.Model):
+    """
+    A per-owner counter bumped whenever any of the owner's todos change, so
+    conditional requests can be answered without touching the todo table.
+    """
+
+    owner = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="todo_collection_version",
+    )
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.owner} v{self.version}"
+
+
+class TodoChange(models.Model):
+    """
+    The latest change to each todo, for the delta sync feed. Every write
+    replaces the todo's row, so the table holds one row per live todo plus one
+    tombstone per deleted todo, and the auto-incrementing id doubles as the
+    change sequence number.
+    """
+
+    # Left behind by user deletion like the todos, and purged with them.
+    owner = models.ForeignKey(
+        User,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="todo_changes",
+    )
+    todo_id = models.BigIntegerField(unique=True)
+    deleted = models.BooleanField(default=False)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["owner", "id"], name="todo_change_owner_seq_idx"),
+        ]
+
+    def __str__(self):
+        return f"{'deleted' if self.deleted else 'changed'} todo {self.todo_id}"
+
+
+class TodoStats(models.Model):
+    """
+    Per-owner todo counts, maintained by database triggers (see todo.stats)
+    in the same transaction as every insert, delete and completion change.
+    """
+
+    owner = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name="todo_stats"
+    )
+    total = models.BigIntegerField(default=0)
+    completed = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.owner}: {self.completed}/{self.total}"
+
+
+class TodoDailyStats(models.Model):
+    """
+    How many of an owner's current todos were created on each (UTC) day.
+    """
+
+    owner = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="todo_daily_stats"
+    )
+    day = models.DateField()
+    created = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["owner", "day"], name="todo_daily_stats_owner_day_uniq"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.owner} {self.day}: {self.created}"
+
+
+def normalize_email(email):
+    """The case-insensitive lookup key for an email address."""
+    return (email or "").strip().lower()
+
+
+class UserEmail(models.Model):
+    """
+    Each user's normalized email, under a unique index, so registration's
+    duplicate check and email logins are a single point lookup instead of a
+    case-insensitive scan of auth_user. Kept in sync with `User.email` by
+    todo.receivers; users without an email have no row.
+    """
+
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name="email_key"
+    )
+    email = models.CharField(max_length=254, unique=True)
+
+    def __str__(self):
+        return self.email
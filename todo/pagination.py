@@ -0,0 +1,210 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    CursorPagination,
+    PageNumberPagination,
+    _reverse_ordering,
+)
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    Keyset ("seek") pagination over the todo list.
+
+    Unlike DRF's CursorPagination, the cursor stores the full position of the
+    last row (every ordering field plus the primary key as a tie-breaker), so
+    the next page is a single `WHERE (field, id) < (x, y) LIMIT n` query that
+    can walk the composite (owner, field, id) indexes. No COUNT(*) and no
+    OFFSET are ever issued, so every page costs the same no matter how deep it is.
+    """
+
+    ordering = "-date_created"
+    tie_breaker = "id"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.set_page([row async for row in queryset])
+
+    def get_page_queryset(self, queryset, request, view=None):
+        """
+        The (lazy) query for the requested page, with one row more than the
+        page size so we know whether another page follows.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_keyset_ordering(request, queryset, view)
+        self.model = queryset.model
+        self.annotations = queryset.query.annotations
+
+        self.cursor = self.decode_cursor(request)
+        self.reverse = self.cursor is not None and self.cursor["reverse"]
+        ordering = _reverse_ordering(self.ordering) if self.reverse else self.ordering
+
+        queryset = queryset.order_by(*ordering)
+        if self.cursor is not None:
+            queryset = queryset.filter(
+                self.get_keyset_filter(ordering, self.cursor["position"])
+            )
+        return queryset[: self.page_size + 1]
+
+    def set_page(self, results):
+        self.page = results[: self.page_size]
+        has_more = len(results) > self.page_size
+
+        if self.reverse:
+            self.page.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+
+        return self.page
+
+    def get_keyset_ordering(self, request, queryset, view):
+        ordering = list(self.get_ordering(request, queryset, view))
+        field_names = [field.lstrip("-") for field in ordering]
+        if self.tie_breaker not in field_names and "pk" not in field_names:
+            # Follow the direction of the last field so the database can use a
+            # single index scan in one direction.
+            prefix = "-" if ordering[-1].startswith("-") else ""
+            ordering.append(prefix + self.tie_breaker)
+        return tuple(ordering)
+
+    def get_keyset_filter(self, ordering, position):
+        """
+        Build `(f1, f2, ..., id) > (v1, v2, ..., vn)` as an OR of prefix matches,
+        honoring the direction of every field.
+        """
+        clauses = []
+        equal = Q()
+        for field, value in zip(ordering, position):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            clauses.append(equal & Q(**{f"{name}__{lookup}": value}))
+            equal &= Q(**{name: value})
+
+        # The redundant inclusive bound on the leading field lets the database
+        # seek straight into the index instead of filtering the OR row by row.
+        first = ordering[0]
+        bound = "lte" if first.startswith("-") else "gte"
+        return Q(**{f"{first.lstrip('-')}__{bound}": position[0]}) & reduce(
+            or_, clauses
+        )
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            # Paging backwards ran past the first row; restart from the top.
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(
+            {"reverse": False, "position": self.get_position(self.page[-1])}
+        )
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(
+            {"reverse": True, "position": self.get_position(self.page[0])}
+        )
+
+    def get_position(self, instance):
+        position = []
+        for field in self.ordering:
+            name = field.lstrip("-")
+            if isinstance(instance, dict):
+                value = instance[name]
+            else:
+                value = getattr(instance, "pk" if name == "pk" else name)
+            position.append(str(value))
+        return position
+
+    def get_model_field(self, name):
+        if name == "pk":
+            return self.model._meta.pk
+        if name in self.annotations:
+            # e.g. the relevance rank added by todo.search
+            return self.annotations[name].output_field
+        return self.model._meta.get_field(name)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            padding = "=" * (-len(encoded) % 4)
+            payload = json.loads(urlsafe_b64decode(encoded + padding))
+            reverse = bool(payload["r"])
+            raw_position = payload["p"]
+            if len(raw_position) != len(self.ordering):
+                raise ValueError("Cursor does not match the requested ordering.")
+            position = [
+                self.get_model_field(field.lstrip("-")).to_python(value)
+                for field, value in zip(self.ordering, raw_position)
+            ]
+        except (TypeError, ValueError, KeyError, FieldDoesNotExist, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+        return {"reverse": reverse, "position": position}
+
+    def encode_cursor(self, cursor):
+        payload = json.dumps(
+            {"r": int(cursor["reverse"]), "p": cursor["position"]},
+            separators=(",", ":"),
+        )
+        encoded = urlsafe_b64encode(payload.encode()).decode("ascii").rstrip("=")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+
+class AsyncPageNumberPagination(PageNumberPagination):
+    """
+    PageNumberPagination for async views: the count and the page are fetched
+    with `acount()` and async iteration instead of blocking queries.
+    """
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        # Paginator.count is a cached_property; fill it in ahead of time so
+        # page() below does not run the COUNT synchronously.
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(
+                self.invalid_page_message.format(
+                    page_number=page_number, message=str(exc)
+                )
+            )
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+
+        self.page.object_list = [row async for row in self.page.object_list]
+        return self.page.object_list
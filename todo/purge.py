@@ -0,0 +1,96 @@
+import datetime
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections
+from django.utils import timezone
+
+from .models import ArchivedTodo, Todo, TodoChange
+from .transactions import write_atomic
+
+
+def undo_window():
+    return datetime.timedelta(seconds=getattr(settings, "TODO_DELETE_UNDO_SECONDS", 0))
+
+
+def restorable(todos, now=None):
+    """The soft-deleted todos among `todos` that can still be restored."""
+    now = now or timezone.now()
+    return todos.filter(deleted_at__gte=now - undo_window())
+
+
+def expired(using="default", now=None):
+    """Soft-deleted todos past the undo window."""
+    now = now or timezone.now()
+    return Todo.all_objects.using(using).filter(deleted_at__lt=now - undo_window())
+
+
+def orphaned_owner_ids(model, using="default"):
+    """
+    Owners of `model` rows whose user is gone. Reads the owner index rather
+    than the rows, then looks the owners up.
+    """
+    owner_ids = sorted(
+        model._base_manager.using(using)
+        .order_by()
+        .values_list("owner_id", flat=True)
+        .distinct()
+    )
+    users = set()
+    for start in range(0, len(owner_ids), 500):
+        chunk = owner_ids[start : start + 500]
+        users.update(
+            User.objects.using(using).filter(pk__in=chunk).values_list("pk", flat=True)
+        )
+    return [owner_id for owner_id in owner_ids if owner_id not in users]
+
+
+def delete_batch(queryset, batch_size):
+    """
+    Hard-delete up to `batch_size` rows of `queryset` in a transaction of
+    their own, with a plain DELETE: the rows were already reported deleted
+    (or their owner is gone), so no signals are sent. Database triggers still
+    keep the search index in step. Returns the number of rows deleted.
+    """
+    using = queryset.db
+    connection = connections[using]
+    model = queryset.model
+    table = connection.ops.quote_name(model._meta.db_table)
+    with write_atomic(using=using):
+        ids = list(queryset.order_by().values_list("pk", flat=True)[:batch_size])
+        if not ids:
+            return 0
+        placeholders = ", ".join(["%s"] * len(ids))
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {table} WHERE id IN ({placeholders})", ids)
+            return cursor.rowcount
+
+
+def purge_todos(batch_size=500, pause=0.01, using="default", now=None):
+    """
+    Hard-delete the soft-deleted todos past the undo window, and the live and
+    archived todos and change log entries left behind by deleted users,
+    `batch_size` rows per transaction with `pause` seconds in between, so
+    writers never wait long for the lock. Returns
+    `{"expired": n, "orphaned": n, "changes": n}`.
+    """
+    purged = {"expired": 0, "orphaned": 0, "changes": 0}
+
+    def drain(key, queryset):
+        while True:
+            deleted = delete_batch(queryset, batch_size)
+            purged[key] += deleted
+            if deleted < batch_size:
+                return
+            if pause:
+                time.sleep(pause)
+
+    drain("expired", expired(using, now))
+    for owner_id in orphaned_owner_ids(Todo, using):
+        drain("orphaned", Todo.all_objects.using(using).filter(owner_id=owner_id))
+    for owner_id in orphaned_owner_ids(ArchivedTodo, using):
+        drain("orphaned", ArchivedTodo.objects.using(using).filter(owner_id=owner_id))
+    for owner_id in orphaned_owner_ids(TodoChange, using):
+        drain("changes", TodoChange.objects.using(using).filter(owner_id=owner_id))
+    return purged
@@ -0,0 +1,88 @@
+import logging
+
+from django.contrib.auth.models import User
+from django.db import IntegrityError
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import revoke_on_user_change
+from .backends import emails_must_be_unique
+from .changes import record_changes
+from .events import publish_changes
+from .metrics import install_query_recorder
+from .models import Todo, UserEmail, normalize_email
+from .routers import pin_to_primary
+from .signals import notify_todos_changed, todos_changed
+from .transactions import write_atomic
+from .versioning import bump_collection_version
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=Todo)
+def todo_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        notify_todos_changed(sender, instance.owner_id, created=[instance.pk])
+    elif instance.deleted_at is not None:
+        notify_todos_changed(sender, instance.owner_id, deleted=[instance.pk])
+    else:
+        notify_todos_changed(sender, instance.owner_id, updated=[instance.pk])
+
+
+@receiver(post_delete, sender=Todo)
+def todo_deleted(sender, instance, **kwargs):
+    # Soft-deleted todos were reported gone when they were marked.
+    if instance.deleted_at is not None:
+        return
+    notify_todos_changed(sender, instance.owner_id, deleted=[instance.pk])
+
+
+todos_changed.connect(bump_collection_version, sender=Todo)
+todos_changed.connect(record_changes, sender=Todo)
+todos_changed.connect(pin_to_primary, sender=Todo)
+todos_changed.connect(publish_changes, sender=Todo)
+
+
+@receiver(post_save, sender=User)
+def sync_user_email(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """
+    Keep the user's `UserEmail` key in step with `User.email`.
+
+    A user whose email another user already has (differing only in case,
+    e.g. from `createsuperuser` or an account older than the key) is left
+    without a key, and so cannot log in by email, rather than failing the
+    save; except inside `unique_emails()`, as registration is.
+    """
+    if raw or (update_fields is not None and "email" not in update_fields):
+        return
+    key = normalize_email(instance.email)
+    if not key:
+        UserEmail.objects.filter(user=instance).delete()
+        return
+    if created and emails_must_be_unique():
+        # Registration: the conflict is the caller's to report.
+        UserEmail.objects.create(user=instance, email=key)
+        return
+    try:
+        # A savepoint, so that a conflict leaves the caller's transaction usable.
+        with write_atomic():
+            if created:
+                UserEmail.objects.create(user=instance, email=key)
+            else:
+                UserEmail.objects.update_or_create(user=instance, defaults={"email": key})
+    except IntegrityError:
+        logger.warning(
+            "User %s has the email %r of another user; it is not indexed for login.",
+            instance.pk,
+            key,
+        )
+        if not created:
+            UserEmail.objects.filter(user=instance).delete()
+
+
+post_save.connect(revoke_on_user_change, sender=User)
+post_delete.connect(revoke_on_user_change, sender=User)
+connection_created.connect(install_query_recorder)
@@ -0,0 +1,121 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_state = ContextVar("todo_routing_state", default=None)
+
+# Looked up on every login and registration; a replica that has not caught up
+# with a new account would turn those into spurious failures.
+PRIMARY_ONLY_MODELS = {"useremail"}
+
+
+class RoutingState:
+    """What the router decided so far for the current request."""
+
+    def __init__(self, request):
+        self.request = request
+        self.replica = None
+        self.pinned = None
+
+
+def get_replicas():
+    return getattr(settings, "TODO_DATABASE_REPLICAS", ())
+
+
+def pin_key(owner_id):
+    return f"todo:replica-pin:{owner_id}"
+
+
+def pin_cache():
+    return caches[getattr(settings, "TODO_REPLICA_CACHE", "default")]
+
+
+def pin_to_primary(sender, owner_id, **kwargs):
+    """
+    `todos_changed` receiver: send the owner's reads to the primary for the
+    next `TODO_REPLICA_PIN_SECONDS`, until the replicas have their write.
+    """
+    if not get_replicas():
+        return
+    seconds = getattr(settings, "TODO_REPLICA_PIN_SECONDS", 5)
+    pin_cache().set(pin_key(owner_id), True, timeout=seconds)
+
+
+@contextmanager
+def routing_context(request):
+    """
+    Route the todo reads made inside the block on behalf of `request`. Reads
+    outside any request (management commands, scripts) stay on the primary.
+    """
+    token = _state.set(RoutingState(request))
+    try:
+        yield
+    finally:
+        _state.reset(token)
+
+
+def is_pinned(request):
+    user = getattr(request, "user", None)
+    owner_id = getattr(user, "pk", None)
+    return owner_id is not None and bool(pin_cache().get(pin_key(owner_id)))
+
+
+class ReplicaRouter:
+    """
+    Send reads of the todo app's models to one of `TODO_DATABASE_REPLICAS`,
+    picked once per request, and writes to the primary ("default").
+
+    Reads go to the primary instead when they cannot tolerate replication
+    lag: inside a transaction, after the request wrote anything, and for
+    `TODO_REPLICA_PIN_SECONDS` after any write to the user's todos, so users
+    always read their own writes.
+    """
+
+    def routed(self, model):
+        return (
+            model._meta.app_label == "todo"
+            and model._meta.model_name not in PRIMARY_ONLY_MODELS
+        )
+
+    def db_for_read(self, model, **hints):
+        replicas = get_replicas()
+        if not replicas or not self.routed(model):
+            return None
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            return instance._state.db
+
+        state = _state.get()
+        if state is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        if state.pinned is None:
+            state.pinned = is_pinned(state.request)
+        if state.pinned:
+            return DEFAULT_DB_ALIAS
+        if state.replica is None:
+            state.replica = random.choice(replicas)
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        if not self.routed(model):
+            return None
+        state = _state.get()
+        if state is not None:
+            state.pinned = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are copies of the primary and get its schema with its data.
+        if db in get_replicas():
+            return False
+        return None
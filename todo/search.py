@@ -0,0 +1,182 @@
+import re
+
+from django.db import connections
+from django.db.models import FloatField
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import OrderingFilter, SearchFilter
+
+
+FTS_TABLE = "todo_todo_fts"
+SEARCH_CONFIG = "english"
+SEARCH_RANK = "search_rank"
+
+# SQLite: an external-content FTS5 table over todo_todo, kept in sync by
+# triggers so every write path (save, queryset.update, bulk_create, raw SQL)
+# is covered. The update trigger only fires when the indexed columns change.
+SQLITE_FTS_SCHEMA = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, description,
+        content='todo_todo', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON todo_todo BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON todo_todo BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+    AFTER UPDATE OF title, description ON todo_todo BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+]
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def postgres_search_vector(*fields):
+    from django.contrib.postgres.search import SearchVector
+
+    return SearchVector(*(fields or ("title", "description")), config=SEARCH_CONFIG)
+
+
+def ensure_search_triggers(using="default", **kwargs):
+    """
+    `post_migrate` receiver: put the SQLite sync triggers back if a table
+    rebuild dropped them.
+    """
+    db = connections[using]
+    if db.vendor != "sqlite" or FTS_TABLE not in db.introspection.table_names():
+        return
+    with db.schema_editor() as schema_editor:
+        for statement in SQLITE_FTS_SCHEMA[1:]:
+            schema_editor.execute(statement)
+
+
+def search_backend(queryset):
+    vendor = connections[queryset.db].vendor
+    if vendor == "sqlite" and queryset.model._meta.db_table != "todo_todo":
+        # The FTS5 table only indexes todo_todo, not e.g. the archive.
+        return None
+    if vendor in ("sqlite", "postgresql"):
+        return vendor
+    return None
+
+
+def get_search_words(terms):
+    words = []
+    for term in terms:
+        words.extend(WORD_RE.findall(term))
+    return words
+
+
+def build_match_expression(words, columns=None):
+    """
+    Turn search words into an FTS5 MATCH expression: every word must match
+    (as a prefix, so "gro" still finds "groceries"), optionally restricted to
+    some columns.
+    """
+    phrases = " ".join('"%s"*' % word for word in words)
+    if columns:
+        return "{%s} : (%s)" % (" ".join(columns), phrases)
+    return phrases
+
+
+def filter_by_search(queryset, terms, columns=None, rank=False):
+    """
+    Restrict `queryset` to todos matching every term through the full-text
+    index. With `rank=True` the queryset is annotated with `search_rank`,
+    where lower values are better matches.
+
+    Returns None when the backend has no full-text index, or the terms have
+    no words for it to match (e.g. only punctuation), so callers can fall back
+    to `icontains`.
+    """
+    words = get_search_words(terms)
+    backend = search_backend(queryset)
+    if backend is None or not words:
+        return None
+
+    table = queryset.model._meta.db_table
+    if backend == "sqlite":
+        match = build_match_expression(words, columns)
+        queryset = queryset.filter(
+            id__in=RawSQL(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match]
+            )
+        )
+        if rank:
+            queryset = queryset.annotate(
+                **{
+                    SEARCH_RANK: RawSQL(
+                        f"SELECT bm25({FTS_TABLE}) FROM {FTS_TABLE} "
+                        f'WHERE {FTS_TABLE} MATCH %s AND rowid = "{table}"."id"',
+                        [match],
+                        output_field=FloatField(),
+                    )
+                }
+            )
+        return queryset
+
+    from django.contrib.postgres.search import SearchQuery, SearchRank
+
+    vector = postgres_search_vector(*(columns or ()))
+    query = SearchQuery(
+        " & ".join(f"{word}:*" for word in words),
+        search_type="raw",
+        config=SEARCH_CONFIG,
+    )
+    queryset = queryset.alias(search_vector=vector).filter(search_vector=query)
+    if rank:
+        queryset = queryset.annotate(
+            **{SEARCH_RANK: SearchRank(vector, query, output_field=FloatField()) * -1}
+        )
+    return queryset
+
+
+class TodoSearchFilter(SearchFilter):
+    """
+    `?search=` backed by the full-text index (FTS5 on SQLite, tsvector/GIN on
+    PostgreSQL) instead of `LIKE '%x%'` scans, annotating a relevance rank.
+    Other databases keep DRF's `icontains` behaviour.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_fields = self.get_search_fields(view, request)
+        search_terms = self.get_search_terms(request)
+
+        if not search_fields or not search_terms:
+            return queryset
+
+        searched = filter_by_search(
+            queryset, search_terms, columns=search_fields, rank=True
+        )
+        if searched is None:
+            return super().filter_queryset(request, queryset, view)
+        return searched
+
+
+class TodoOrderingFilter(OrderingFilter):
+    """
+    Orders search results by relevance unless the client asked for an
+    explicit `?ordering=`.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        params = request.query_params.get(self.ordering_param)
+        if not params and SEARCH_RANK in queryset.query.annotations:
+            return [SEARCH_RANK, *self.get_default_ordering(view)]
+        return super().get_ordering(request, queryset, view)
@@ -0,0 +1,361 @@
+"""
+Generate large, skewed datasets for reproducing production-scale slowdowns
+locally (see `manage.py seed_todos`).
+
+Worker processes generate the todos into SQLite files of their own, a chunk
+each; this process merges the chunks into the database as they finish, one
+transaction per chunk. The same options and seed always give the same rows.
+
+The workers only need the standard library: this module imports Django's
+models inside the functions that run in this process, so that pool workers
+can import it without setting Django up.
+"""
+import datetime
+import itertools
+import os
+import random
+import sqlite3
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+
+from django.db import connections, transaction
+
+
+VERBS = [
+    "Buy", "Call", "Email", "Fix", "Pay", "Book", "Clean", "Write", "Plan",
+    "Review", "Send", "Renew", "Return", "Order", "Pick up", "Schedule",
+]
+NOUNS = [
+    "milk", "report", "garden", "invoice", "dentist", "groceries", "taxes",
+    "laundry", "meeting", "birthday", "car", "insurance", "flights", "rent",
+    "slides", "library books", "passport", "plumber", "newsletter", "backup",
+]
+WORDS = NOUNS + [
+    "before", "after", "friday", "monday", "tomorrow", "again", "remember",
+    "the", "and", "for", "with", "ask", "about", "check", "budget", "notes",
+    "urgent", "maybe", "weekly", "quarterly", "draft", "final", "online",
+]
+# Description lengths in words follow a Pareto distribution: most todos have
+# none or a few words, a long tail has hundreds.
+DESCRIPTION_SHAPE = 1.2
+MAX_DESCRIPTION_WORDS = 2000
+# Todos older than this are mostly done.
+SETTLED_SECONDS = 30 * 86400
+CHUNK_COLUMNS = "title, description, completed, date_created, updated_at, owner_id"
+
+
+def todo_counts(users, todos, skew=1.0):
+    """
+    Split `todos` todos between `users` users by Zipf's law: the nth user
+    gets a share proportional to 1 / n ** `skew`, so a few users are heavy
+    and most have a long tail of few todos.
+    """
+    weights = [1 / (n + 1) ** skew for n in range(users)]
+    total = sum(weights)
+    counts = [int(todos * weight / total) for weight in weights]
+    # Hand the rounding leftovers to the heaviest users.
+    for n in range(todos - sum(counts)):
+        counts[n % users] += 1
+    return counts
+
+
+def plan_chunks(owner_ids, counts, chunk_size):
+    """
+    Pack the owners' todos into chunks of up to `chunk_size` todos: lists of
+    (owner_id, count) pairs, splitting heavy owners across chunks.
+    """
+    chunks, chunk, size = [], [], 0
+    for owner_id, count in zip(owner_ids, counts):
+        while count:
+            take = min(count, chunk_size - size)
+            chunk.append((owner_id, take))
+            size += take
+            count -= take
+            if size == chunk_size:
+                chunks.append(chunk)
+                chunk, size = [], 0
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def generate_rows(rng, owners, days, now):
+    """
+    Rows of CHUNK_COLUMNS for `owners`, (owner_id, count) pairs. Creation
+    times go back `days` days from `now` (naive UTC), most of them recent.
+    """
+    span = days * 86400
+    for owner_id, count in owners:
+        for _ in range(count):
+            age = int(span * rng.random() ** 2)
+            created = now - datetime.timedelta(seconds=age)
+            updated = created + datetime.timedelta(
+                seconds=int(min(age, SETTLED_SECONDS) * rng.random())
+            )
+            completed = rng.random() < 0.2 + 0.7 * min(age / SETTLED_SECONDS, 1)
+            words = min(
+                int(rng.paretovariate(DESCRIPTION_SHAPE)) - 1, MAX_DESCRIPTION_WORDS
+            )
+            yield (
+                f"{rng.choice(VERBS)} {rng.choice(NOUNS)}",
+                " ".join(rng.choices(WORDS, k=words)),
+                int(completed),
+                # The text Django's SQLite backend stores datetimes as.
+                str(created),
+                str(updated),
+                owner_id,
+            )
+
+
+def generate_chunk(path, index, owners, seed, days, now, batch_size):
+    """
+    Pool worker: write chunk `index` to a new SQLite file at `path`, in
+    transactions of `batch_size` rows. Returns `path`.
+    """
+    rng = random.Random(f"{seed}:{index}")
+    rows = generate_rows(rng, owners, days, now)
+    with closing(sqlite3.connect(path)) as db:
+        # A scratch file: nothing to recover if this process dies.
+        db.execute("PRAGMA journal_mode = OFF")
+        db.execute("PRAGMA synchronous = OFF")
+        db.execute(f"CREATE TABLE todo ({CHUNK_COLUMNS})")
+        while batch := list(itertools.islice(rows, batch_size)):
+            with db:
+                db.executemany("INSERT INTO todo VALUES (?, ?, ?, ?, ?, ?)", batch)
+    return path
+
+
+def create_users(emails, password, using="default"):
+    """Create a user per email, all with `password`; returns their ids."""
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import User
+
+    from .models import UserEmail, normalize_email
+
+    # Hashed once: seeding should not cost a password hash per user.
+    password = make_password(password)
+    with transaction.atomic(using=using):
+        users = User.objects.using(using).bulk_create(
+            (User(username=email, email=email, password=password) for email in emails),
+            batch_size=1000,
+        )
+        # bulk_create skips the post_save receiver that adds these.
+        UserEmail.objects.using(using).bulk_create(
+            (UserEmail(user=user, email=normalize_email(user.email)) for user in users),
+            batch_size=1000,
+        )
+    return [user.pk for user in users]
+
+
+# todo_stats_ai for a whole chunk at once, for the rows after an id.
+SQLITE_ADD_TODOS = [
+    """
+    INSERT INTO todo_todostats (owner_id, total, completed)
+    SELECT owner_id, count(*), sum(completed) FROM todo_todo
+    WHERE id > %s AND deleted_at IS NULL GROUP BY owner_id
+    ON CONFLICT (owner_id) DO UPDATE
+    SET total = total + excluded.total, completed = completed + excluded.completed
+    """,
+    """
+    INSERT INTO todo_tododailystats (owner_id, day, created)
+    SELECT owner_id, date(date_created), count(*) FROM todo_todo
+    WHERE id > %s AND deleted_at IS NULL GROUP BY owner_id, date(date_created)
+    ON CONFLICT (owner_id, day) DO UPDATE SET created = created + excluded.created
+    """,
+]
+
+
+def record_merged_todos(cursor, last_id, using="default"):
+    """
+    Do for the todos merged after `last_id` what `todos_changed` does for a
+    write: add them to the change log (oldest first, as migration 0007
+    backfilled the todos before it) so a delta sync picks them up, and bump
+    their owners' collection versions so cached lists and ETags go stale.
+    """
+    from django.db.models import F
+    from django.utils import timezone
+
+    from .models import Todo, TodoChange, TodoCollectionVersion
+
+    quote = connections[using].ops.quote_name
+    todos, changes = quote(Todo._meta.db_table), quote(TodoChange._meta.db_table)
+    cursor.execute(
+        f"INSERT INTO {changes} ({quote('todo_id')}, {quote('owner_id')}, "
+        f"{quote('deleted')}, {quote('changed_at')}) "
+        f"SELECT {quote('id')}, {quote('owner_id')}, %s, {quote('updated_at')} "
+        f"FROM {todos} WHERE {quote('id')} > %s ORDER BY {quote('id')}",
+        [False, last_id],
+    )
+
+    owners = set(
+        Todo.objects.using(using)
+        .filter(id__gt=last_id)
+        .order_by()
+        .values_list("owner_id", flat=True)
+        .distinct()
+    )
+    now = timezone.now()
+    versions = TodoCollectionVersion.objects.using(using).filter(owner_id__in=owners)
+    bumped = set(versions.values_list("owner_id", flat=True))
+    versions.update(version=F("version") + 1, updated_at=now)
+    TodoCollectionVersion.objects.using(using).bulk_create(
+        TodoCollectionVersion(owner_id=owner_id, version=1, updated_at=now)
+        for owner_id in owners - bumped
+    )
+
+
+def merge_sqlite_chunk(path, using="default"):
+    """
+    Copy a chunk file into a SQLite database in one INSERT ... SELECT.
+
+    The per-row insert triggers (search index, stats) are dropped for the
+    copy and the chunk is added to the search index and the stats tables a
+    chunk at a time instead, then the triggers come back, all in the same
+    transaction: other connections never see the triggers missing.
+    """
+    from .search import FTS_TABLE, SQLITE_FTS_SCHEMA
+    from .stats import SQLITE_STATS_SCHEMA
+
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        # SQLite only attaches databases outside transactions.
+        cursor.execute("ATTACH DATABASE %s AS seed_chunk", [path])
+        try:
+            with transaction.atomic(using=using):
+                cursor.execute(f"DROP TRIGGER {FTS_TABLE}_ai")
+                cursor.execute("DROP TRIGGER todo_stats_ai")
+                # AUTOINCREMENT ids only grow, and the write above took the
+                # write lock: the chunk's rows are the ones after this id.
+                cursor.execute("SELECT coalesce(max(id), 0) FROM todo_todo")
+                (last_id,) = cursor.fetchone()
+                cursor.execute(
+                    f"INSERT INTO todo_todo ({CHUNK_COLUMNS}, version) "
+                    f"SELECT {CHUNK_COLUMNS}, 1 FROM seed_chunk.todo ORDER BY rowid"
+                )
+                cursor.execute(
+                    f"INSERT INTO {FTS_TABLE}(rowid, title, description) "
+                    f"SELECT id, title, description FROM todo_todo WHERE id > %s",
+                    [last_id],
+                )
+                for statement in SQLITE_ADD_TODOS:
+                    cursor.execute(statement, [last_id])
+                record_merged_todos(cursor, last_id, using)
+                # The insert triggers, as todo.search and todo.stats define them.
+                cursor.execute(SQLITE_FTS_SCHEMA[1])
+                cursor.execute(SQLITE_STATS_SCHEMA[0])
+        finally:
+            cursor.execute("DETACH DATABASE seed_chunk")
+
+
+def merge_chunk(path, using="default", batch_size=10_000):
+    """
+    Copy a chunk file into any other database, `batch_size` rows per
+    statement, in one transaction; the database's own triggers keep the
+    search index and the stats up to date. Nothing else should be adding
+    todos meanwhile.
+
+    Plain INSERTs rather than bulk_create(), which would overwrite the
+    generated timestamps with auto_now and auto_now_add.
+    """
+    from .models import Todo
+
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    table = quote(Todo._meta.db_table)
+    columns = ", ".join(quote(column) for column in CHUNK_COLUMNS.split(", "))
+    sql = (
+        f"INSERT INTO {table} ({columns}, {quote('version')})"
+        " VALUES (%s, %s, %s, %s, %s, %s, 1)"
+    )
+
+    def adapt(value):
+        value = datetime.datetime.fromisoformat(value)
+        value = value.replace(tzinfo=datetime.timezone.utc)
+        return connection.ops.adapt_datetimefield_value(value)
+
+    with (
+        closing(sqlite3.connect(path)) as source,
+        transaction.atomic(using=using),
+        connection.cursor() as cursor,
+    ):
+        # Ids only grow: with nothing else adding todos meanwhile, the chunk's
+        # rows are the ones after this id.
+        cursor.execute(f"SELECT coalesce(max({quote('id')}), 0) FROM {table}")
+        (last_id,) = cursor.fetchone()
+        rows = source.execute(f"SELECT {CHUNK_COLUMNS} FROM todo ORDER BY rowid")
+        while batch := rows.fetchmany(batch_size):
+            cursor.executemany(
+                sql,
+                [
+                    (title, text, bool(done), adapt(created), adapt(updated), owner)
+                    for title, text, done, created, updated, owner in batch
+                ],
+            )
+        record_merged_todos(cursor, last_id, using)
+
+
+def seed_todos(
+    users,
+    todos,
+    workers=None,
+    batch_size=10_000,
+    chunk_size=100_000,
+    seed=0,
+    days=730,
+    skew=1.0,
+    password="seed-password",
+    using="default",
+    now=None,
+    log=None,
+):
+    """
+    Create `users` users (seed<seed>-<n>@example.com) and `todos` todos spread
+    over them by `todo_counts()`, generated by `workers` processes (default:
+    one per CPU; 1 generates them in this process). Returns the new users' ids.
+    """
+    from django.utils import timezone
+
+    if batch_size < 1 or chunk_size < 1:
+        raise ValueError("batch_size and chunk_size must be at least 1.")
+    now = (now or timezone.now()).astimezone(datetime.timezone.utc)
+    # Naive, as the workers write it out.
+    now = now.replace(tzinfo=None)
+    owner_ids = create_users(
+        [f"seed{seed}-{n}@example.com" for n in range(users)], password, using
+    )
+    chunks = plan_chunks(owner_ids, todo_counts(users, todos, skew), chunk_size)
+    sqlite = connections[using].vendor == "sqlite"
+
+    with tempfile.TemporaryDirectory() as directory:
+        arguments = (
+            [os.path.join(directory, f"chunk{n}.sqlite3") for n in range(len(chunks))],
+            range(len(chunks)),
+            chunks,
+            itertools.repeat(seed),
+            itertools.repeat(days),
+            itertools.repeat(now),
+            itertools.repeat(batch_size),
+        )
+        if workers == 1:
+            paths = map(generate_chunk, *arguments)
+        else:
+            pool = ProcessPoolExecutor(workers)
+            paths = pool.map(generate_chunk, *arguments)
+        try:
+            # In chunk order, whichever worker finishes first, so the ids
+            # come out the same every time.
+            merged = 0
+            for path, chunk in zip(paths, chunks):
+                if sqlite:
+                    merge_sqlite_chunk(path, using)
+                else:
+                    merge_chunk(path, using, batch_size)
+                os.remove(path)
+                merged += sum(count for _, count in chunk)
+                if log:
+                    log(f"Merged {merged} of {todos} todos")
+        finally:
+            if workers != 1:
+                pool.shutdown(cancel_futures=True)
+    return owner_ids
@@ -1,12 +1,20 @@
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import F
+from django.utils import timezone
 from rest_framework import serializers
 from rest_framework.serializers import ModelSerializer
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
 from django.contrib.auth import authenticate
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.exceptions import AuthenticationFailed
 
+from .authentication import TodoRefreshToken
+from .backends import email_taken, unique_emails
+from .fastpath import RowSerializer
 from .models import Todo
+from .signals import batch_todo_changes, notify_todos_changed
+from .transactions import write_atomic
 
 
 class TodoSerializer(ModelSerializer):
@@ -21,6 +29,178 @@ class TodoDetailSerializer(ModelSerializer):
         fields = ["id", "title", "description", "completed"]
 
 
+# Fast paths producing the same output as `.data` of the serializers above.
+todo_rows = RowSerializer(TodoSerializer)
+todo_detail_rows = RowSerializer(TodoDetailSerializer)
+
+
+class TodoBulkUpdateSerializer(ModelSerializer):
+    id = serializers.IntegerField()
+
+    class Meta:
+        model = Todo
+        fields = ["id", "title", "description", "completed"]
+        extra_kwargs = {
+            "title": {"required": False},
+            "description": {"required": False},
+            "completed": {"required": False},
+        }
+
+
+class TodoBulkSerializer(serializers.Serializer):
+    """
+    A batch of todo operations applied in one transaction with a constant
+    number of queries: creates use bulk_create, updates bulk_update, toggles
+    and deletes a single filtered UPDATE/DELETE each. Operations run in the
+    order create, update, toggle, delete.
+    """
+
+    def get_fields(self):
+        # Declared here rather than as class attributes because "create" and
+        # "update" would clash with the Serializer methods of the same name.
+        return {
+            "create": TodoSerializer(many=True, required=False),
+            "update": TodoBulkUpdateSerializer(many=True, required=False),
+            "toggle": serializers.ListField(
+                child=serializers.IntegerField(), required=False
+            ),
+            "delete": serializers.ListField(
+                child=serializers.IntegerField(), required=False
+            ),
+        }
+
+    def validate(self, attrs):
+        limit = getattr(settings, "TODO_BULK_MAX_OPERATIONS", 1000)
+        if sum(len(items) for items in attrs.values()) > limit:
+            raise serializers.ValidationError(
+                f"A bulk request may contain at most {limit} operations."
+            )
+        if not attrs:
+            raise serializers.ValidationError("No operations given.")
+        self.check_duplicates(attrs)
+        return attrs
+
+    def check_duplicates(self, attrs):
+        """
+        Reject a todo named more than once across update, toggle and delete:
+        the later items are reported, in each field's own error format.
+        """
+        ids = {
+            "update": [item["id"] for item in attrs.get("update", [])],
+            "toggle": attrs.get("toggle", []),
+            "delete": attrs.get("delete", []),
+        }
+        seen = set()
+        errors = {}
+        for operation, todo_ids in ids.items():
+            duplicates = {}
+            for index, todo_id in enumerate(todo_ids):
+                if todo_id in seen:
+                    duplicates[index] = [f"Todo {todo_id} appears more than once."]
+                seen.add(todo_id)
+            if not duplicates:
+                continue
+            if operation == "update":
+                # As the nested serializer reports: a dict per item.
+                errors[operation] = [
+                    {"id": duplicates[index]} if index in duplicates else {}
+                    for index in range(len(todo_ids))
+                ]
+            else:
+                errors[operation] = duplicates
+        if errors:
+            raise serializers.ValidationError(errors)
+
+    def create(self, validated_data):
+        owner = self.context["request"].user
+        todos = Todo.objects.filter(owner_id=owner.pk)
+        results = {}
+
+        with write_atomic(), batch_todo_changes():
+            if "create" in validated_data:
+                created = Todo.objects.bulk_create(
+                    [Todo(owner_id=owner.pk, **item) for item in validated_data["create"]]
+                )
+                notify_todos_changed(
+                    Todo, owner.pk, created=[todo.pk for todo in created]
+                )
+                results["create"] = [
+                    {"status": 201, "todo": TodoSerializer(todo).data}
+                    for todo in created
+                ]
+
+            if "update" in validated_data:
+                results["update"] = self.bulk_update(
+                    owner, todos, validated_data["update"]
+                )
+
+            if "toggle" in validated_data:
+                ids = validated_data["toggle"]
+                todos.filter(id__in=ids).update(
+                    completed=~F("completed"),
+                    version=F("version") + 1,
+                    updated_at=timezone.now(),
+                )
+                toggled = dict(
+                    todos.filter(id__in=ids).order_by().values_list("id", "completed")
+                )
+                notify_todos_changed(Todo, owner.pk, updated=list(toggled))
+                results["toggle"] = [
+                    {"id": todo_id, "status": 200, "completed": toggled[todo_id]}
+                    if todo_id in toggled
+                    else {"id": todo_id, "status": 404}
+                    for todo_id in ids
+                ]
+
+            if "delete" in validated_data:
+                ids = validated_data["delete"]
+                existing = set(
+                    todos.filter(id__in=ids).order_by().values_list("id", flat=True)
+                )
+                todos.filter(id__in=existing).soft_delete()
+                results["delete"] = [
+                    {"id": todo_id, "status": 204 if todo_id in existing else 404}
+                    for todo_id in ids
+                ]
+
+        return results
+
+    def bulk_update(self, owner, todos, items):
+        instances = todos.in_bulk([item["id"] for item in items])
+        changed_fields = set()
+        now = timezone.now()
+        for item in items:
+            todo = instances.get(item["id"])
+            if todo is None:
+                continue
+            for field, value in item.items():
+                if field != "id":
+                    setattr(todo, field, value)
+                    changed_fields.add(field)
+            todo.version += 1
+            todo.updated_at = now
+
+        if changed_fields:
+            Todo.objects.bulk_update(
+                instances.values(), sorted(changed_fields | {"version", "updated_at"})
+            )
+            notify_todos_changed(Todo, owner.pk, updated=list(instances))
+
+        results = []
+        for item in items:
+            todo = instances.get(item["id"])
+            if todo is None:
+                results.append({"id": item["id"], "status": 404})
+            else:
+                results.append(
+                    {"id": todo.id, "status": 200, "todo": TodoSerializer(todo).data}
+                )
+        return results
+
+    def to_representation(self, instance):
+        return instance
+
+
 class RegisterSerializer(serializers.Serializer):
     # password2 = serializers.CharField(
     #     write_only=True, required=True, style={"input_type": "password"}
@@ -46,17 +226,24 @@ class RegisterSerializer(serializers.Serializer):
     #     }
 
     def create(self, validated_data):
-        user = User.objects.create_user(
-            username=validated_data["email"],
-            email=validated_data["email"],
-            password=validated_data["password"],
-            first_name=validated_data["name"],
-        )
+        try:
+            # The UserEmail key is created with the user; its unique index
+            # catches a concurrent registration that passed validate_email.
+            with write_atomic(), unique_emails():
+                user = User.objects.create_user(
+                    username=validated_data["email"],
+                    email=validated_data["email"],
+                    password=validated_data["password"],
+                    first_name=validated_data["name"],
+                )
+        except IntegrityError:
+            raise serializers.ValidationError(
+                {"email": ["A user with this email already exists."]}
+            )
         return user
 
     def validate_email(self, value):
-        email_lower = value.lower()
-        if User.objects.filter(username=email_lower).exists():
+        if email_taken(value):
             raise serializers.ValidationError("A user with this email already exists.")
         return value
 
@@ -90,19 +277,14 @@ class EmailLoginSerializer(ModelSerializer):
         if not email or not password:
             raise AuthenticationFailed("Email and password are required.")
 
-        user = authenticate(email=email, password=password)
-
-        # Find the user by their email
-        # try:
-        #     user = User.objects.get(email=email)
-        # except User.DoesNotExist:
-        #     raise AuthenticationFailed(
-        #         "No active account found with the given credentials"
-        #     )
-
-        # Authentication
-        authenticated_user = authenticate(username=email, password=password)
+        # One backend pass (todo.backends.EmailBackend, a point lookup on the
+        # normalized email) and one password hash verification.
+        authenticated_user = authenticate(
+            self.context.get("request"), email=email, password=password
+        )
+        return self.issue_tokens(authenticated_user)
 
+    def issue_tokens(self, authenticated_user):
         if not authenticated_user:
             raise AuthenticationFailed(
                 "No active account found with the given credentials"
@@ -111,7 +293,7 @@ class EmailLoginSerializer(ModelSerializer):
         if not authenticated_user.is_active:
             raise AuthenticationFailed("User account is disabled.")
 
-        refresh = RefreshToken.for_user(authenticated_user)
+        refresh = TodoRefreshToken.for_user(authenticated_user)
 
         return {
             "refresh": str(refresh),
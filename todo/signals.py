@@ -0,0 +1,59 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.dispatch import Signal
+
+
+# Sent once per owner whenever their todos change, by the model save/delete
+# signals as well as by the bulk and single-query write paths that bypass them.
+# Arguments: owner_id, created, updated, deleted (lists of todo ids).
+todos_changed = Signal()
+
+_pending = ContextVar("todo_pending_changes", default=None)
+
+
+def notify_todos_changed(sender, owner_id, created=(), updated=(), deleted=()):
+    """
+    Send `todos_changed`, or fold it into the surrounding `batch_todo_changes()`
+    block so a batch only pays for one notification per owner.
+    """
+    # Token users' ids used to arrive as strings: keep one key per owner.
+    owner_id = int(owner_id)
+    pending = _pending.get()
+    if pending is None:
+        todos_changed.send(
+            sender=sender,
+            owner_id=owner_id,
+            created=list(created),
+            updated=list(updated),
+            deleted=list(deleted),
+        )
+        return
+
+    changes = pending.setdefault(
+        (sender, owner_id), {"created": [], "updated": [], "deleted": []}
+    )
+    changes["created"].extend(created)
+    changes["updated"].extend(updated)
+    changes["deleted"].extend(deleted)
+
+
+@contextmanager
+def batch_todo_changes():
+    """
+    Collect the todo change notifications raised inside the block and send
+    them as one `todos_changed` per owner when it exits.
+    """
+    if _pending.get() is not None:
+        yield
+        return
+
+    token = _pending.set({})
+    try:
+        yield
+        pending = _pending.get()
+    finally:
+        _pending.reset(token)
+
+    for (sender, owner_id), changes in pending.items():
+        todos_changed.send(sender=sender, owner_id=owner_id, **changes)
@@ -0,0 +1,388 @@
+import datetime
+
+from django.db import connections
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+
+from .models import ArchivedTodo, Todo, TodoDailyStats, TodoStats
+from .transactions import write_atomic
+
+
+# Triggers keep todo_todostats and todo_tododailystats in step with every
+# write to todo_todo: the view and bulk paths, queryset.update(), bulk_create
+# and the raw completion toggle alike, inside the writing transaction. Only
+# live todos count: a soft delete subtracts the todo like a delete, a restore
+# adds it back like an insert, and purging it later changes nothing.
+SQLITE_ADD_TODO = """
+        INSERT INTO todo_todostats (owner_id, total, completed)
+        VALUES (new.owner_id, 1, new.completed)
+        ON CONFLICT (owner_id) DO UPDATE
+        SET total = total + 1, completed = completed + excluded.completed;
+        INSERT INTO todo_tododailystats (owner_id, day, created)
+        VALUES (new.owner_id, date(new.date_created), 1)
+        ON CONFLICT (owner_id, day) DO UPDATE SET created = created + 1;
+"""
+
+SQLITE_REMOVE_TODO = """
+        UPDATE todo_todostats
+        SET total = total - 1, completed = completed - old.completed
+        WHERE owner_id = old.owner_id;
+        UPDATE todo_tododailystats SET created = created - 1
+        WHERE owner_id = old.owner_id AND day = date(old.date_created);
+"""
+
+SQLITE_STATS_SCHEMA = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS todo_stats_ai AFTER INSERT ON todo_todo
+    WHEN new.deleted_at IS NULL BEGIN {SQLITE_ADD_TODO}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS todo_stats_ad AFTER DELETE ON todo_todo
+    WHEN old.deleted_at IS NULL BEGIN {SQLITE_REMOVE_TODO}
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS todo_stats_au AFTER UPDATE OF completed ON todo_todo
+    WHEN old.completed <> new.completed
+    AND old.deleted_at IS NULL AND new.deleted_at IS NULL BEGIN
+        UPDATE todo_todostats SET completed = completed + new.completed - old.completed
+        WHERE owner_id = new.owner_id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS todo_stats_soft_delete AFTER UPDATE OF deleted_at
+    ON todo_todo WHEN old.deleted_at IS NULL AND new.deleted_at IS NOT NULL
+    BEGIN {SQLITE_REMOVE_TODO}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS todo_stats_restore AFTER UPDATE OF deleted_at
+    ON todo_todo WHEN old.deleted_at IS NOT NULL AND new.deleted_at IS NULL
+    BEGIN {SQLITE_ADD_TODO}
+    END
+    """,
+]
+
+SQLITE_STATS_TEARDOWN = [
+    "DROP TRIGGER IF EXISTS todo_stats_ai",
+    "DROP TRIGGER IF EXISTS todo_stats_ad",
+    "DROP TRIGGER IF EXISTS todo_stats_au",
+    "DROP TRIGGER IF EXISTS todo_stats_soft_delete",
+    "DROP TRIGGER IF EXISTS todo_stats_restore",
+]
+
+POSTGRES_ADD_TODO = """
+            INSERT INTO todo_todostats (owner_id, total, completed)
+            VALUES (NEW.owner_id, 1, NEW.completed::int)
+            ON CONFLICT (owner_id) DO UPDATE
+            SET total = todo_todostats.total + 1,
+                completed = todo_todostats.completed + EXCLUDED.completed;
+            INSERT INTO todo_tododailystats (owner_id, day, created)
+            VALUES (NEW.owner_id, (NEW.date_created AT TIME ZONE 'UTC')::date, 1)
+            ON CONFLICT (owner_id, day) DO UPDATE
+            SET created = todo_tododailystats.created + 1;
+"""
+
+POSTGRES_REMOVE_TODO = """
+            UPDATE todo_todostats
+            SET total = total - 1, completed = completed - OLD.completed::int
+            WHERE owner_id = OLD.owner_id;
+            UPDATE todo_tododailystats SET created = created - 1
+            WHERE owner_id = OLD.owner_id
+            AND day = (OLD.date_created AT TIME ZONE 'UTC')::date;
+"""
+
+POSTGRES_STATS_SCHEMA = [
+    f"""
+    CREATE OR REPLACE FUNCTION todo_stats_sync() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            IF NEW.deleted_at IS NULL THEN {POSTGRES_ADD_TODO}
+            END IF;
+        ELSIF TG_OP = 'DELETE' THEN
+            IF OLD.deleted_at IS NULL THEN {POSTGRES_REMOVE_TODO}
+            END IF;
+        ELSIF OLD.deleted_at IS NULL AND NEW.deleted_at IS NOT NULL THEN
+            {POSTGRES_REMOVE_TODO}
+        ELSIF OLD.deleted_at IS NOT NULL AND NEW.deleted_at IS NULL THEN
+            {POSTGRES_ADD_TODO}
+        ELSIF NEW.deleted_at IS NULL
+        AND NEW.completed IS DISTINCT FROM OLD.completed THEN
+            UPDATE todo_todostats
+            SET completed = completed + NEW.completed::int - OLD.completed::int
+            WHERE owner_id = NEW.owner_id;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS todo_stats_sync ON todo_todo",
+    # No column list on UPDATE: PostgreSQL checks it when the trigger is
+    # created, and migration 0009 creates it before deleted_at exists.
+    """
+    CREATE TRIGGER todo_stats_sync
+    AFTER INSERT OR DELETE OR UPDATE ON todo_todo
+    FOR EACH ROW EXECUTE FUNCTION todo_stats_sync()
+    """,
+]
+
+POSTGRES_STATS_TEARDOWN = [
+    "DROP TRIGGER IF EXISTS todo_stats_sync ON todo_todo",
+    "DROP FUNCTION IF EXISTS todo_stats_sync()",
+]
+
+# Archived todos still count: moving a todo to todo_archivedtodo removes it
+# from todo_todo and adds it here, which nets out.
+SQLITE_ARCHIVE_STATS_SCHEMA = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS todo_stats_archive_ai AFTER INSERT
+    ON todo_archivedtodo BEGIN {SQLITE_ADD_TODO}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS todo_stats_archive_ad AFTER DELETE
+    ON todo_archivedtodo BEGIN {SQLITE_REMOVE_TODO}
+    END
+    """,
+]
+
+POSTGRES_ARCHIVE_STATS_SCHEMA = [
+    f"""
+    CREATE OR REPLACE FUNCTION todo_stats_archive_sync() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN {POSTGRES_ADD_TODO}
+        ELSE {POSTGRES_REMOVE_TODO}
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS todo_stats_archive_sync ON todo_archivedtodo",
+    """
+    CREATE TRIGGER todo_stats_archive_sync
+    AFTER INSERT OR DELETE ON todo_archivedtodo
+    FOR EACH ROW EXECUTE FUNCTION todo_stats_archive_sync()
+    """,
+]
+
+MAX_DAYS = 366
+MAX_WEEKS = 104
+
+
+def stats_backend(using):
+    vendor = connections[using].vendor
+    if vendor in ("sqlite", "postgresql"):
+        return vendor
+    return None
+
+
+def install_stats_triggers(schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {"sqlite": SQLITE_STATS_SCHEMA, "postgresql": POSTGRES_STATS_SCHEMA}
+    for statement in statements.get(vendor, []):
+        schema_editor.execute(statement)
+
+
+def remove_stats_triggers(schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {"sqlite": SQLITE_STATS_TEARDOWN, "postgresql": POSTGRES_STATS_TEARDOWN}
+    for statement in statements.get(vendor, []):
+        schema_editor.execute(statement)
+
+
+def install_archive_stats_triggers(schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {
+        "sqlite": SQLITE_ARCHIVE_STATS_SCHEMA,
+        "postgresql": POSTGRES_ARCHIVE_STATS_SCHEMA,
+    }
+    for statement in statements.get(vendor, []):
+        schema_editor.execute(statement)
+
+
+def ensure_stats_triggers(using="default", apps=None, **kwargs):
+    """
+    `post_migrate` receiver: put the SQLite triggers back if a table rebuild
+    dropped them. Not when migrating back to before soft deletes: these
+    triggers need todo_todo.deleted_at, and the migrations install their own.
+    """
+    db = connections[using]
+    if db.vendor != "sqlite":
+        return
+    tables = db.introspection.table_names()
+    if "todo_todostats" not in tables:
+        return
+    if apps is not None:
+        fields = apps.get_model("todo", "Todo")._meta.get_fields()
+        if not any(field.name == "deleted_at" for field in fields):
+            return
+    with db.schema_editor() as schema_editor:
+        install_stats_triggers(schema_editor)
+        if "todo_archivedtodo" in tables:
+            install_archive_stats_triggers(schema_editor)
+
+
+def count_totals(todos):
+    """
+    `{owner_id: (total, completed)}`, counted from the todos themselves.
+    """
+    return {
+        row["owner_id"]: (row["total"], row["completed"])
+        for row in todos.order_by()
+        .values("owner_id")
+        .annotate(total=Count("id"), completed=Count("id", filter=Q(completed=True)))
+    }
+
+
+def count_days(todos):
+    """
+    `{(owner_id, day): created}`, counted from the todos themselves.
+    """
+    return {
+        (row["owner_id"], row["day"]): row["created"]
+        for row in todos.order_by()
+        .annotate(day=TruncDate("date_created", tzinfo=datetime.timezone.utc))
+        .values("owner_id", "day")
+        .annotate(created=Count("id"))
+    }
+
+
+def count_all(querysets):
+    """`count_totals()` and `count_days()` summed over several querysets."""
+    totals, days = {}, {}
+    for todos in querysets:
+        for owner_id, (total, completed) in count_totals(todos).items():
+            old_total, old_completed = totals.get(owner_id, (0, 0))
+            totals[owner_id] = (old_total + total, old_completed + completed)
+        for key, created in count_days(todos).items():
+            days[key] = days.get(key, 0) + created
+    return totals, days
+
+
+def rebuild_stats(owner_ids=None, using="default", apps=None):
+    """
+    Recompute the summary tables from the live and archived todos, for some
+    owners or everyone.
+    Returns the number of owners rebuilt. Migrations pass their `apps`.
+    """
+    if apps is not None:
+        todo_model = apps.get_model("todo", "Todo")
+        stats_model = apps.get_model("todo", "TodoStats")
+        daily_model = apps.get_model("todo", "TodoDailyStats")
+        try:
+            archive_model = apps.get_model("todo", "ArchivedTodo")
+        except LookupError:
+            # Older migrations pass the models from before archiving.
+            archive_model = None
+    else:
+        todo_model, stats_model, daily_model = Todo, TodoStats, TodoDailyStats
+        archive_model = ArchivedTodo
+
+    db = connections[using]
+    # Todos of deleted users are only waiting for purge_todos.
+    users = todo_model._meta.get_field("owner").related_model
+    live_users = users._base_manager.using(using).values("pk")
+    sources = [todo_model, archive_model] if archive_model else [todo_model]
+    querysets = []
+    for model in sources:
+        todos = model._base_manager.using(using).filter(owner_id__in=live_users)
+        if any(field.name == "deleted_at" for field in model._meta.fields):
+            # Older migrations pass a Todo from before soft deletes.
+            todos = todos.filter(deleted_at__isnull=True)
+        if owner_ids is not None:
+            todos = todos.filter(owner_id__in=owner_ids)
+        querysets.append(todos)
+    stats = stats_model.objects.using(using)
+    daily = daily_model.objects.using(using)
+    if owner_ids is not None:
+        stats = stats.filter(owner_id__in=owner_ids)
+        daily = daily.filter(owner_id__in=owner_ids)
+
+    with write_atomic(using=using):
+        if db.vendor == "postgresql":
+            tables = ", ".join(model._meta.db_table for model in sources)
+            with db.cursor() as cursor:
+                cursor.execute(f"LOCK TABLE {tables} IN SHARE ROW EXCLUSIVE MODE")
+        # Writing first also takes SQLite's write lock, so no todo changes
+        # between the counts below and the commit.
+        stats.delete()
+        daily.delete()
+        totals, days = count_all(querysets)
+        stats_model.objects.using(using).bulk_create(
+            (
+                stats_model(owner_id=owner_id, total=total, completed=completed)
+                for owner_id, (total, completed) in totals.items()
+            ),
+            batch_size=1000,
+        )
+        daily_model.objects.using(using).bulk_create(
+            (
+                daily_model(owner_id=owner_id, day=day, created=created)
+                for (owner_id, day), created in days.items()
+            ),
+            batch_size=1000,
+        )
+    return len(totals)
+
+
+def get_stats(user, days=30, weeks=12, today=None):
+    """
+    The user's todo counts, plus how many of their todos were created on each
+    of the last `days` days and in each of the last `weeks` weeks (starting
+    on Mondays, UTC). Served from the summary tables, so the cost does not
+    depend on how many todos the user has.
+    """
+    today = today or datetime.datetime.now(datetime.timezone.utc).date()
+    first_day = today - datetime.timedelta(days=days - 1)
+    this_week = today - datetime.timedelta(days=today.weekday())
+    first_week = this_week - datetime.timedelta(weeks=weeks - 1)
+    start = min(first_day, first_week)
+
+    if stats_backend(TodoStats.objects.db) is None:
+        # No triggers on this backend: count live.
+        since = datetime.datetime.combine(
+            start, datetime.time(), tzinfo=datetime.timezone.utc
+        )
+        owned = [
+            Todo.objects.filter(owner_id=user.pk),
+            ArchivedTodo.objects.filter(owner_id=user.pk),
+        ]
+        total = completed = 0
+        created = {}
+        for todos in owned:
+            count, done = count_totals(todos).get(user.pk, (0, 0))
+            total, completed = total + count, completed + done
+            recent = todos.filter(date_created__gte=since)
+            for (_, day), count in count_days(recent).items():
+                created[day] = created.get(day, 0) + count
+    else:
+        row = TodoStats.objects.filter(owner_id=user.pk).values_list(
+            "total", "completed"
+        ).first()
+        total, completed = row or (0, 0)
+        created = dict(
+            TodoDailyStats.objects.filter(
+                owner_id=user.pk, day__gte=start, day__lte=today
+            ).values_list("day", "created")
+        )
+
+    per_day = [
+        {"day": day, "created": created.get(day, 0)}
+        for day in (first_day + datetime.timedelta(days=i) for i in range(days))
+    ]
+    per_week = []
+    for i in range(weeks):
+        week = first_week + datetime.timedelta(weeks=i)
+        count = sum(
+            created.get(week + datetime.timedelta(days=d), 0) for d in range(7)
+        )
+        per_week.append({"week": week, "created": count})
+
+    return {
+        "total": total,
+        "completed": completed,
+        "pending": total - completed,
+        "created_per_day": per_day,
+        "created_per_week": per_week,
+    }
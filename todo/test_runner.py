@@ -0,0 +1,32 @@
+import os
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TodoTestRunner(DiscoverRunner):
+    """
+    `manage.py test` with a strict query budget, so an N+1 query fails the
+    tests, and with the cheap "fast" password hasher unless
+    TODO_PASSWORD_HASHER is set explicitly.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        overrides = {"TODO_QUERY_BUDGET_STRICT": True}
+        if "TODO_PASSWORD_HASHER" not in os.environ:
+            fast = settings.PASSWORD_HASHER_PROFILES["fast"]
+            overrides.update(
+                TODO_PASSWORD_HASHER="fast",
+                PASSWORD_HASHERS=[
+                    fast,
+                    *(hasher for hasher in settings.PASSWORD_HASHERS if hasher != fast),
+                ],
+            )
+        self.test_settings = override_settings(**overrides)
+        self.test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.test_settings.disable()
+        super().teardown_test_environment(**kwargs)
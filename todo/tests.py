@@ -1,8 +1,66 @@
-from rest_framework.test import APITestCase
+import csv
+import datetime
+import io
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from unittest import mock
+
+from asgiref.sync import iscoroutinefunction
+
+from rest_framework.test import APITestCase, APITransactionTestCase
 from rest_framework import status
-from django.contrib.auth.models import User
-from .models import Todo
-from django.urls import reverse  # Used to get URLs by name
+from django.contrib.auth.hashers import MD5PasswordHasher, make_password
+from django.contrib.auth import authenticate
+from django.contrib.auth.models import User, update_last_login
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from .models import (
+    ArchivedTodo,
+    Todo,
+    TodoChange,
+    TodoCollectionVersion,
+    TodoDailyStats,
+    TodoStats,
+    UserEmail,
+)
+from .authentication import TodoRefreshToken
+from .cache import response_cache
+from .events import hub
+from .export import NDJSONRenderer
+from .metrics import QueryBudgetExceeded, metrics
+from .routers import ReplicaRouter, pin_cache, pin_key, routing_context
+from .seed import seed_todos, todo_counts
+from .stats import rebuild_stats
+from . import writebehind
+from .throttling import (
+    GCRAUserRateThrottle,
+    MemoryStore,
+    SQLiteStore,
+    SharedMemoryStore,
+    get_store,
+)
+from .transactions import write_atomic
+from .writebehind import Write, write_behind
+from .serializers import (
+    TodoSerializer,
+    TodoDetailSerializer,
+    todo_rows,
+    todo_detail_rows,
+)
+from django.urls import resolve, reverse  # Used to get URLs by name
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
 
 # Test cases inherit from APITestCase
@@ -249,3 +307,2706 @@ class TodoAPITests(APITestCase):
         response = self.client.put(url)
 
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TodoCursorPaginationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="pager@test.com",
+            email="pager@test.com",
+            password="password123",
+        )
+        # 25 todos with distinct titles, every third one completed
+        for i in range(25):
+            Todo.objects.create(
+                owner=self.user,
+                title=f"Task {i:02d}",
+                description="",
+                completed=i % 3 == 0,
+            )
+        self.client.force_authenticate(user=self.user)
+
+    def collect_pages(self, url):
+        titles = []
+        pages = 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn("count", response.data)
+            titles.extend(todo["title"] for todo in response.data["results"])
+            url = response.data["next"]
+            pages += 1
+        return titles, pages
+
+    def test_cursor_mode_walks_every_todo_once(self):
+        """
+        Test that following `next` links returns every todo exactly once,
+        newest first, without a count.
+        """
+        titles, pages = self.collect_pages("/todos/?pagination=cursor")
+
+        expected = list(
+            Todo.objects.filter(owner=self.user)
+            .order_by("-date_created", "-id")
+            .values_list("title", flat=True)
+        )
+        self.assertEqual(titles, expected)
+        self.assertEqual(pages, 3)
+
+    def test_cursor_mode_respects_ordering(self):
+        """
+        Test that `?ordering=` keeps working with cursor pagination, including
+        on a non-unique field.
+        """
+        titles, _ = self.collect_pages("/todos/?pagination=cursor&ordering=title")
+        self.assertEqual(titles, sorted(titles))
+        self.assertEqual(len(titles), 25)
+
+        titles, _ = self.collect_pages(
+            "/todos/?pagination=cursor&ordering=-completed"
+        )
+        expected = list(
+            Todo.objects.filter(owner=self.user)
+            .order_by("-completed", "-id")
+            .values_list("title", flat=True)
+        )
+        self.assertEqual(titles, expected)
+
+    def test_cursor_previous_link_returns_previous_page(self):
+        """
+        Test that the `previous` link of the second page leads back to the first.
+        """
+        first = self.client.get("/todos/?pagination=cursor")
+        second = self.client.get(first.data["next"])
+        back = self.client.get(second.data["previous"])
+
+        self.assertIsNone(first.data["previous"])
+        self.assertEqual(back.data["results"], first.data["results"])
+
+    def test_invalid_cursor_returns_404(self):
+        """
+        Test that a tampered cursor is rejected.
+        """
+        response = self.client.get("/todos/?cursor=not-a-cursor")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_page_number_pagination_is_still_the_default(self):
+        """
+        Test that the list keeps PageNumberPagination unless cursor mode is asked for.
+        """
+        response = self.client.get("/todos/")
+        self.assertEqual(response.data["count"], 25)
+
+
+class TodoSearchTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="search@test.com",
+            email="search@test.com",
+            password="password123",
+        )
+        self.other = User.objects.create_user(
+            username="other@test.com",
+            email="other@test.com",
+            password="password123",
+        )
+        self.groceries = Todo.objects.create(
+            owner=self.user, title="Buy groceries", description="Milk and bread"
+        )
+        self.milk = Todo.objects.create(
+            owner=self.user,
+            title="Milk the cows",
+            description="Milk, milk and more milk before the groceries run",
+        )
+        self.report = Todo.objects.create(
+            owner=self.user, title="Write report", description="Quarterly numbers"
+        )
+        Todo.objects.create(owner=self.other, title="Buy milk", description="")
+        self.client.force_authenticate(user=self.user)
+
+    def search(self, query):
+        response = self.client.get(f"/todos/?{query}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [todo["id"] for todo in response.data["results"]]
+
+    def test_search_matches_words_and_prefixes(self):
+        """
+        Test that `?search=` finds whole words and word prefixes in title and
+        description, only within the user's own todos.
+        """
+        self.assertCountEqual(
+            self.search("search=milk"), [self.groceries.id, self.milk.id]
+        )
+        self.assertCountEqual(
+            self.search("search=grocer"), [self.groceries.id, self.milk.id]
+        )
+        self.assertEqual(self.search("search=quarterly report"), [self.report.id])
+        self.assertEqual(self.search("search=nothing"), [])
+
+    def test_search_results_are_ranked(self):
+        """
+        Test that the best match comes first unless an ordering is requested.
+        """
+        self.assertEqual(self.search("search=milk")[0], self.milk.id)
+        self.assertEqual(
+            self.search("search=milk&ordering=title"),
+            [self.groceries.id, self.milk.id],
+        )
+
+    def test_search_index_follows_updates_and_deletes(self):
+        """
+        Test that the full-text index is kept in sync on save and delete.
+        """
+        self.report.title = "Write essay"
+        self.report.save()
+        self.assertEqual(self.search("search=report"), [])
+        self.assertEqual(self.search("search=essay"), [self.report.id])
+
+        self.report.delete()
+        self.assertEqual(self.search("search=essay"), [])
+
+    def test_column_search_filters(self):
+        """
+        Test that `title_search` and `description_search` only look at their column.
+        """
+        self.assertEqual(self.search("title_search=milk"), [self.milk.id])
+        self.assertCountEqual(
+            self.search("description_search=milk"), [self.groceries.id, self.milk.id]
+        )
+
+    def test_column_search_filters_match_substrings(self):
+        """
+        Test that `title_search` and `description_search` match anywhere in
+        the column, not only at the start of a word.
+        """
+        self.assertEqual(self.search("title_search=ilk"), [self.milk.id])
+        self.assertEqual(self.search("description_search=uarter"), [self.report.id])
+        self.assertEqual(self.search("title_search=!"), [])
+
+    def test_search_without_words_matches_substrings(self):
+        """
+        Test that a `?search=` term with no words in it (only punctuation)
+        falls back to a substring match instead of finding nothing.
+        """
+        self.milk.title = "Milk the cows!"
+        self.milk.save()
+        self.assertEqual(self.search("search=!"), [self.milk.id])
+
+    def test_search_with_cursor_pagination(self):
+        """
+        Test that ranked search results can be walked with cursor pagination.
+        """
+        for i in range(12):
+            Todo.objects.create(owner=self.user, title=f"Milk run {i}", description="")
+
+        seen = []
+        url = "/todos/?search=milk&pagination=cursor"
+        while url:
+            response = self.client.get(url)
+            seen.extend(todo["id"] for todo in response.data["results"])
+            url = response.data["next"]
+        self.assertEqual(len(seen), 14)
+        self.assertEqual(len(set(seen)), 14)
+
+
+class TodoBulkTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="bulk@test.com",
+            email="bulk@test.com",
+            password="password123",
+        )
+        self.other = User.objects.create_user(
+            username="bulk-other@test.com",
+            email="bulk-other@test.com",
+            password="password123",
+        )
+        self.todos = [
+            Todo.objects.create(owner=self.user, title=f"Task {i}", description="")
+            for i in range(5)
+        ]
+        self.foreign = Todo.objects.create(owner=self.other, title="Not yours")
+        self.client.force_authenticate(user=self.user)
+
+    def test_bulk_operations_are_applied(self):
+        """
+        Test that creates, updates, toggles and deletes in one request are all
+        applied and reported per item.
+        """
+        data = {
+            "create": [
+                {"title": "New 1", "description": "a"},
+                {"title": "New 2", "description": "b", "completed": True},
+            ],
+            "update": [{"id": self.todos[0].id, "title": "Renamed"}],
+            "toggle": [self.todos[1].id, self.todos[2].id],
+            "delete": [self.todos[3].id],
+        }
+        response = self.client.post("/todos/bulk/", data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item["todo"]["title"] for item in response.data["create"]],
+            ["New 1", "New 2"],
+        )
+        self.assertEqual(response.data["update"][0]["todo"]["title"], "Renamed")
+        self.assertEqual(
+            [item["completed"] for item in response.data["toggle"]], [True, True]
+        )
+        self.assertEqual(response.data["delete"], [{"id": self.todos[3].id, "status": 204}])
+
+        self.assertEqual(Todo.objects.filter(owner=self.user).count(), 6)
+        self.todos[0].refresh_from_db()
+        self.assertEqual(self.todos[0].title, "Renamed")
+        self.assertEqual(self.todos[0].description, "")
+        self.assertEqual(
+            Todo.objects.filter(owner=self.user, completed=True).count(), 3
+        )
+
+    def test_bulk_query_count_does_not_grow_with_batch_size(self):
+        """
+        Test that a batch costs a constant number of queries.
+        """
+        extra = [
+            Todo.objects.create(owner=self.user, title=f"Extra {i}", description="")
+            for i in range(20)
+        ]
+
+        def run_batch(todos, creates):
+            data = {
+                "create": [
+                    {"title": f"New {i}", "description": "d"} for i in range(creates)
+                ],
+                "update": [{"id": todo.id, "description": "x"} for todo in todos[0::3]],
+                "toggle": [todo.id for todo in todos[1::3]],
+                "delete": [todo.id for todo in todos[2::3]],
+            }
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post("/todos/bulk/", data, format="json")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return len(queries)
+
+        self.assertEqual(run_batch(self.todos[:3], 1), run_batch(extra, 50))
+
+    def test_bulk_cannot_touch_other_users_todos(self):
+        """
+        Test security: todos owned by someone else are reported as not found
+        and left untouched.
+        """
+        toggled = Todo.objects.create(owner=self.other, title="Not yours either")
+        deleted = Todo.objects.create(owner=self.other, title="Not yours at all")
+        data = {
+            "update": [{"id": self.foreign.id, "title": "Hacked"}],
+            "toggle": [toggled.id],
+            "delete": [deleted.id],
+        }
+        response = self.client.post("/todos/bulk/", data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["update"][0]["status"], 404)
+        self.assertEqual(response.data["toggle"][0]["status"], 404)
+        self.assertEqual(response.data["delete"][0]["status"], 404)
+        self.foreign.refresh_from_db()
+        self.assertEqual(self.foreign.title, "Not yours")
+        toggled.refresh_from_db()
+        self.assertFalse(toggled.completed)
+        self.assertTrue(Todo.objects.filter(id=deleted.id).exists())
+
+    def test_invalid_batch_is_rejected_as_a_whole(self):
+        """
+        Test that one invalid item rejects the whole batch with per-item errors.
+        """
+        data = {
+            "create": [{"title": "Fine", "description": "d"}, {"description": "no title"}],
+            "delete": [self.todos[0].id],
+        }
+        response = self.client.post("/todos/bulk/", data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("title", response.data["create"][1])
+        self.assertTrue(Todo.objects.filter(id=self.todos[0].id).exists())
+        self.assertFalse(Todo.objects.filter(title="Fine").exists())
+
+    def test_duplicate_ids_are_rejected(self):
+        """
+        Test that a todo named twice, in one operation or across update,
+        toggle and delete, rejects the batch with an error on the later items.
+        """
+        first, second = self.todos[0].id, self.todos[1].id
+        data = {
+            "update": [{"id": first, "title": "A"}, {"id": first, "title": "B"}],
+            "toggle": [second, second, first],
+            "delete": [second],
+        }
+        response = self.client.post("/todos/bulk/", data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["update"][0], {})
+        self.assertIn("id", response.data["update"][1])
+        self.assertEqual(sorted(response.data["toggle"]), [1, 2])
+        self.assertEqual(list(response.data["delete"]), [0])
+        self.todos[0].refresh_from_db()
+        self.assertEqual((self.todos[0].title, self.todos[0].version), ("Task 0", 1))
+
+
+class TodoCompletionToggleTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="toggle@test.com",
+            email="toggle@test.com",
+            password="password123",
+        )
+        self.todo = Todo.objects.create(owner=self.user, title="Toggle me")
+        self.url = f"/todos/{self.todo.id}/complete/"
+        self.client.force_authenticate(user=self.user)
+
+    def test_toggle_is_a_single_query(self):
+        """
+        Test that flipping the state costs one UPDATE ... RETURNING round trip
+        on the todo table.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.put(self.url)
+
+        todo_queries = [q for q in queries.captured_queries if '"todo_todo"' in q["sql"]]
+        self.assertEqual(len(todo_queries), 1)
+        self.assertIn("RETURNING", todo_queries[0]["sql"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data["completed"])
+        self.assertEqual(response["ETag"], f'"{self.todo.id}.2"')
+
+    def test_patch_sets_explicit_state(self):
+        """
+        Test that PATCH sets the requested state instead of flipping it.
+        """
+        for _ in range(2):
+            response = self.client.patch(self.url, {"completed": True})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertTrue(response.data["completed"])
+
+        response = self.client.patch(self.url, {"completed": "maybe"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_if_match_guards_against_stale_versions(self):
+        """
+        Test that a toggle with an outdated ETag is refused with 412 and a
+        current one is applied.
+        """
+        etag = self.client.get(f"/todos/{self.todo.id}/")["ETag"]
+        self.client.put(self.url)
+
+        response = self.client.put(self.url, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+
+        etag = self.client.get(f"/todos/{self.todo.id}/")["ETag"]
+        response = self.client.put(self.url, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.todo.refresh_from_db()
+        self.assertFalse(self.todo.completed)
+        self.assertEqual(self.todo.version, 3)
+
+    def test_updates_bump_the_version(self):
+        """
+        Test that a regular update changes the ETag.
+        """
+        before = self.client.get(f"/todos/{self.todo.id}/")["ETag"]
+        response = self.client.put(
+            f"/todos/{self.todo.id}/", {"title": "Renamed", "description": "d"}
+        )
+        self.assertNotEqual(response["ETag"], before)
+
+
+class TodoConditionalGetTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="etag@test.com",
+            email="etag@test.com",
+            password="password123",
+        )
+        self.other = User.objects.create_user(
+            username="etag-other@test.com",
+            email="etag-other@test.com",
+            password="password123",
+        )
+        self.todo = Todo.objects.create(owner=self.user, title="Cached", description="d")
+        self.client.force_authenticate(user=self.user)
+
+    def test_list_returns_304_without_querying_todos(self):
+        """
+        Test that an unchanged list is answered with 304 from the collection
+        version alone.
+        """
+        response = self.client.get("/todos/")
+        etag = response["ETag"]
+        self.assertIn("Last-Modified", response)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/todos/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertFalse(
+            any('"todo_todo"' in q["sql"] for q in queries.captured_queries)
+        )
+
+    def test_list_etag_changes_with_writes_and_params(self):
+        """
+        Test that creating, toggling or deleting a todo, or asking for a
+        different page, invalidates the list ETag.
+        """
+        etags = {self.client.get("/todos/")["ETag"]}
+        etags.add(self.client.get("/todos/?ordering=title")["ETag"])
+
+        self.client.post("/todos/", {"title": "New", "description": "d"})
+        etags.add(self.client.get("/todos/")["ETag"])
+        self.client.put(f"/todos/{self.todo.id}/complete/")
+        etags.add(self.client.get("/todos/")["ETag"])
+        self.client.delete(f"/todos/{self.todo.id}/")
+        etags.add(self.client.get("/todos/")["ETag"])
+
+        self.assertEqual(len(etags), 5)
+
+    def test_other_users_writes_do_not_invalidate(self):
+        """
+        Test that the version counter is per user.
+        """
+        etag = self.client.get("/todos/")["ETag"]
+        Todo.objects.create(owner=self.other, title="Theirs", description="d")
+
+        response = self.client.get("/todos/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_conditional_get(self):
+        """
+        Test that the detail view answers If-None-Match with 304 until the
+        todo changes.
+        """
+        url = f"/todos/{self.todo.id}/"
+        etag = self.client.get(url)["ETag"]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertFalse(
+            any('"todo_todo"' in q["sql"] for q in queries.captured_queries)
+        )
+
+        self.client.put(url, {"title": "Changed", "description": "d"})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["title"], "Changed")
+
+    def test_if_modified_since(self):
+        """
+        Test that If-Modified-Since is honored when no ETag is sent.
+        """
+        last_modified = self.client.get("/todos/")["Last-Modified"]
+        response = self.client.get("/todos/", HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_conditional_detail_requests_for_missing_todos_are_404(self):
+        """
+        Test that a conditional detail request for a todo that does not exist
+        or is someone else's gets 404, not 304.
+        """
+        theirs = Todo.objects.create(owner=self.other, title="Theirs", description="d")
+        last_modified = self.client.get(f"/todos/{self.todo.id}/")["Last-Modified"]
+        for prefix in ["", "/async"]:
+            for todo_id in [theirs.id, theirs.id + 1]:
+                response = self.client.get(
+                    f"{prefix}/todos/{todo_id}/", HTTP_IF_MODIFIED_SINCE=last_modified
+                )
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+            response = self.client.get(
+                f"{prefix}/todos/{self.todo.id}/", HTTP_IF_MODIFIED_SINCE=last_modified
+            )
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+class TodoChangesFeedTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="sync@test.com",
+            email="sync@test.com",
+            password="password123",
+        )
+        self.other = User.objects.create_user(
+            username="sync-other@test.com",
+            email="sync-other@test.com",
+            password="password123",
+        )
+        self.first = Todo.objects.create(owner=self.user, title="First", description="d")
+        self.second = Todo.objects.create(owner=self.user, title="Second", description="d")
+        Todo.objects.create(owner=self.other, title="Theirs", description="d")
+        self.client.force_authenticate(user=self.user)
+
+    def sync(self, token=None, **params):
+        if token:
+            params["since"] = token
+        response = self.client.get("/todos/changes/", params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_full_sync_then_deltas(self):
+        """
+        Test that a sync without a token returns everything and later syncs
+        only what was created, updated or deleted since.
+        """
+        data = self.sync()
+        self.assertEqual(
+            [todo["title"] for todo in data["changed"]], ["First", "Second"]
+        )
+        self.assertEqual(data["deleted"], [])
+
+        data = self.sync(data["token"])
+        self.assertEqual(data["changed"], [])
+        token = data["token"]
+
+        self.client.put(f"/todos/{self.first.id}/complete/")
+        self.client.delete(f"/todos/{self.second.id}/")
+        self.client.post("/todos/", {"title": "Third", "description": "d"})
+
+        data = self.sync(token)
+        self.assertEqual(
+            [(todo["title"], todo["completed"]) for todo in data["changed"]],
+            [("First", True), ("Third", False)],
+        )
+        self.assertEqual(data["deleted"], [self.second.id])
+
+    def test_changes_are_paged(self):
+        """
+        Test that `limit` pages through the feed with `has_more`.
+        """
+        data = self.sync(limit=1)
+        self.assertTrue(data["has_more"])
+        self.assertEqual(len(data["changed"]), 1)
+
+        data = self.sync(data["token"], limit=1)
+        self.assertFalse(data["has_more"])
+        self.assertEqual(data["changed"][0]["title"], "Second")
+
+    def test_bulk_writes_are_recorded(self):
+        """
+        Test that writes through the bulk endpoint show up in the feed.
+        """
+        token = self.sync()["token"]
+        self.client.post(
+            "/todos/bulk/",
+            {"toggle": [self.first.id], "delete": [self.second.id]},
+            format="json",
+        )
+
+        data = self.sync(token)
+        self.assertEqual([todo["id"] for todo in data["changed"]], [self.first.id])
+        self.assertEqual(data["deleted"], [self.second.id])
+
+    def test_tokens_are_bound_to_the_user(self):
+        """
+        Test security: a token cannot be forged or reused by another user.
+        """
+        token = self.sync()["token"]
+
+        response = self.client.get("/todos/changes/", {"since": "garbage"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.force_authenticate(user=self.other)
+        response = self.client.get("/todos/changes/", {"since": token})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TodoResponseCacheTests(APITestCase):
+    def setUp(self):
+        caches["todo_responses"].clear()
+        response_cache.reset_stats()
+        self.user = User.objects.create_user(
+            username="cache@test.com",
+            email="cache@test.com",
+            password="password123",
+        )
+        self.other = User.objects.create_user(
+            username="cache-other@test.com",
+            email="cache-other@test.com",
+            password="password123",
+        )
+        self.todo = Todo.objects.create(owner=self.user, title="Cached", description="d")
+        self.theirs = Todo.objects.create(owner=self.other, title="Theirs", description="d")
+        self.client.force_authenticate(user=self.user)
+
+    def todo_table_queries(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, [q for q in queries.captured_queries if '"todo_todo"' in q["sql"]]
+
+    def test_repeated_reads_are_served_from_cache(self):
+        """
+        Test that identical list and detail reads only hit the database once.
+        """
+        for url in ["/todos/", f"/todos/{self.todo.id}/"]:
+            first, queries = self.todo_table_queries(url)
+            self.assertTrue(queries)
+            second, queries = self.todo_table_queries(url)
+            self.assertEqual(queries, [])
+            self.assertEqual(second.data, first.data)
+            self.assertEqual(second["ETag"], first["ETag"])
+
+        self.assertEqual(
+            response_cache.stats(),
+            {"detail": {"hits": 1, "misses": 1}, "list": {"hits": 1, "misses": 1}},
+        )
+
+    def test_query_params_are_normalized(self):
+        """
+        Test that parameter order and empty parameters share one cache entry,
+        while different filters do not.
+        """
+        self.todo_table_queries("/todos/", ordering="title", completed="false")
+        _, queries = self.todo_table_queries(
+            "/todos/?completed=false&search=&ordering=title"
+        )
+        self.assertEqual(queries, [])
+        _, queries = self.todo_table_queries("/todos/", completed="true")
+        self.assertTrue(queries)
+
+    def test_writes_invalidate_only_the_owners_entries(self):
+        """
+        Test that changing a todo refreshes its owner's cached responses and
+        leaves other users' entries alone.
+        """
+        self.todo_table_queries("/todos/")
+        self.client.force_authenticate(user=self.other)
+        self.todo_table_queries("/todos/")
+
+        self.client.force_authenticate(user=self.user)
+        self.client.put(
+            f"/todos/{self.todo.id}/", {"title": "Renamed", "description": "d"}
+        )
+        response, queries = self.todo_table_queries("/todos/")
+        self.assertTrue(queries)
+        self.assertEqual(response.data["results"][0]["title"], "Renamed")
+
+        self.client.force_authenticate(user=self.other)
+        _, queries = self.todo_table_queries("/todos/")
+        self.assertEqual(queries, [])
+
+    def test_stats_are_admin_only(self):
+        """
+        Test that the hit/miss counters are only exposed to staff.
+        """
+        response = self.client.get("/cache/stats/")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get("/cache/stats/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+@override_settings(TODO_RESPONSE_CACHE=None)
+class TodoFastSerializationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="fast@test.com",
+            email="fast@test.com",
+            password="password123",
+        )
+        for i in range(5):
+            Todo.objects.create(
+                owner=self.user,
+                title=f"Fast {i} – ünïcode",
+                description="d" * i or "d",
+                completed=bool(i % 2),
+            )
+        self.client.force_authenticate(user=self.user)
+
+    def get_both(self, url, **params):
+        fast = self.client.get(url, params)
+        with override_settings(TODO_FAST_SERIALIZATION=False):
+            slow = self.client.get(url, params)
+        self.assertEqual(fast.status_code, status.HTTP_200_OK)
+        self.assertEqual(slow.status_code, status.HTTP_200_OK)
+        return fast, slow
+
+    def test_rows_render_like_the_serializers(self):
+        """
+        Test that the row serializer produces exactly the serializer output,
+        from model instances and from value rows alike.
+        """
+        queryset = Todo.objects.filter(owner=self.user).order_by("id")
+        for rows, serializer in [
+            (todo_rows, TodoSerializer),
+            (todo_detail_rows, TodoDetailSerializer),
+        ]:
+            expected = serializer(queryset, many=True).data
+            self.assertEqual(rows.render(queryset), expected)
+            self.assertEqual(rows.render(rows.values(queryset)), expected)
+
+    def test_list_responses_are_byte_identical(self):
+        """
+        Test that the fast path returns the same bytes as the DRF serializers
+        for page-number, cursor and search listings.
+        """
+        for params in [
+            {},
+            {"ordering": "title"},
+            {"pagination": "cursor", "page_size": 2},
+            {"search": "fast"},
+            {"completed": "true"},
+        ]:
+            fast, slow = self.get_both("/todos/", **params)
+            self.assertEqual(fast.content, slow.content, params)
+
+        fast, slow = self.get_both("/todos/changes/")
+        self.assertEqual(
+            json.loads(fast.content)["changed"], json.loads(slow.content)["changed"]
+        )
+
+    def test_list_does_not_build_model_instances(self):
+        """
+        Test that the list view only selects the serialized columns.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get("/todos/")
+        (select,) = [
+            q["sql"]
+            for q in queries.captured_queries
+            if '"todo_todo"' in q["sql"] and "COUNT" not in q["sql"]
+        ]
+        self.assertNotIn('"todo_todo"."owner_id",', select.split("FROM")[0])
+        self.assertNotIn('"todo_todo"."version"', select.split("FROM")[0])
+
+
+class TodoExportTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="export@test.com",
+            email="export@test.com",
+            password="password123",
+        )
+        self.other = User.objects.create_user(
+            username="export-other@test.com",
+            email="export-other@test.com",
+            password="password123",
+        )
+        for i in range(7):
+            Todo.objects.create(
+                owner=self.user,
+                title=f"Export {i}",
+                description="line, with \"quotes\"",
+                completed=i < 3,
+            )
+        Todo.objects.create(owner=self.other, title="Not mine", description="d")
+        self.client.force_authenticate(user=self.user)
+
+    def export(self, **params):
+        response = self.client.get("/todos/export/", params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return response, b"".join(response.streaming_content).decode()
+
+    def test_ndjson_export_is_the_default(self):
+        """
+        Test that the export streams one JSON object per line for every one of
+        the user's todos, rendered like the list endpoint.
+        """
+        response, content = self.export()
+        self.assertTrue(response["Content-Type"].startswith("application/x-ndjson"))
+        self.assertIn("todos.ndjson", response["Content-Disposition"])
+
+        rows = [json.loads(line) for line in content.splitlines()]
+        expected = TodoSerializer(
+            Todo.objects.filter(owner=self.user).order_by("-date_created", "-id"),
+            many=True,
+        ).data
+        self.assertEqual(rows, json.loads(json.dumps(expected)))
+
+    def test_csv_export(self):
+        """
+        Test that `?format=csv` streams a header row and properly quoted values.
+        """
+        response, content = self.export(format="csv", ordering="title")
+        self.assertTrue(response["Content-Type"].startswith("text/csv"))
+
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual(len(rows), 7)
+        self.assertEqual(rows[0]["title"], "Export 0")
+        self.assertEqual(rows[0]["description"], 'line, with "quotes"')
+        self.assertEqual(
+            list(rows[0]), ["id", "title", "description", "completed", "date_created"]
+        )
+
+    def test_export_honors_filters_and_search(self):
+        """
+        Test that the list filters, search and ordering apply to the export.
+        """
+        _, content = self.export(completed="true", ordering="-title")
+        titles = [json.loads(line)["title"] for line in content.splitlines()]
+        self.assertEqual(titles, ["Export 2", "Export 1", "Export 0"])
+
+        _, content = self.export(search="mine")
+        self.assertEqual(content, "")
+
+    def test_export_is_streamed_in_chunks(self):
+        """
+        Test that rows are rendered batch by batch rather than all at once.
+        """
+        with mock.patch.object(NDJSONRenderer, "batch_size", 3):
+            response, content = self.export()
+            chunks = list(self.client.get("/todos/export/").streaming_content)
+        self.assertEqual(len(content.splitlines()), 7)
+        self.assertEqual(len(chunks), 3)
+
+    def test_export_requires_authentication(self):
+        """
+        Test that anonymous users cannot export todos.
+        """
+        self.client.force_authenticate(user=None)
+        response = self.client.get("/todos/export/")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TodoImportTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="import@test.com",
+            email="import@test.com",
+            password="password123",
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def upload(self, content, name="todos.ndjson", **data):
+        upload = SimpleUploadedFile(name, content.encode())
+        return self.client.post(
+            "/todos/import/", {"file": upload, **data}, format="multipart"
+        )
+
+    def test_ndjson_import_reports_invalid_rows(self):
+        """
+        Test that valid NDJSON rows are created for the user and invalid ones
+        are skipped and reported by line number.
+        """
+        content = "\n".join(
+            [
+                json.dumps({"title": "One", "description": "first"}),
+                "",
+                "not json",
+                json.dumps({"title": "", "description": "blank title"}),
+                json.dumps({"title": "Two", "description": "second", "completed": True}),
+            ]
+        )
+        response = self.upload(content)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["created"], 2)
+        self.assertEqual(response.data["failed"], 2)
+        self.assertEqual([e["line"] for e in response.data["errors"]], [3, 4])
+        self.assertIn("title", response.data["errors"][1]["errors"])
+        self.assertEqual(
+            list(
+                Todo.objects.filter(owner=self.user)
+                .order_by("id")
+                .values_list("title", "completed")
+            ),
+            [("One", False), ("Two", True)],
+        )
+
+    def test_invalid_utf8_lines_are_reported(self):
+        """
+        Test that rows that are not valid UTF-8 are reported as row errors
+        while the rest of the file is imported, in both formats.
+        """
+        ndjson = b"\n".join(
+            [
+                json.dumps({"title": "One", "description": "ok"}).encode(),
+                b'{"title": "Bad \xff", "description": "x"}',
+                json.dumps({"title": "Two", "description": "ok"}).encode(),
+            ]
+        )
+        csv_file = b"title,description,completed\r\nThree,ok,false\r\nBad \xc3,x,false\r\n"
+        for name, content, lines in [
+            ("todos.ndjson", ndjson, [2]),
+            ("todos.csv", csv_file, [3]),
+        ]:
+            response = self.client.post(
+                "/todos/import/",
+                {"file": SimpleUploadedFile(name, content)},
+                format="multipart",
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data["failed"], 1)
+            self.assertEqual([e["line"] for e in response.data["errors"]], lines)
+            self.assertEqual(
+                response.data["errors"][0]["errors"],
+                {"non_field_errors": ["Invalid UTF-8."]},
+            )
+        self.assertEqual(
+            sorted(Todo.objects.filter(owner=self.user).values_list("title", flat=True)),
+            ["One", "Three", "Two"],
+        )
+
+    def test_csv_export_round_trips_through_import(self):
+        """
+        Test that a CSV export can be imported back as-is.
+        """
+        for i in range(3):
+            Todo.objects.create(owner=self.user, title=f"Row {i}", description="a, b")
+        export = self.client.get("/todos/export/", {"format": "csv"})
+        content = b"".join(export.streaming_content).decode()
+
+        response = self.upload(content, name="todos.csv")
+        self.assertEqual(response.data["created"], 3)
+        self.assertEqual(response.data["errors"], [])
+        self.assertEqual(
+            Todo.objects.filter(owner=self.user, description="a, b").count(), 6
+        )
+
+    def test_imported_todos_show_up_in_the_changes_feed(self):
+        """
+        Test that imports notify subscribers like any other write path.
+        """
+        token = self.client.get("/todos/changes/").data["token"]
+        self.upload(json.dumps({"title": "Synced", "description": "d"}))
+
+        response = self.client.get("/todos/changes/", {"since": token})
+        self.assertEqual([t["title"] for t in response.data["changed"]], ["Synced"])
+
+    def test_import_rejects_missing_file_and_unknown_format(self):
+        """
+        Test that requests without a file or with an unknown format are
+        rejected.
+        """
+        response = self.client.post("/todos/import/", {}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.upload("{}", format="xml")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Todo.objects.exists())
+
+    def test_import_todos_command(self):
+        """
+        Test that `manage.py import_todos` imports a file in batches.
+        """
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as file:
+            file.write("title,description,completed\n")
+            for i in range(5):
+                file.write(f"Task {i},from the command,{i % 2 == 0}\n")
+        self.addCleanup(os.unlink, file.name)
+
+        out = io.StringIO()
+        call_command(
+            "import_todos", file.name, owner="IMPORT@test.com", batch_size=2, stdout=out
+        )
+        self.assertIn("Imported 5 todos", out.getvalue())
+        self.assertEqual(Todo.objects.filter(owner=self.user, completed=True).count(), 3)
+
+
+class TodoStatelessAuthTests(APITestCase):
+    def setUp(self):
+        # Revocations outlive the test transaction; user ids do not.
+        caches["default"].clear()
+        self.user = User.objects.create_user(
+            username="jwt@test.com",
+            email="jwt@test.com",
+            password="password123",
+        )
+        self.todo = Todo.objects.create(owner=self.user, title="Mine", description="d")
+
+    def login(self):
+        response = self.client.post(
+            "/login/", {"email": "jwt@test.com", "password": "password123"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        return response.data
+
+    def save_user_a_second_ago(self):
+        # Tokens only record the second they were issued in; move the
+        # revocation back so tokens issued right after it are accepted.
+        with mock.patch("todo.authentication.time.time", return_value=time.time() - 1):
+            self.user.save()
+
+    def test_todo_requests_do_not_load_the_user(self):
+        """
+        Test that list, detail, create and toggle requests authorize from the
+        token alone, without querying auth_user.
+        """
+        self.login()
+        with CaptureQueriesContext(connection) as queries:
+            responses = [
+                self.client.get("/todos/"),
+                self.client.get(f"/todos/{self.todo.id}/"),
+                self.client.put(f"/todos/{self.todo.id}/complete/"),
+                self.client.post("/todos/", {"title": "New", "description": "d"}),
+            ]
+        self.assertEqual(
+            [r.status_code for r in responses], [200, 200, 200, 201]
+        )
+        self.assertFalse(
+            [q for q in queries.captured_queries if '"auth_user"' in q["sql"]]
+        )
+        self.assertEqual(Todo.objects.filter(owner=self.user).count(), 2)
+
+    def test_deactivated_or_deleted_users_are_rejected(self):
+        """
+        Test that deactivating or deleting a user revokes their access tokens.
+        """
+        self.login()
+        self.user.is_active = False
+        self.user.save(update_fields=["is_active"])
+        response = self.client.get("/todos/")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.user.is_active = True
+        self.save_user_a_second_ago()
+        self.login()
+        self.assertEqual(self.client.get("/todos/").status_code, status.HTTP_200_OK)
+        self.user.delete()
+        response = self.client.get("/todos/")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_logins_do_not_revoke_tokens(self):
+        """
+        Test that saves which do not touch claims, like the last_login update
+        of a new login, keep existing tokens valid.
+        """
+        self.login()
+        update_last_login(None, self.user)
+        self.assertEqual(self.client.get("/todos/").status_code, status.HTTP_200_OK)
+
+    def test_permission_changes_reach_new_tokens(self):
+        """
+        Test that staff-only views follow the is_staff claim, and that a
+        promotion revokes the old token while a refreshed one picks it up.
+        """
+        tokens = self.login()
+        self.assertEqual(
+            self.client.get("/cache/stats/").status_code, status.HTTP_403_FORBIDDEN
+        )
+
+        self.user.is_staff = True
+        self.save_user_a_second_ago()
+        response = self.client.post("/refresh/", {"refresh": tokens["refresh"]})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        self.assertEqual(self.client.get("/cache/stats/").status_code, status.HTTP_200_OK)
+
+    def test_refresh_rotates_tokens_when_configured(self):
+        """
+        Test that both refresh views return a new refresh token, carrying the
+        re-read claims, when ROTATE_REFRESH_TOKENS is set.
+        """
+        tokens = self.login()
+        for url in ["/refresh/", "/async/refresh/"]:
+            response = self.client.post(url, {"refresh": tokens["refresh"]})
+            self.assertNotIn("refresh", response.data)
+
+        # Not override_settings: modules keep the api_settings they imported.
+        with mock.patch.object(jwt_settings, "ROTATE_REFRESH_TOKENS", True):
+            self.user.is_staff = True
+            self.save_user_a_second_ago()
+            for url in ["/refresh/", "/async/refresh/"]:
+                response = self.client.post(url, {"refresh": tokens["refresh"]})
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                refresh = TodoRefreshToken(response.data["refresh"])
+                old = TodoRefreshToken(tokens["refresh"])
+                self.assertNotEqual(refresh["jti"], old["jti"])
+                self.assertTrue(refresh["is_staff"])
+
+    def test_token_users_have_integer_ids(self):
+        """
+        Test that token users' ids match the owners' in the database: live
+        stats count their todos and change tokens issued under session auth
+        keep working with a token.
+        """
+        self.client.force_authenticate(user=self.user)
+        since = self.client.get("/todos/changes/").data["token"]
+        self.client.force_authenticate(user=None)
+        self.login()
+
+        with (
+            mock.patch("todo.stats.stats_backend", return_value=None),
+            override_settings(TODO_QUERY_BUDGETS={}),
+        ):
+            response = self.client.get("/todos/stats/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data["total"], response.data["pending"]), (1, 1))
+
+        response = self.client.get("/todos/changes/", {"since": since})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get("/todos/changes/", {"since": response.data["token"]})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_tokens_without_claims_fall_back_to_the_database(self):
+        """
+        Test that tokens issued before the claims were added keep working.
+        """
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.assertEqual(self.client.get("/todos/").status_code, status.HTTP_200_OK)
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(
+            self.client.get("/todos/").status_code, status.HTTP_401_UNAUTHORIZED
+        )
+
+
+class TodoPasswordHashingTests(APITestCase):
+    def setUp(self):
+        caches["default"].clear()
+        self.user = User.objects.create_user(
+            username="hash@test.com",
+            email="hash@test.com",
+            password="password123",
+        )
+
+    def login(self, password="password123"):
+        return self.client.post(
+            "/login/", {"email": "hash@test.com", "password": password}
+        )
+
+    def test_login_verifies_the_password_once(self):
+        """
+        Test that a login attempt runs a single password hash verification,
+        whether it succeeds or not.
+        """
+        verify = MD5PasswordHasher.verify
+        for password, expected in [
+            ("password123", status.HTTP_200_OK),
+            ("wrong", status.HTTP_401_UNAUTHORIZED),
+        ]:
+            with mock.patch.object(
+                MD5PasswordHasher, "verify", autospec=True, side_effect=verify
+            ) as verify_mock:
+                response = self.login(password)
+            self.assertEqual(response.status_code, expected)
+            self.assertEqual(verify_mock.call_count, 1)
+
+    @override_settings(
+        PASSWORD_HASHERS=["todo.hashers.TunablePBKDF2PasswordHasher"],
+        TODO_PBKDF2_ITERATIONS=1000,
+    )
+    def test_hashes_are_upgraded_to_the_configured_cost(self):
+        """
+        Test that the hasher cost is configurable and that older hashes are
+        upgraded on the next successful login.
+        """
+        User.objects.filter(pk=self.user.pk).update(password=make_password("password123"))
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith("pbkdf2_sha256$1000$"))
+
+        with self.settings(TODO_PBKDF2_ITERATIONS=2000):
+            response = self.login()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith("pbkdf2_sha256$2000$"))
+
+        # Re-hashing the same password does not revoke the new token.
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        self.assertEqual(self.client.get("/todos/").status_code, status.HTTP_200_OK)
+
+
+class TodoEmailLookupTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="Mixed.Case@Test.com",
+            email="Mixed.Case@Test.com",
+            password="password123",
+        )
+
+    def register(self, email):
+        return self.client.post(
+            "/register/", {"name": "Dup", "email": email, "password": "password123"}
+        )
+
+    def test_registration_rejects_emails_differing_only_in_case(self):
+        """
+        Test that the duplicate check ignores case, also when two registrations
+        race past it.
+        """
+        response = self.register("mixed.case@test.COM")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("email", response.data)
+
+        with mock.patch("todo.serializers.email_taken", return_value=False):
+            response = self.register("MIXED.case@test.com")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(User.objects.count(), 1)
+
+    def test_login_ignores_case_with_one_query(self):
+        """
+        Test that email logins are case-insensitive and look the user up with a
+        single query.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            user = authenticate(email="mixed.case@test.com", password="password123")
+        self.assertEqual(user, self.user)
+        self.assertEqual(len(queries.captured_queries), 1)
+
+        response = self.client.post(
+            "/login/", {"email": "MIXED.CASE@test.com", "password": "password123"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_key_follows_email_changes(self):
+        """
+        Test that changing or clearing a user's email updates the lookup key.
+        """
+        self.user.email = "New@Test.com"
+        self.user.save()
+        self.assertIsNone(authenticate(email="mixed.case@test.com", password="password123"))
+        self.assertEqual(
+            authenticate(email="new@test.com", password="password123"), self.user
+        )
+
+        self.user.email = ""
+        self.user.save()
+        self.assertFalse(UserEmail.objects.exists())
+
+    def test_conflicting_emails_do_not_fail_saves(self):
+        """
+        Test that a user whose email another user has in a different case is
+        saved without a lookup key instead of failing, while registration
+        still refuses the email.
+        """
+        with self.assertLogs("todo.receivers", "WARNING"):
+            admin = User.objects.create_superuser("admin", "MIXED.case@test.com", "pw")
+        self.assertFalse(UserEmail.objects.filter(user=admin).exists())
+        admin.set_password("password456")
+        with self.assertLogs("todo.receivers", "WARNING"):
+            admin.save()
+        self.assertEqual(
+            authenticate(email="mixed.case@test.com", password="password123"), self.user
+        )
+
+        with mock.patch("todo.serializers.email_taken", return_value=False):
+            response = self.client.post(
+                "/register/",
+                {"name": "Late", "email": "Mixed.Case@test.com", "password": "password123"},
+            )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(User.objects.filter(username="Mixed.Case@test.com").exists())
+
+    def test_usernames_still_authenticate(self):
+        """
+        Test that identifiers without an "@" are looked up as usernames.
+        """
+        admin = User.objects.create_superuser("admin", "", "password123")
+        self.assertEqual(authenticate(username="admin", password="password123"), admin)
+
+
+def hammer_store(store_class, path, attempts, results):
+    store = store_class(path=path)
+    results.put(
+        sum(store.acquire("shared", 50, 1000, time.time())[0] for _ in range(attempts))
+    )
+
+
+class TodoThrottlingTests(APITestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.stores = [
+            MemoryStore(),
+            SQLiteStore(path=os.path.join(directory.name, "throttle.sqlite3")),
+            SharedMemoryStore(path=os.path.join(directory.name, "throttle.shm"), slots=64),
+        ]
+        self.directory = directory.name
+        get_store().clear()
+
+    def test_gcra_allows_a_burst_then_spaces_requests(self):
+        """
+        Test that every store allows a full burst, then one request per
+        emission interval, reporting how long to wait in between.
+        """
+        for store in self.stores:
+            with self.subTest(store=type(store).__name__):
+                now = 1000.0
+                results = [store.acquire("k", 3, 60, now) for _ in range(4)]
+                self.assertEqual([allowed for allowed, _ in results], [True] * 3 + [False])
+                self.assertAlmostEqual(results[-1][1], 20.0)
+
+                self.assertFalse(store.acquire("k", 3, 60, now + 19)[0])
+                self.assertTrue(store.acquire("k", 3, 60, now + 20)[0])
+                self.assertTrue(store.acquire("other", 3, 60, now + 20)[0])
+
+    def test_shared_stores_hold_limits_across_processes(self):
+        """
+        Test that concurrent worker processes sharing a SQLite or shared memory
+        store never let more requests through than the limit.
+        """
+        context = multiprocessing.get_context("fork")
+        for store_class, name in [(SQLiteStore, "race.sqlite3"), (SharedMemoryStore, "race.shm")]:
+            with self.subTest(store=store_class.__name__):
+                path = os.path.join(self.directory, name)
+                results = context.Queue()
+                workers = [
+                    context.Process(
+                        target=hammer_store, args=(store_class, path, 30, results)
+                    )
+                    for _ in range(4)
+                ]
+                for worker in workers:
+                    worker.start()
+                allowed = sum(results.get(timeout=30) for _ in workers)
+                for worker in workers:
+                    worker.join()
+                self.assertEqual(allowed, 50)
+
+    def test_api_requests_are_throttled(self):
+        """
+        Test that the default throttles reject requests over the rate with a
+        Retry-After header.
+        """
+        user = User.objects.create_user(
+            username="throttle@test.com", email="throttle@test.com", password="password123"
+        )
+        self.client.force_authenticate(user=user)
+        with mock.patch.object(GCRAUserRateThrottle, "rate", "3/min", create=True):
+            statuses = [self.client.get("/todos/").status_code for _ in range(4)]
+            response = self.client.get("/todos/")
+        self.assertEqual(statuses, [200, 200, 200, 429])
+        self.assertEqual(response["Retry-After"], "20")
+
+
+class TodoStatsTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="stats@test.com", email="stats@test.com", password="password123"
+        )
+        self.other = User.objects.create_user(
+            username="other@test.com", email="other@test.com", password="password123"
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def stored_counts(self, user=None):
+        stats = TodoStats.objects.filter(owner=user or self.user).first()
+        return (stats.total, stats.completed) if stats else (0, 0)
+
+    def live_counts(self, user=None):
+        todos = Todo.objects.filter(owner=user or self.user)
+        return todos.count(), todos.filter(completed=True).count()
+
+    def test_counters_follow_every_write_path(self):
+        """
+        Test that the summary counters stay equal to the live counts through
+        the API, bulk, import, queryset and model write paths.
+        """
+        response = self.client.post("/todos/", {"title": "One", "description": "a"})
+        todo_id = response.data["id"]
+        self.client.put(
+            f"/todos/{todo_id}/", {"title": "One", "description": "a", "completed": True}
+        )
+        self.assertEqual(self.stored_counts(), (1, 1))
+
+        self.client.put(f"/todos/{todo_id}/complete/")
+        self.client.patch(f"/todos/{todo_id}/complete/", {"completed": True})
+        self.assertEqual(self.stored_counts(), (1, 1))
+
+        response = self.client.post(
+            "/todos/bulk/",
+            {
+                "create": [
+                    {"title": "Two", "description": "b"},
+                    {"title": "Three", "description": "c", "completed": True},
+                ],
+                "toggle": [todo_id],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.stored_counts(), self.live_counts())
+
+        content = "\n".join(
+            json.dumps({"title": f"Imported {i}", "description": "x", "completed": i % 2 == 0})
+            for i in range(5)
+        )
+        upload = SimpleUploadedFile("todos.ndjson", content.encode())
+        response = self.client.post("/todos/import/", {"file": upload}, format="multipart")
+        self.assertEqual(response.data["created"], 5)
+        Todo.objects.filter(owner=self.user, title__startswith="Imported").update(
+            completed=True
+        )
+        Todo.objects.create(owner=self.other, title="Elsewhere", description="")
+        self.assertEqual(self.stored_counts(), self.live_counts())
+        self.assertEqual(self.stored_counts(), (8, 6))
+
+        self.client.delete(f"/todos/{todo_id}/")
+        Todo.objects.filter(owner=self.user, completed=False).delete()
+        self.assertEqual(self.stored_counts(), self.live_counts())
+        self.assertEqual(self.stored_counts(self.other), (1, 0))
+
+        created = TodoDailyStats.objects.filter(owner=self.user).values_list(
+            "created", flat=True
+        )
+        self.assertEqual(sum(created), Todo.objects.filter(owner=self.user).count())
+
+    def test_stats_endpoint(self):
+        """
+        Test that the endpoint reports the user's counts and per-day and
+        per-week creation counts without touching the todos table.
+        """
+        today = datetime.datetime.now(datetime.timezone.utc).date()
+        for days_ago, completed in [(0, True), (0, False), (3, False), (20, True)]:
+            todo = Todo.objects.create(
+                owner=self.user, title="T", description="", completed=completed
+            )
+            Todo.objects.filter(pk=todo.pk).update(
+                date_created=todo.date_created - datetime.timedelta(days=days_ago)
+            )
+        Todo.objects.create(owner=self.other, title="Not mine", description="")
+        call_command("rebuild_todo_stats", stdout=io.StringIO())
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/todos/stats/", {"days": 7, "weeks": 4})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(
+            [q["sql"] for q in queries.captured_queries if '"todo_todo"' in q["sql"]]
+        )
+
+        self.assertEqual(
+            (response.data["total"], response.data["completed"], response.data["pending"]),
+            (4, 2, 2),
+        )
+        per_day = response.data["created_per_day"]
+        self.assertEqual(len(per_day), 7)
+        self.assertEqual(per_day[-1], {"day": today, "created": 2})
+        self.assertEqual(per_day[-4], {"day": today - datetime.timedelta(days=3), "created": 1})
+        self.assertEqual(sum(day["created"] for day in per_day), 3)
+
+        per_week = response.data["created_per_week"]
+        self.assertEqual(len(per_week), 4)
+        self.assertEqual(per_week[-1]["week"].weekday(), 0)
+        self.assertEqual(sum(week["created"] for week in per_week), 4)
+
+    def test_rebuild_command_repairs_drift(self):
+        """
+        Test that rebuild_todo_stats recomputes counters that have drifted,
+        for everyone or only the given owners.
+        """
+        Todo.objects.create(owner=self.user, title="A", description="", completed=True)
+        Todo.objects.create(owner=self.other, title="B", description="")
+        TodoStats.objects.update(total=100, completed=50)
+        TodoDailyStats.objects.all().delete()
+
+        call_command("rebuild_todo_stats", owner=["stats@test.com"], stdout=io.StringIO())
+        self.assertEqual(self.stored_counts(), (1, 1))
+        self.assertEqual(self.stored_counts(self.other), (100, 50))
+        self.assertEqual(TodoDailyStats.objects.filter(owner=self.user).count(), 1)
+
+        call_command("rebuild_todo_stats", stdout=io.StringIO())
+        self.assertEqual(self.stored_counts(self.other), (1, 0))
+
+
+class TodoAsyncViewTests(APITestCase):
+    def setUp(self):
+        caches["default"].clear()
+        get_store().clear()
+        self.user = User.objects.create_user(
+            username="async@test.com", email="async@test.com", password="password123"
+        )
+        self.other = User.objects.create_user(
+            username="other@test.com", email="other@test.com", password="password123"
+        )
+        self.todo = Todo.objects.create(owner=self.user, title="Mine", description="d")
+        self.others_todo = Todo.objects.create(
+            owner=self.other, title="Theirs", description="d"
+        )
+
+    def login(self):
+        response = self.client.post(
+            "/async/login/", {"email": "async@test.com", "password": "password123"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        return response.data
+
+    def test_views_are_async(self):
+        """
+        Test that the /async/ endpoints resolve to coroutine views, so ASGI
+        runs them on the event loop.
+        """
+        for path in ["/async/todos/", f"/async/todos/{self.todo.id}/", "/async/login/"]:
+            with self.subTest(path=path):
+                self.assertTrue(iscoroutinefunction(resolve(path).func))
+        self.assertFalse(iscoroutinefunction(resolve("/todos/").func))
+
+    def test_todo_endpoints_match_the_sync_views(self):
+        """
+        Test that list, create, detail, update, toggle and delete answer the
+        same as the sync endpoints, and only for the owner's todos.
+        """
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post("/async/todos/", {"title": "New", "description": "n"})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        new_id = response.data["id"]
+        self.assertEqual(Todo.objects.get(id=new_id).owner, self.user)
+
+        for query in ["", "?ordering=title", "?completed=false&page=1", "?pagination=cursor"]:
+            with self.subTest(query=query):
+                sync = self.client.get(f"/todos/{query}")
+                asynchronous = self.client.get(f"/async/todos/{query}")
+                self.assertEqual(asynchronous.status_code, status.HTTP_200_OK)
+                self.assertEqual(
+                    json.loads(asynchronous.content.replace(b"/async", b"")),
+                    json.loads(sync.content),
+                )
+
+        response = self.client.get(f"/async/todos/{self.todo.id}/")
+        self.assertEqual(response.data, self.client.get(f"/todos/{self.todo.id}/").data)
+        self.assertEqual(
+            self.client.get(
+                f"/async/todos/{self.todo.id}/", HTTP_IF_NONE_MATCH=response["ETag"]
+            ).status_code,
+            status.HTTP_304_NOT_MODIFIED,
+        )
+
+        response = self.client.put(
+            f"/async/todos/{self.todo.id}/", {"title": "Renamed", "description": "d"}
+        )
+        self.assertEqual(response.data["title"], "Renamed")
+        self.todo.refresh_from_db()
+        self.assertEqual((self.todo.title, self.todo.version), ("Renamed", 2))
+
+        response = self.client.put(f"/async/todos/{self.todo.id}/complete/")
+        self.assertTrue(response.data["completed"])
+        response = self.client.patch(
+            f"/async/todos/{self.todo.id}/complete/",
+            {"completed": False},
+            HTTP_IF_MATCH=f'"{self.todo.id}.1"',
+        )
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+
+        for method in ["get", "put", "delete"]:
+            response = getattr(self.client, method)(f"/async/todos/{self.others_todo.id}/")
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.delete(f"/async/todos/{new_id}/")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Todo.objects.filter(id=new_id).exists())
+
+    def test_auth_endpoints(self):
+        """
+        Test registering, logging in and refreshing through the async views,
+        and that tokens are authorized and revoked as on the sync stack.
+        """
+        response = self.client.post(
+            "/async/register/",
+            {"name": "New", "email": "New@Test.com", "password": "password123"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.post(
+            "/async/register/",
+            {"name": "Again", "email": "new@test.com", "password": "password123"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post(
+            "/async/login/", {"email": "async@test.com", "password": "wrong"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        tokens = self.login()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/async/todos/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 1)
+        self.assertFalse(
+            [q for q in queries.captured_queries if '"auth_user"' in q["sql"]]
+        )
+
+        response = self.client.post("/async/refresh/", {"refresh": tokens["refresh"]})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("access", response.data)
+        response = self.client.post("/async/refresh/", {"refresh": "garbage"})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.user.is_active = False
+        self.user.save(update_fields=["is_active"])
+        response = self.client.get("/async/todos/")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_requests_are_throttled(self):
+        """
+        Test that the async views apply the GCRA throttles.
+        """
+        self.client.force_authenticate(user=self.user)
+        with mock.patch.object(GCRAUserRateThrottle, "rate", "3/min", create=True):
+            statuses = [self.client.get("/async/todos/").status_code for _ in range(4)]
+            response = self.client.get("/async/todos/")
+        self.assertEqual(statuses, [200, 200, 200, 429])
+        self.assertEqual(response["Retry-After"], "20")
+
+
+class TodoSQLiteTuningTests(APITestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "tuned.sqlite3")
+
+    def open_database(self, alias="tuned"):
+        """
+        A connection to a file database using the "tuned" profile (the test
+        database itself lives in memory, where WAL does not apply).
+        """
+        default = connections["default"]
+        settings_dict = {
+            **default.settings_dict,
+            **settings.SQLITE_PROFILES["tuned"],
+            "NAME": self.path,
+        }
+        return default.__class__(settings_dict, alias=alias)
+
+    def test_tuned_profile_pragmas(self):
+        """
+        Test that new connections come up in WAL mode with the configured
+        pragmas, deferred transactions and persistent, health-checked reuse.
+        """
+        wrapper = self.open_database()
+        self.addCleanup(wrapper.close)
+        with wrapper.cursor() as cursor:
+            pragmas = {
+                name: cursor.execute(f"PRAGMA {name}").fetchone()[0]
+                for name in ["journal_mode", "synchronous", "busy_timeout", "temp_store"]
+            }
+        self.assertEqual(
+            pragmas,
+            {
+                "journal_mode": "wal",
+                "synchronous": 1,
+                "busy_timeout": settings.TODO_SQLITE_BUSY_TIMEOUT,
+                "temp_store": 2,
+            },
+        )
+        self.assertIsNone(wrapper.transaction_mode)
+        self.assertGreater(wrapper.settings_dict["CONN_MAX_AGE"], 0)
+        self.assertTrue(wrapper.settings_dict["CONN_HEALTH_CHECKS"])
+
+    def test_concurrent_read_modify_write_transactions_queue(self):
+        """
+        Test that write transactions reading before they write wait for each
+        other instead of failing with "database is locked" or losing updates.
+        """
+        wrapper = self.open_database()
+        self.addCleanup(wrapper.close)
+        with wrapper.cursor() as cursor:
+            cursor.execute("CREATE TABLE counter (n INTEGER NOT NULL)")
+            cursor.execute("INSERT INTO counter VALUES (0)")
+
+        errors = []
+
+        def increment():
+            connections["tuned"] = self.open_database()
+            try:
+                with write_atomic(using="tuned"):
+                    with connections["tuned"].cursor() as cursor:
+                        n = cursor.execute("SELECT n FROM counter").fetchone()[0]
+                        time.sleep(0.05)
+                        cursor.execute("UPDATE counter SET n = %s", [n + 1])
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connections["tuned"].close()
+
+        workers = [threading.Thread(target=increment) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(errors, [])
+        with wrapper.cursor() as cursor:
+            self.assertEqual(cursor.execute("SELECT n FROM counter").fetchone()[0], 4)
+
+    def test_read_transactions_do_not_wait_for_the_writer(self):
+        """
+        Test that a read-only transaction runs while a write transaction holds
+        the write lock, seeing the last committed data.
+        """
+        wrapper = self.open_database()
+        self.addCleanup(wrapper.close)
+        with wrapper.cursor() as cursor:
+            cursor.execute("CREATE TABLE counter (n INTEGER NOT NULL)")
+            cursor.execute("INSERT INTO counter VALUES (0)")
+
+        connections["tuned"] = self.open_database()
+        connections["tuned_reader"] = self.open_database("tuned_reader")
+        self.addCleanup(connections["tuned"].close)
+        self.addCleanup(connections["tuned_reader"].close)
+        with write_atomic(using="tuned"):
+            with connections["tuned"].cursor() as cursor:
+                cursor.execute("UPDATE counter SET n = 1")
+            began = time.monotonic()
+            with transaction.atomic(using="tuned_reader"):
+                with connections["tuned_reader"].cursor() as cursor:
+                    n = cursor.execute("SELECT n FROM counter").fetchone()[0]
+            self.assertEqual(n, 0)
+            self.assertLess(time.monotonic() - began, 1)
+
+
+@override_settings(TODO_DATABASE_REPLICAS=["replica"])
+class TodoReplicaRoutingTests(APITransactionTestCase):
+    # Not APITestCase: its per-test transaction would keep every read on the
+    # primary, and the replica is a snapshot of committed data.
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        default = connections["default"]
+        options = {**default.settings_dict["OPTIONS"], "init_command": "PRAGMA query_only=ON"}
+        options.pop("transaction_mode", None)
+        connections.settings["replica"] = {
+            **default.settings_dict,
+            "NAME": os.path.join(directory.name, "replica.sqlite3"),
+            "OPTIONS": options,
+        }
+        self.addCleanup(connections.settings.pop, "replica")
+        # Added after the class was set up, so allow it by hand.
+        self.enterContext(
+            mock.patch.object(type(self), "databases", {"default", "replica"})
+        )
+        self.addCleanup(connections.__delitem__, "replica")
+        self.addCleanup(lambda: connections["replica"].close())
+        self.addCleanup(pin_cache().clear)
+        caches["todo_responses"].clear()
+
+        self.user = User.objects.create_user(
+            username="replica@test.com", email="replica@test.com", password="password123"
+        )
+        Todo.objects.create(owner=self.user, title="Synced")
+        call_command("sync_sqlite_replicas", "replica", stdout=io.StringIO())
+        # Written outside any request, so nobody is pinned to the primary yet.
+        Todo.objects.create(owner=self.user, title="Not synced")
+        pin_cache().delete(pin_key(self.user.pk))
+        self.client.force_authenticate(user=self.user)
+
+    def titles(self):
+        response = self.client.get(reverse("todo-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return sorted(todo["title"] for todo in response.data["results"])
+
+    def test_reads_go_to_the_replica_until_it_syncs(self):
+        """
+        Test that list reads are served from the replica, and so lag behind
+        the primary until the replica is synced.
+        """
+        self.assertEqual(self.titles(), ["Synced"])
+        self.assertEqual(Todo.objects.count(), 2)
+
+        call_command("sync_sqlite_replicas", stdout=io.StringIO())
+        self.assertEqual(self.titles(), ["Not synced", "Synced"])
+
+    def test_writers_read_their_writes_from_the_primary(self):
+        """
+        Test that a user who just wrote reads from the primary until the pin
+        expires, while writes never reach the (read-only) replica.
+        """
+        response = self.client.post(
+            reverse("todo-list"), {"title": "Fresh", "description": "d"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.titles(), ["Fresh", "Not synced", "Synced"])
+        self.assertEqual(Todo.objects.using("replica").count(), 1)
+
+        pin_cache().delete(pin_key(self.user.pk))
+        self.assertEqual(self.titles(), ["Synced"])
+
+    def test_toggles_and_deletes_write_to_the_primary(self):
+        """
+        Test that completion toggles and deletes by a user who is not pinned
+        to the primary still write there, not to the read-only replica.
+        """
+        todo = Todo.objects.get(title="Synced")
+        response = self.client.put(f"/todos/{todo.id}/complete/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data["completed"])
+        self.assertTrue(Todo.objects.get(pk=todo.pk).completed)
+
+        pin_cache().delete(pin_key(self.user.pk))
+        response = self.client.delete(f"/todos/{todo.id}/")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Todo.objects.filter(pk=todo.pk).exists())
+
+    def test_router_keeps_transactions_scripts_and_logins_on_the_primary(self):
+        """
+        Test that reads outside requests, inside transactions and of the email
+        index use the primary, and that writes always do.
+        """
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(Todo), "default")
+        with routing_context(mock.Mock(user=User(pk=0))):
+            self.assertEqual(router.db_for_read(Todo), "replica")
+            self.assertIsNone(router.db_for_read(UserEmail))
+            self.assertIsNone(router.db_for_read(User))
+            with transaction.atomic():
+                self.assertEqual(router.db_for_read(Todo), "default")
+            self.assertEqual(router.db_for_write(Todo), "default")
+            # The request wrote, so the rest of it reads from the primary.
+            self.assertEqual(router.db_for_read(Todo), "default")
+        self.assertFalse(router.allow_migrate("replica", "todo"))
+
+
+class TodoSoftDeleteTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="soft@test.com", email="soft@test.com", password="password123"
+        )
+        self.other = User.objects.create_user(
+            username="other@test.com", email="other@test.com", password="password123"
+        )
+        self.keep = Todo.objects.create(owner=self.user, title="Keep", description="k")
+        self.todo = Todo.objects.create(
+            owner=self.user, title="Drop", description="d", completed=True
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def titles(self):
+        response = self.client.get("/todos/")
+        return sorted(todo["title"] for todo in response.data["results"])
+
+    def test_deleted_todos_disappear_until_restored(self):
+        """
+        Test that a deleted todo is hidden from every read and write path and
+        from the stats, reported by the change feed, and can be restored.
+        """
+        token = self.client.get("/todos/changes/").data["token"]
+        response = self.client.delete(f"/todos/{self.todo.id}/")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        self.assertEqual(self.titles(), ["Keep"])
+        for response in [
+            self.client.get(f"/todos/{self.todo.id}/"),
+            self.client.put(f"/todos/{self.todo.id}/complete/"),
+            self.client.delete(f"/todos/{self.todo.id}/"),
+        ]:
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertIsNotNone(Todo.all_objects.get(id=self.todo.id).deleted_at)
+        self.assertEqual(TodoStats.objects.get(owner=self.user).total, 1)
+        changes = self.client.get(f"/todos/changes/?since={token}").data
+        self.assertEqual(changes["deleted"], [self.todo.id])
+
+        self.client.force_authenticate(user=self.other)
+        response = self.client.post(f"/todos/{self.todo.id}/restore/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(f"/todos/{self.todo.id}/restore/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["title"], "Drop")
+        self.assertEqual(self.titles(), ["Drop", "Keep"])
+        stats = TodoStats.objects.get(owner=self.user)
+        self.assertEqual((stats.total, stats.completed), (2, 1))
+        response = self.client.post(f"/todos/{self.todo.id}/restore/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(TODO_DELETE_UNDO_SECONDS=60)
+    def test_purge_removes_todos_past_the_undo_window(self):
+        """
+        Test that todos deleted longer ago than the undo window can no longer
+        be restored and are hard-deleted by purge_todos, in batches.
+        """
+        recent = Todo.objects.create(owner=self.user, title="Recent", description="r")
+        self.client.post(
+            "/todos/bulk/", {"delete": [self.todo.id, recent.id]}, format="json"
+        )
+        old = timezone.now() - datetime.timedelta(minutes=2)
+        Todo.all_objects.filter(id=self.todo.id).update(deleted_at=old)
+
+        response = self.client.post(f"/todos/{self.todo.id}/restore/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        out = io.StringIO()
+        call_command("purge_todos", "--batch-size", "1", stdout=out)
+        self.assertIn("Purged 1 deleted todos", out.getvalue())
+        self.assertCountEqual(
+            Todo.all_objects.values_list("id", flat=True), [self.keep.id, recent.id]
+        )
+        self.assertEqual(TodoStats.objects.get(owner=self.user).total, 1)
+        response = self.client.post(f"/todos/{recent.id}/restore/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_user_deletion_leaves_todos_for_the_purge(self):
+        """
+        Test that deleting a user does not touch their todos, and that
+        purge_todos then removes them and their change log in batches.
+        """
+        Todo.objects.bulk_create(
+            Todo(owner=self.user, title=f"Todo {i}", description="x") for i in range(5)
+        )
+        mine = Todo.objects.create(owner=self.other, title="Mine", description="m")
+
+        with CaptureQueriesContext(connection) as queries:
+            self.user.delete()
+        self.assertFalse(
+            [q for q in queries.captured_queries if '"todo_todo"' in q["sql"]]
+        )
+        self.assertEqual(Todo.all_objects.exclude(owner=self.other).count(), 7)
+
+        out = io.StringIO()
+        call_command("purge_todos", "--batch-size", "2", stdout=out)
+        self.assertIn("7 todos and 2 change log entries", out.getvalue())
+        self.assertEqual(list(Todo.all_objects.values_list("id", flat=True)), [mine.id])
+        self.assertEqual(
+            list(TodoChange.objects.values_list("todo_id", flat=True)), [mine.id]
+        )
+
+    def test_list_reads_the_partial_index(self):
+        """
+        Test that listing a user's todos is served by the index over live
+        todos only.
+        """
+        plan = Todo.objects.filter(owner_id=self.user.pk).order_by(
+            "-date_created", "-id"
+        ).explain()
+        self.assertIn("todo_owner_created_id_idx", plan)
+
+
+class TodoArchiveTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="archive@test.com", email="archive@test.com", password="password123"
+        )
+        self.active = Todo.objects.create(
+            owner=self.user, title="Active milk", description="a"
+        )
+        self.recent = Todo.objects.create(
+            owner=self.user, title="Recent", description="r", completed=True
+        )
+        self.old = Todo.objects.create(
+            owner=self.user, title="Old milk", description="o", completed=True
+        )
+        self.stale = Todo.objects.create(
+            owner=self.user, title="Stale", description="s"
+        )
+        long_ago = timezone.now() - datetime.timedelta(days=200)
+        Todo.objects.filter(id__in=[self.old.id, self.stale.id]).update(
+            updated_at=long_ago
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def titles(self, query=""):
+        response = self.client.get(f"/todos/?{query}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return sorted(todo["title"] for todo in response.data["results"])
+
+    def test_archive_moves_old_completed_todos(self):
+        """
+        Test that archive_todos moves only the todos completed longer ago than
+        TODO_ARCHIVE_AFTER_DAYS, in batches, reporting them deleted to the
+        change feed and leaving the stats alone.
+        """
+        token = self.client.get("/todos/changes/").data["token"]
+        out = io.StringIO()
+        call_command("archive_todos", "--batch-size", "1", stdout=out)
+        self.assertIn("Archived 1 todos", out.getvalue())
+
+        self.assertFalse(Todo.all_objects.filter(id=self.old.id).exists())
+        archived = ArchivedTodo.objects.get()
+        self.assertEqual(
+            (archived.id, archived.title, archived.owner_id),
+            (self.old.id, "Old milk", self.user.pk),
+        )
+        self.assertEqual(self.titles(), ["Active milk", "Recent", "Stale"])
+        changes = self.client.get(f"/todos/changes/?since={token}").data
+        self.assertEqual(changes["deleted"], [self.old.id])
+        stats = TodoStats.objects.get(owner=self.user)
+        self.assertEqual((stats.total, stats.completed), (4, 2))
+        call_command("rebuild_todo_stats", stdout=io.StringIO())
+        stats = TodoStats.objects.get(owner=self.user)
+        self.assertEqual((stats.total, stats.completed), (4, 2))
+
+    def test_include_archived_lists_both_tables(self):
+        """
+        Test that `?include_archived=true` adds the user's archived todos to
+        the list, with filters, search and cursor pagination still applying.
+        """
+        other = User.objects.create_user(
+            username="other@test.com", email="other@test.com", password="password123"
+        )
+        theirs = Todo.objects.create(
+            owner=other, title="Their milk", description="t", completed=True
+        )
+        Todo.objects.filter(id=theirs.id).update(
+            updated_at=timezone.now() - datetime.timedelta(days=200)
+        )
+        call_command("archive_todos", stdout=io.StringIO())
+
+        self.assertEqual(
+            self.titles("include_archived=true"),
+            ["Active milk", "Old milk", "Recent", "Stale"],
+        )
+        self.assertEqual(
+            self.titles("include_archived=true&completed=true"), ["Old milk", "Recent"]
+        )
+        self.assertEqual(
+            self.titles("include_archived=true&search=milk"), ["Active milk", "Old milk"]
+        )
+        self.assertEqual(self.titles("include_archived=false&search=milk"), ["Active milk"])
+
+        seen = []
+        url = "/todos/?include_archived=1&pagination=cursor&page_size=1"
+        while url:
+            response = self.client.get(url)
+            seen += [todo["id"] for todo in response.data["results"]]
+            url = response.data["next"]
+        self.assertEqual(
+            seen, [self.stale.id, self.old.id, self.recent.id, self.active.id]
+        )
+
+    def test_purge_removes_archived_todos_of_deleted_users(self):
+        """
+        Test that purge_todos also removes the archived todos a deleted user
+        left behind.
+        """
+        call_command("archive_todos", stdout=io.StringIO())
+        self.user.delete()
+        call_command("purge_todos", stdout=io.StringIO())
+        self.assertFalse(ArchivedTodo.objects.exists())
+        self.assertFalse(Todo.all_objects.exists())
+
+
+class TodoMetricsTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="metrics@test.com", email="metrics@test.com", password="password123"
+        )
+        Todo.objects.create(owner=self.user, title="Todo", description="d")
+        self.client.force_authenticate(user=self.user)
+        caches["todo_responses"].clear()
+        metrics.reset()
+
+    def scrape(self, **headers):
+        response = self.client.get("/metrics", **headers)
+        if response.status_code != status.HTTP_200_OK:
+            return response.status_code, []
+        return response.status_code, response.content.decode().splitlines()
+
+    def test_metrics_report_requests_per_route(self):
+        """
+        Test that /metrics reports each route's requests, latency, queries by
+        view phase, time per phase and response cache lookups as Prometheus
+        text.
+        """
+        self.client.get("/todos/")
+        self.client.get("/todos/")
+        self.client.get("/todos/999/")
+
+        response = self.client.get("/metrics")
+        self.assertEqual(response["Content-Type"], "text/plain; version=0.0.4; charset=utf-8")
+        _, lines = self.scrape()
+        route = 'route="todos/"'
+        self.assertIn(
+            f'todo_http_requests_total{{{route},method="GET",status="200"}} 2', lines
+        )
+        self.assertIn(
+            'todo_http_requests_total{route="todos/<int:todo_id>/",method="GET",status="404"} 1',
+            lines,
+        )
+        self.assertIn(
+            f'todo_http_request_duration_seconds_bucket{{{route},method="GET",le="+Inf"}} 2',
+            lines,
+        )
+        self.assertIn(f'todo_http_request_queries_count{{{route}}} 2', lines)
+        # The second request is answered from the response cache.
+        for phase, count in [("auth", 2), ("paginate", 1), ("serialize", 1)]:
+            self.assertIn(
+                f'todo_view_phase_duration_seconds_count{{{route},phase="{phase}"}} {count}',
+                lines,
+            )
+        self.assertIn(
+            f'todo_db_query_duration_seconds_count{{{route},phase="paginate"}} 2', lines
+        )
+        for outcome in ["hit", "miss"]:
+            self.assertIn(
+                f'todo_response_cache_requests_total{{{route},kind="list",outcome="{outcome}"}} 1',
+                lines,
+            )
+
+    @override_settings(TODO_METRICS_TOKEN="s3cret")
+    def test_metrics_token(self):
+        """
+        Test that with TODO_METRICS_TOKEN set, /metrics needs it as a bearer
+        token.
+        """
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.scrape()[0], status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(
+            self.scrape(HTTP_AUTHORIZATION="Bearer wrong")[0],
+            status.HTTP_401_UNAUTHORIZED,
+        )
+        self.assertEqual(
+            self.scrape(HTTP_AUTHORIZATION="Bearer s3cret")[0], status.HTTP_200_OK
+        )
+
+    def test_query_budget(self):
+        """
+        Test that a request making more queries than its route's budget fails
+        under the test runner, and only logs a warning otherwise.
+        """
+        with override_settings(TODO_QUERY_BUDGETS={"todos/": 1}):
+            with self.assertRaisesMessage(QueryBudgetExceeded, "todos/ made"):
+                self.client.get("/todos/")
+
+            with override_settings(TODO_QUERY_BUDGET_STRICT=False):
+                with self.assertLogs("todo.metrics", "WARNING"):
+                    response = self.client.get("/todos/?completed=true")
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+            response = self.client.get("/todos/stats/")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        _, lines = self.scrape()
+        self.assertIn('todo_query_budget_exceeded_total{route="todos/"} 2', lines)
+
+
+class TodoBenchCompareTests(APITestCase):
+    def setUp(self):
+        self.directory = self.enterContext(tempfile.TemporaryDirectory())
+        self.baseline = {
+            "meta": {"users": 20, "todos_per_user": 200},
+            "results": {
+                "client": {
+                    "list": {
+                        "throughput": 100.0,
+                        "p50_ms": 10.0,
+                        "p99_ms": 20.0,
+                        "queries_per_request": 3.0,
+                        "errors": 0,
+                    }
+                }
+            },
+        }
+
+    def bench(self, meta=None, **changes):
+        current = json.loads(json.dumps(self.baseline))
+        current["meta"].update(meta or {})
+        current["results"]["client"]["list"].update(changes)
+        paths = []
+        for name, report in [("baseline", self.baseline), ("current", current)]:
+            path = os.path.join(self.directory, f"{name}.json")
+            with open(path, "w") as f:
+                json.dump(report, f)
+            paths.append(path)
+        err = io.StringIO()
+        call_command("bench", "--input", paths[1], "--compare", paths[0], stderr=err)
+        return err.getvalue()
+
+    def test_compare_flags_regressions(self):
+        """
+        Test that `bench --compare` passes runs within the tolerance and fails
+        on slower ones and on any extra query per request.
+        """
+        self.assertIn("No regressions", self.bench(throughput=90.0, p50_ms=12.0))
+        with self.assertRaisesMessage(CommandError, "1 regressions"):
+            self.bench(p99_ms=30.0)
+        with self.assertRaisesMessage(CommandError, "1 regressions"):
+            self.bench(queries_per_request=4.0)
+
+    def test_compare_warns_about_different_request_counts(self):
+        """
+        Test that `bench --compare` warns when the runs sent a different
+        number of requests per scenario.
+        """
+        self.baseline["meta"].update(requests=300, auth_requests=20)
+        self.assertNotIn("different", self.bench())
+        self.assertIn(
+            "different requests, auth_requests",
+            self.bench(meta={"requests": 100, "auth_requests": 5}),
+        )
+
+
+class TodoSeedTests(APITransactionTestCase):
+    # Not APITestCase: SQLite cannot attach the workers' files inside its
+    # per-test transaction.
+
+    def rows(self):
+        """The todos by id, with owners numbered in the order they were created."""
+        users = User.objects.order_by("pk").values_list("pk", flat=True)
+        owners = {pk: n for n, pk in enumerate(users)}
+        return [
+            (owners[owner_id], *row)
+            for owner_id, *row in Todo.objects.order_by("id").values_list(
+                "owner_id",
+                "title",
+                "description",
+                "completed",
+                "date_created",
+                "updated_at",
+            )
+        ]
+
+    def stats(self):
+        return (
+            sorted(TodoStats.objects.values_list("owner_id", "total", "completed")),
+            sorted(TodoDailyStats.objects.values_list("owner_id", "day", "created")),
+        )
+
+    def test_seed_todos(self):
+        """
+        Test that `seed_todos` creates users who can log in, gives a few of
+        them most of the todos, and leaves the stats and the search index as
+        the per-row triggers would, with the triggers back in place.
+        """
+        out = io.StringIO()
+        call_command(
+            "seed_todos",
+            *("--users", "10", "--todos", "500", "--chunk-size", "120"),
+            *("--workers", "2"),
+            stdout=out,
+        )
+        self.assertIn("Seeded 500 todos for 10 users", out.getvalue())
+        counts = [user.todos.count() for user in User.objects.order_by("pk")]
+        self.assertEqual(counts, todo_counts(10, 500))
+        self.assertGreater(counts[0], 5 * counts[-1])
+        self.assertTrue(Todo.objects.filter(completed=True).exists())
+        self.assertTrue(Todo.objects.filter(completed=False).exists())
+
+        seeded = self.stats()
+        rebuild_stats()
+        self.assertEqual(self.stats(), seeded)
+
+        # As if each todo had been written: in the change log, oldest first,
+        # with every owner's collection version bumped.
+        self.assertEqual(
+            list(TodoChange.objects.order_by("id").values_list("todo_id", "owner_id")),
+            list(Todo.objects.order_by("id").values_list("id", "owner_id")),
+        )
+        self.assertEqual(
+            set(TodoCollectionVersion.objects.values_list("owner_id", flat=True)),
+            set(Todo.objects.values_list("owner_id", flat=True)),
+        )
+
+        response = self.client.post(
+            "/login/", {"email": "seed0-0@example.com", "password": "seed-password"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        owner = User.objects.get(username="seed0-0@example.com")
+        self.client.force_authenticate(user=owner)
+        response = self.client.get(reverse("todo-changes"), {"limit": 1000})
+        self.assertEqual(len(response.data["changed"]), counts[0])
+        milk = Todo.objects.filter(owner=owner, title__contains="milk").count()
+        response = self.client.get(reverse("todo-list"), {"search": "milk"})
+        self.assertGreaterEqual(response.data["count"], milk)
+        self.assertGreater(milk, 0)
+
+        response = self.client.post(
+            reverse("todo-list"), {"title": "Oat milk", "description": "d"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(TodoStats.objects.get(owner=owner).total, counts[0] + 1)
+        response = self.client.get(reverse("todo-list"), {"search": "oat"})
+        self.assertEqual(response.data["count"], 1)
+
+        with self.assertRaisesMessage(CommandError, "exist already"):
+            call_command("seed_todos", "--users", "1", "--todos", "1", stdout=out)
+
+    def test_seed_todos_rejects_invalid_sizes(self):
+        """
+        Test that sizes that would hang or seed nothing are refused before
+        any user is created.
+        """
+        for option, value, message in [
+            ("--chunk-size", "0", "--chunk-size must be at least 1."),
+            ("--batch-size", "0", "--batch-size must be at least 1."),
+            ("--workers", "0", "--workers must be at least 1."),
+            ("--days", "-1", "--days must be at least 1."),
+            ("--todos", "-1", "--todos must not be negative."),
+        ]:
+            with self.subTest(option), self.assertRaisesMessage(CommandError, message):
+                call_command(
+                    "seed_todos", "--users", "1", option, value, stdout=io.StringIO()
+                )
+        self.assertFalse(User.objects.exists())
+
+    def test_seed_todos_is_deterministic(self):
+        """
+        Test that the same seed gives the same todos, however many workers
+        generate them.
+        """
+        now = timezone.now()
+        seed_todos(users=5, todos=300, chunk_size=70, workers=1, seed=3, now=now)
+        first = self.rows()
+        Todo.all_objects.all().delete()
+        User.objects.all().delete()
+        seed_todos(users=5, todos=300, chunk_size=70, workers=3, seed=3, now=now)
+        self.assertEqual(len(first), 300)
+        self.assertEqual(self.rows(), first)
+
+
+class TodoEventsTests(APITestCase):
+    def setUp(self):
+        # Revocations outlive the test transaction; user ids do not.
+        caches["default"].clear()
+        hub.clear()
+        get_store().clear()
+        self.user = User.objects.create_user(
+            username="events@test.com", email="events@test.com", password="password123"
+        )
+        self.other = User.objects.create_user(
+            username="other@test.com", email="other@test.com", password="password123"
+        )
+        self.todo = Todo.objects.create(owner=self.user, title="Mine", description="d")
+        self.token = f"Bearer {TodoRefreshToken.for_user(self.user).access_token}"
+        self.client.force_authenticate(user=self.user)
+
+    def poll(self, cursor=None, timeout=0):
+        params = {"timeout": timeout}
+        if cursor:
+            params["cursor"] = cursor
+        response = self.client.get(reverse("todo-events"), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data["events"], response.data["cursor"]
+
+    def test_long_poll_returns_the_changes_after_the_cursor(self):
+        """
+        Test that creates, toggles and deletes reach the owner's long poll once
+        they commit, in order, and no one else's.
+        """
+        self.client.force_authenticate(user=self.other)
+        _, others_cursor = self.poll()
+        self.client.force_authenticate(user=self.user)
+        events, cursor = self.poll()
+        self.assertEqual(events, [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse("todo-list"), {"title": "New", "description": "d"}
+            )
+            new_id = response.data["id"]
+            # Not before the commit.
+            self.assertEqual(self.poll(cursor)[0], [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(reverse("todo-complete-toggle", args=[self.todo.id]))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse("todo-detail", args=[new_id]))
+
+        events, cursor = self.poll(cursor)
+        self.assertEqual(
+            events,
+            [
+                {"type": "created", "ids": [new_id]},
+                {"type": "updated", "ids": [self.todo.id]},
+                {"type": "deleted", "ids": [new_id]},
+            ],
+        )
+        self.assertEqual(self.poll(cursor)[0], [])
+        self.client.force_authenticate(user=self.other)
+        self.assertEqual(self.poll(others_cursor)[0], [])
+
+    def test_token_clients_get_every_kind_of_write(self):
+        """
+        Test that a client authenticated with an access token (not forced) is
+        told about creates, bulk changes, imports and toggles alike.
+        """
+        self.client.force_authenticate(user=None)
+        self.client.credentials(HTTP_AUTHORIZATION=self.token)
+        _, cursor = self.poll()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("todo-list"), {"title": "New", "description": "d"})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("todo-bulk"),
+                {"update": [{"id": self.todo.id, "title": "Bulk"}]},
+                format="json",
+            )
+        upload = SimpleUploadedFile(
+            "todos.ndjson", b'{"title": "Imported", "description": "d"}\n'
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("todo-import"), {"file": upload}, format="multipart")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(reverse("todo-complete-toggle", args=[self.todo.id]))
+
+        events, _ = self.poll(cursor)
+        self.assertEqual(
+            [event["type"] for event in events],
+            ["created", "updated", "created", "updated"],
+        )
+
+    def test_long_poll_waits_for_an_event(self):
+        """
+        Test that a long poll answers as soon as an event is published, and
+        otherwise after its timeout.
+        """
+        _, cursor = self.poll()
+        timer = threading.Timer(
+            0.1, hub.publish, [self.user.pk, [("updated", [self.todo.id])]]
+        )
+        timer.start()
+        self.addCleanup(timer.cancel)
+        began = time.monotonic()
+        events, _ = self.poll(cursor, timeout=10)
+        self.assertLess(time.monotonic() - began, 5)
+        self.assertEqual(events, [{"type": "updated", "ids": [self.todo.id]}])
+
+        began = time.monotonic()
+        self.assertEqual(self.poll(timeout=0.1)[0], [])
+        self.assertGreaterEqual(time.monotonic() - began, 0.1)
+
+    @override_settings(TODO_EVENTS_LONG_POLL_SECONDS=0.1)
+    def test_non_finite_timeouts_use_the_longest_poll(self):
+        """
+        Test that a `nan` or `inf` timeout waits the longest poll allowed,
+        neither forever nor not at all.
+        """
+        for timeout in ["nan", "inf", "-inf"]:
+            began = time.monotonic()
+            self.assertEqual(self.poll(timeout=timeout)[0], [])
+            self.assertGreaterEqual(time.monotonic() - began, 0.1)
+            self.assertLess(time.monotonic() - began, 5)
+
+    @override_settings(TODO_EVENTS_BUFFER=2)
+    def test_clients_that_fall_behind_resync(self):
+        """
+        Test that a client further behind than the buffer, or with a cursor
+        from another process, gets one `resync` event instead of the backlog.
+        """
+        _, cursor = self.poll()
+        for _ in range(3):
+            hub.publish(self.user.pk, [("updated", [self.todo.id])])
+        events, cursor = self.poll(cursor)
+        self.assertEqual(events, [{"type": "resync"}])
+        self.assertEqual(self.poll(cursor)[0], [])
+        self.assertEqual(self.poll("0000.1")[0], [{"type": "resync"}])
+
+    def test_event_stream_without_asgi(self):
+        """
+        Test that outside ASGI an event stream request is answered with one
+        batch of server-sent events, resuming from Last-Event-ID.
+        """
+        _, cursor = self.poll()
+        hub.publish(self.user.pk, [("created", [self.todo.id])])
+        response = self.client.get(
+            reverse("todo-events"),
+            HTTP_ACCEPT="text/event-stream",
+            HTTP_LAST_EVENT_ID=cursor,
+        )
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        _, next_cursor = self.poll(cursor)
+        self.assertEqual(
+            response.content.decode(),
+            "retry: 0\n\n"
+            f"id: {next_cursor}\n"
+            "event: created\n"
+            f'data: {{"type": "created", "ids": [{self.todo.id}]}}\n\n',
+        )
+
+    @override_settings(TODO_EVENTS_HEARTBEAT_SECONDS=0.05)
+    async def test_event_stream_under_asgi(self):
+        """
+        Test that under ASGI the events endpoint streams server-sent events,
+        with heartbeats while there are none.
+        """
+        response = await self.async_client.get(
+            reverse("todo-events"),
+            headers={"Authorization": self.token, "Accept": "text/event-stream"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        chunks = response.streaming_content
+        self.assertEqual(await anext(chunks), b"retry: 1000\n\n")
+        self.assertEqual(await anext(chunks), b": heartbeat\n\n")
+        hub.publish(self.user.pk, [("deleted", [self.todo.id])])
+        chunk = await anext(chunks)
+        self.assertIn(b"event: deleted\n", chunk)
+        self.assertIn(f'"ids": [{self.todo.id}]'.encode(), chunk)
+        await chunks.aclose()
+
+
+@override_settings(TODO_WRITE_MODE="write_behind")
+class TodoWriteBehindTests(APITransactionTestCase):
+    # Not APITestCase: the write-behind thread has a connection of its own,
+    # which only sees committed data.
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="behind@test.com", email="behind@test.com", password="password123"
+        )
+        self.other = User.objects.create_user(
+            username="other@test.com", email="other@test.com", password="password123"
+        )
+        self.todo = Todo.objects.create(owner=self.user, title="Toggle me")
+        self.note = Todo.objects.create(owner=self.user, title="Edit me")
+        self.theirs = Todo.objects.create(owner=self.other, title="Not yours")
+        self.client.force_authenticate(user=self.user)
+
+    def test_batch_is_one_transaction_with_an_update_per_todo(self):
+        """
+        Test that a batch applies its writes in order, gives each its own
+        version, refuses stale and foreign ones, and writes each todo once.
+        """
+        batch = [
+            Write(self.todo.id, self.user.pk, toggle=True),
+            Write(self.todo.id, self.user.pk, toggle=True, version=2),
+            Write(self.todo.id, self.user.pk, toggle=True, version=2),
+            Write(self.note.id, self.user.pk, changes={"title": "Edited"}),
+            Write(self.note.id, self.user.pk, changes={"completed": True}),
+            Write(self.theirs.id, self.user.pk, toggle=True),
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            writebehind.commit(batch)
+
+        results = [write.future.result(0) for write in batch]
+        self.assertEqual(
+            [todo and (todo.completed, todo.version) for todo in results],
+            [(True, 2), (False, 3), None, (False, 2), (True, 3), None],
+        )
+        self.assertEqual(results[3].title, "Edited")
+        updates = [
+            q["sql"] for q in queries.captured_queries
+            if q["sql"].startswith('UPDATE "todo_todo"')
+        ]
+        self.assertEqual(len(updates), 2)
+        self.todo.refresh_from_db()
+        self.note.refresh_from_db()
+        self.assertEqual((self.todo.completed, self.todo.version), (False, 3))
+        self.assertEqual(
+            (self.note.title, self.note.completed, self.note.version), ("Edited", True, 3)
+        )
+        # The stats triggers saw the final states.
+        self.assertEqual(TodoStats.objects.get(owner=self.user).completed, 1)
+        self.assertEqual(Todo.objects.get(pk=self.theirs.pk).version, 1)
+
+    def test_queued_writes_are_coalesced_without_lost_updates(self):
+        """
+        Test that writes queued at once are committed together, each with
+        the next version, and none of them lost.
+        """
+        futures = [
+            write_behind.submit(Write(self.todo.id, self.user.pk, toggle=True))
+            for _ in range(10)
+        ]
+        versions = [writebehind.wait(future).version for future in futures]
+        self.assertEqual(sorted(versions), list(range(2, 12)))
+        self.todo.refresh_from_db()
+        self.assertEqual((self.todo.completed, self.todo.version), (False, 11))
+
+    def test_views_in_write_behind_mode(self):
+        """
+        Test that toggles and edits answer as in direct mode: the new state
+        and ETag, 412 for a stale If-Match and 404 for someone else's todo.
+        """
+        url = f"/todos/{self.todo.id}/complete/"
+        response = self.client.put(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data["completed"])
+        self.assertEqual(response["ETag"], f'"{self.todo.id}.2"')
+
+        stale = {"HTTP_IF_MATCH": f'"{self.todo.id}.1"'}
+        response = self.client.patch(url, {"completed": False}, **stale)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        current = {"HTTP_IF_MATCH": f'"{self.todo.id}.2"'}
+        response = self.client.patch(url, {"completed": False}, **current)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data["completed"])
+
+        response = self.client.put(f"/todos/{self.theirs.id}/complete/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response = self.client.put(
+            f"/todos/{self.note.id}/", {"title": "Renamed", "description": "d"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data,
+            {
+                "id": self.note.id,
+                "title": "Renamed",
+                "description": "d",
+                "completed": False,
+            },
+        )
+        self.assertEqual(response["ETag"], f'"{self.note.id}.2"')
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.title, "Renamed")
+
+    @contextmanager
+    def hold_commits(self):
+        """
+        Make the write-behind thread wait before each commit until the
+        yielded `release` event is set; `started` is set once it waits.
+        """
+        started, release = threading.Event(), threading.Event()
+        commit = writebehind.commit
+
+        def held(batch):
+            started.set()
+            release.wait(5)
+            commit(batch)
+
+        try:
+            with mock.patch.object(writebehind, "commit", side_effect=held):
+                yield started, release
+        finally:
+            release.set()
+
+    @override_settings(TODO_WRITE_BEHIND_TIMEOUT=0.1)
+    def test_timed_out_writes_still_queued_are_dropped(self):
+        """
+        Test that a request whose write is still queued when the timeout
+        fires gets 503, and the write is never applied.
+        """
+        for prefix in ["", "/async"]:
+            with self.hold_commits() as (started, release):
+                busy = write_behind.submit(
+                    Write(self.note.id, self.user.pk, changes={"title": "Busy"})
+                )
+                self.assertTrue(started.wait(5))
+                response = self.client.put(f"{prefix}/todos/{self.todo.id}/complete/")
+                self.assertEqual(
+                    response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE
+                )
+                release.set()
+                writebehind.wait(busy)
+            # Queued after the dropped write, so applied after it was skipped.
+            writebehind.wait(
+                write_behind.submit(Write(self.note.id, self.user.pk, changes={}))
+            )
+            self.todo.refresh_from_db()
+            self.assertEqual((self.todo.completed, self.todo.version), (False, 1))
+
+    @override_settings(TODO_WRITE_BEHIND_TIMEOUT=0.1)
+    def test_timed_out_writes_being_committed_are_waited_for(self):
+        """
+        Test that a request whose write is being committed when the timeout
+        fires waits for the commit and answers with its result.
+        """
+        for prefix, completed in [("", True), ("/async", False)]:
+            with self.hold_commits() as (started, release):
+                timer = threading.Timer(0.3, release.set)
+                timer.start()
+                self.addCleanup(timer.cancel)
+                began = time.monotonic()
+                response = self.client.put(f"{prefix}/todos/{self.todo.id}/complete/")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertGreaterEqual(time.monotonic() - began, 0.3)
+            self.assertEqual(response.data["completed"], completed)
+            self.todo.refresh_from_db()
+            self.assertEqual(self.todo.completed, completed)
+
+
+class TodoMigrationTests(APITransactionTestCase):
+    # Not APITestCase: migrations cannot run inside its per-test transaction.
+
+    def triggers(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger'")
+            return dict(cursor.fetchall())
+
+    def test_migrating_back_installs_that_migrations_triggers(self):
+        """
+        Test that migrating back to the stats tables' migration leaves the
+        triggers it defines, not today's, and that migrating forward again
+        restores today's.
+        """
+        if connection.vendor != "sqlite":
+            self.skipTest("Checks SQLite's triggers.")
+        latest = self.triggers()
+        self.addCleanup(call_command, "migrate", "todo", verbosity=0)
+
+        call_command("migrate", "todo", "0009", verbosity=0)
+        triggers = self.triggers()
+        self.assertIn("todo_stats_au", triggers)
+        self.assertNotIn("todo_stats_soft_delete", triggers)
+        self.assertFalse(any("deleted_at" in sql for sql in triggers.values()))
+
+        call_command("migrate", "todo", verbosity=0)
+        self.assertEqual(self.triggers(), latest)
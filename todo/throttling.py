@@ -0,0 +1,308 @@
+import hashlib
+import mmap
+import os
+import sqlite3
+import struct
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from rest_framework.throttling import (
+    AnonRateThrottle,
+    ScopedRateThrottle,
+    SimpleRateThrottle,
+    UserRateThrottle,
+)
+
+
+def gcra(tat, now, num_requests, duration):
+    """
+    One step of the generic cell rate algorithm. `tat` is the key's
+    theoretical arrival time (None for a new key). Requests are spaced
+    `duration / num_requests` apart, with a burst of up to `num_requests`.
+
+    Returns (allowed, new tat, seconds to wait when not allowed).
+    """
+    interval = duration / num_requests
+    new_tat = max(tat or now, now) + interval
+    if new_tat - now > duration:
+        return False, tat, new_tat - duration - now
+    return True, new_tat, 0.0
+
+
+class MemoryStore:
+    """
+    Per-process store: limits are enforced separately by every worker.
+    """
+
+    def __init__(self, **options):
+        self.lock = threading.Lock()
+        self.state = {}
+        self.calls = 0
+
+    def acquire(self, key, num_requests, duration, now):
+        with self.lock:
+            allowed, tat, wait = gcra(self.state.get(key), now, num_requests, duration)
+            if allowed:
+                self.state[key] = tat
+            self.calls += 1
+            if self.calls % 10000 == 0:
+                # Keys whose tat has passed are back to a full burst anyway.
+                self.state = {k: v for k, v in self.state.items() if v > now}
+            return allowed, wait
+
+    async def aacquire(self, key, num_requests, duration, now):
+        # Only holds the lock for a dict update; fine on the event loop.
+        return self.acquire(key, num_requests, duration, now)
+
+    def clear(self):
+        with self.lock:
+            self.state.clear()
+
+
+class SQLiteStore:
+    """
+    A table in a SQLite file shared by every worker on the host. Each check is
+    one `BEGIN IMMEDIATE` transaction, which SQLite serializes across
+    processes. Durability is traded for speed (WAL, synchronous=OFF): a crash
+    can only forget some throttle state.
+    """
+
+    def __init__(self, path=None, **options):
+        self.path = path or os.path.join(tempfile.gettempdir(), "todo-throttle.sqlite3")
+        self.local = threading.local()
+        self.calls = 0
+
+    @property
+    def connection(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            # Switching to WAL can fail with "database is locked" without
+            # going through the busy timeout while another process is doing
+            # the same, so retry it here.
+            deadline = time.monotonic() + 5
+            while True:
+                try:
+                    connection.execute("PRAGMA journal_mode=WAL")
+                    break
+                except sqlite3.OperationalError:
+                    if time.monotonic() > deadline:
+                        raise
+                    time.sleep(0.01)
+            connection.execute("PRAGMA synchronous=OFF")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS throttle (key TEXT PRIMARY KEY, tat REAL NOT NULL)"
+            )
+            self.local.connection = connection
+        return connection
+
+    def acquire(self, key, num_requests, duration, now):
+        connection = self.connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                "SELECT tat FROM throttle WHERE key = ?", (key,)
+            ).fetchone()
+            allowed, tat, wait = gcra(row and row[0], now, num_requests, duration)
+            if allowed:
+                connection.execute(
+                    "INSERT INTO throttle (key, tat) VALUES (?, ?) "
+                    "ON CONFLICT (key) DO UPDATE SET tat = excluded.tat",
+                    (key, tat),
+                )
+            self.calls += 1
+            if self.calls % 10000 == 0:
+                connection.execute("DELETE FROM throttle WHERE tat <= ?", (now,))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return allowed, wait
+
+    async def aacquire(self, key, num_requests, duration, now):
+        # BEGIN IMMEDIATE may wait on other processes; keep that off the event
+        # loop. Connections are per thread, so any worker thread will do.
+        return await sync_to_async(self.acquire, thread_sensitive=False)(
+            key, num_requests, duration, now
+        )
+
+    def clear(self):
+        self.connection.execute("DELETE FROM throttle")
+
+
+class SharedMemoryStore:
+    """
+    A fixed-size hash table in a memory-mapped file (under /dev/shm where
+    available) shared by every worker on the host, guarded by an exclusive
+    `flock`. Each slot holds an 8-byte key hash and the key's tat. Keys probe
+    a few neighbouring slots; when those are all live the one closest to
+    expiring is evicted, which at worst resets that key's limit.
+    """
+
+    slot = struct.Struct("<Qd")
+    probes = 8
+
+    def __init__(self, path=None, slots=65536, **options):
+        if fcntl is None:
+            raise ImproperlyConfigured("The shared_memory throttle store needs fcntl.")
+        directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+        self.path = path or os.path.join(directory, "todo-throttle")
+        self.slots = slots
+        size = slots * self.slot.size
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self.fd).st_size < size:
+            os.ftruncate(self.fd, size)
+        self.memory = mmap.mmap(self.fd, size)
+        # flock() excludes other processes; threads of this one share the
+        # file description, so they need a lock of their own.
+        self.lock = threading.Lock()
+
+    def key_hash(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "little") | 1  # 0 marks an empty slot
+
+    def acquire(self, key, num_requests, duration, now):
+        key_hash = self.key_hash(key)
+        start = key_hash % self.slots
+        with self.lock:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+            try:
+                target, tat = None, None
+                for i in range(self.probes):
+                    index = (start + i) % self.slots
+                    slot_hash, slot_tat = self.slot.unpack_from(
+                        self.memory, index * self.slot.size
+                    )
+                    if slot_hash == key_hash:
+                        target, tat = index, slot_tat
+                        break
+                    if target is None or slot_tat < victim_tat:
+                        target, victim_tat = index, slot_tat
+
+                allowed, tat, wait = gcra(tat, now, num_requests, duration)
+                if allowed:
+                    self.slot.pack_into(
+                        self.memory, target * self.slot.size, key_hash, tat
+                    )
+                return allowed, wait
+            finally:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    async def aacquire(self, key, num_requests, duration, now):
+        # The lock is only ever held for a few memory reads and writes.
+        return self.acquire(key, num_requests, duration, now)
+
+    def clear(self):
+        with self.lock:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+            try:
+                self.memory[:] = bytes(len(self.memory))
+            finally:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+
+STORES = {
+    "memory": MemoryStore,
+    "sqlite": SQLiteStore,
+    "shared_memory": SharedMemoryStore,
+}
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """
+    The process-wide store configured by `TODO_THROTTLE_STORE`: a name from
+    `STORES` or a dotted path, with `TODO_THROTTLE_STORE_OPTIONS` as keyword
+    arguments.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                name = getattr(settings, "TODO_THROTTLE_STORE", "memory")
+                try:
+                    store_class = STORES.get(name) or import_string(name)
+                except ImportError:
+                    raise ImproperlyConfigured(f"Unknown throttle store {name!r}.")
+                options = getattr(settings, "TODO_THROTTLE_STORE_OPTIONS", {})
+                _store = store_class(**options)
+    return _store
+
+
+@receiver(setting_changed)
+def reset_store(setting, **kwargs):
+    global _store
+    if setting in ("TODO_THROTTLE_STORE", "TODO_THROTTLE_STORE_OPTIONS"):
+        _store = None
+
+
+class GCRARateThrottle(SimpleRateThrottle):
+    """
+    SimpleRateThrottle keeps a list of request timestamps per key, which is
+    read, trimmed and rewritten in full on every request. This keeps a single
+    GCRA timestamp per key instead, updated atomically in the configured
+    store. Combine it with DRF's throttles for their keys and scopes.
+    """
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        allowed, self.retry_after = get_store().acquire(
+            self.key, self.num_requests, self.duration, self.timer()
+        )
+        return allowed
+
+    async def aallow_request(self, request, view):
+        """`allow_request()` for async views."""
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        allowed, self.retry_after = await get_store().aacquire(
+            self.key, self.num_requests, self.duration, self.timer()
+        )
+        return allowed
+
+    def wait(self):
+        return self.retry_after
+
+
+class GCRAAnonRateThrottle(AnonRateThrottle, GCRARateThrottle):
+    pass
+
+
+class GCRAUserRateThrottle(UserRateThrottle, GCRARateThrottle):
+    pass
+
+
+class GCRAScopedRateThrottle(ScopedRateThrottle, GCRARateThrottle):
+    async def aallow_request(self, request, view):
+        # ScopedRateThrottle.allow_request(): the rate depends on the view.
+        self.scope = getattr(view, self.scope_attr, None)
+        if not self.scope:
+            return True
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return await super().aallow_request(request, view)
@@ -0,0 +1,29 @@
+from django.db import transaction
+
+
+class WriteAtomic(transaction.Atomic):
+    """
+    `transaction.atomic()` for blocks that write. On SQLite an outermost
+    block starts with BEGIN IMMEDIATE, taking the write lock up front (and
+    waiting for it up to the busy timeout) instead of failing with "database
+    is locked" when a deferred transaction that has already read tries to
+    write. Read-only blocks keep plain `atomic()`, so they never wait on the
+    writer.
+    """
+
+    def __enter__(self):
+        connection = transaction.get_connection(self.using)
+        if connection.vendor != "sqlite" or connection.in_atomic_block:
+            return super().__enter__()
+        # Connecting resets the mode from the settings.
+        connection.ensure_connection()
+        mode = connection.transaction_mode
+        connection.transaction_mode = "IMMEDIATE"
+        try:
+            return super().__enter__()
+        finally:
+            connection.transaction_mode = mode
+
+
+def write_atomic(using=None):
+    return WriteAtomic(using, savepoint=True, durable=False)
@@ -1,10 +1,17 @@
 from django.urls import path
 
-from . import views
+from . import async_views, views
 
 
 urlpatterns = [
     path("todos/", views.TodoListCreateAPIView.as_view(), name="todo-list"),
+    path("todos/bulk/", views.TodoBulkView.as_view(), name="todo-bulk"),
+    path("todos/export/", views.TodoExportView.as_view(), name="todo-export"),
+    path("todos/import/", views.TodoImportView.as_view(), name="todo-import"),
+    path("todos/changes/", views.TodoChangesView.as_view(), name="todo-changes"),
+    path("todos/stats/", views.TodoStatsView.as_view(), name="todo-stats"),
+    # Async, for both stacks: see the view.
+    path("todos/events/", async_views.TodoEventsView.as_view(), name="todo-events"),
     path(
         "todos/<int:todo_id>/",
         views.TodoRetrieveUpdateDestroyAPIView.as_view(),
@@ -15,4 +22,15 @@ urlpatterns = [
         views.TodoCompletedUpdateView.as_view(),
         name="todo-complete-toggle",
     ),
+    path(
+        "todos/<int:todo_id>/restore/",
+        views.TodoRestoreView.as_view(),
+        name="todo-restore",
+    ),
+    path(
+        "cache/stats/",
+        views.ResponseCacheStatsView.as_view(),
+        name="response-cache-stats",
+    ),
+    path("metrics", views.metrics_view, name="metrics"),
 ]
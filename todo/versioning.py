@@ -0,0 +1,99 @@
+import hashlib
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.http import parse_http_date_safe
+
+from .models import TodoCollectionVersion
+
+
+def bump_collection_version(sender, owner_id, **kwargs):
+    """
+    `todos_changed` receiver: advance the owner's collection version in the
+    same transaction as the write that changed their todos.
+    """
+    now = timezone.now()
+    updated = TodoCollectionVersion.objects.filter(owner_id=owner_id).update(
+        version=F("version") + 1, updated_at=now
+    )
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            TodoCollectionVersion.objects.create(
+                owner_id=owner_id, version=1, updated_at=now
+            )
+    except IntegrityError:
+        # Somebody else created the row first; bump theirs instead.
+        TodoCollectionVersion.objects.filter(owner_id=owner_id).update(
+            version=F("version") + 1, updated_at=now
+        )
+
+
+def get_collection_state(user):
+    """
+    The owner's (version, updated_at). Owners who never wrote anything are
+    at version 0 with no modification time.
+    """
+    state = (
+        TodoCollectionVersion.objects.filter(owner_id=user.pk)
+        .values_list("version", "updated_at")
+        .first()
+    )
+    return state or (0, None)
+
+
+async def aget_collection_state(user):
+    state = await (
+        TodoCollectionVersion.objects.filter(owner_id=user.pk)
+        .values_list("version", "updated_at")
+        .afirst()
+    )
+    return state or (0, None)
+
+
+def normalized_params(request):
+    """
+    The query string as a sorted tuple, without empty parameters, so that
+    equivalent requests share validators and cache entries.
+    """
+    return tuple(
+        (key, tuple(value for value in values if value))
+        for key, values in sorted(request.query_params.lists())
+        if any(values)
+    )
+
+
+def list_etag(request, version, updated_at=None):
+    # The page depends on the query string and, through the pagination links,
+    # on the host the client used. The modification time guards against the
+    # counter going backwards, e.g. after restoring a backup.
+    key = (request.get_host(), normalized_params(request), updated_at)
+    digest = hashlib.sha1(repr(key).encode(), usedforsecurity=False).hexdigest()
+    return f'"L{request.user.pk}.{version}.{digest[:16]}"'
+
+
+def detail_etag(todo, version):
+    return f'"{todo.pk}.{todo.version}.{version}"'
+
+
+def matches_detail_etag(request, todo_id, version):
+    """
+    Whether the client's `If-None-Match` holds an ETag for this todo issued at
+    the current collection version: nothing of the owner's changed since, so
+    the todo did not either.
+    """
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    for etag in header.split(","):
+        parts = etag.strip().removeprefix("W/").strip('"').split(".")
+        if len(parts) == 3 and parts[0] == str(todo_id) and parts[2] == str(version):
+            return True
+    return False
+
+
+def not_modified_since(request, last_modified):
+    since = parse_http_date_safe(request.headers.get("If-Modified-Since", ""))
+    return bool(last_modified and since and last_modified <= since)
@@ -1,49 +1,148 @@
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework import status, generics, permissions
+from django.core import signing
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.crypto import constant_time_compare
+from django.utils.http import http_date
+from rest_framework import status, generics, permissions, serializers
+from rest_framework.fields import empty
+from rest_framework.parsers import MultiPartParser
 from django_filters.rest_framework import DjangoFilterBackend
 from django.contrib.auth.models import User
 from django.contrib.auth import login
-from rest_framework.filters import (
-    SearchFilter,
-    OrderingFilter,
-)
 
-from .models import Todo
+from .models import Todo, TodoWithArchive
 from .serializers import (
     TodoSerializer,
     TodoDetailSerializer,
+    TodoBulkSerializer,
     RegisterSerializer,
     EmailLoginSerializer,
+    todo_rows,
+)
+from .cache import detail_key, response_cache
+from .changes import get_changes, make_token, read_token
+from .export import CSVRenderer, NDJSONRenderer
+from .filters import TodoFilter, TodoWithArchiveFilter
+from .imports import IMPORT_FORMATS, guess_format, import_todos
+from .metrics import CONTENT_TYPE, MetricsMixin, metrics, phase
+from .pagination import KeysetCursorPagination
+from .purge import restorable
+from .search import TodoSearchFilter, TodoOrderingFilter
+from .stats import MAX_DAYS, MAX_WEEKS, get_stats
+from . import writebehind
+from .versioning import (
+    detail_etag,
+    get_collection_state,
+    list_etag,
+    matches_detail_etag,
+    not_modified_since,
 )
-from .filters import TodoFilter
 
 
 # Create your views here.
 ## Todo
-class TodoListCreateAPIView(generics.ListCreateAPIView):
-    # queryset = Todo.objects.all()
-    serializer_class = TodoSerializer
-    filterset_class = TodoFilter
-    permission_classes = [permissions.IsAuthenticated]
-    filter_backends = filter_backends = [
+class TodoQueryMixin:
+    """
+    The todos a user may list (with `?include_archived=true`, archived ones
+    too), and the filter, search and ordering parameters shared by the list
+    and export endpoints.
+    """
+
+    filter_backends = [
         DjangoFilterBackend,
-        SearchFilter,
-        OrderingFilter,
+        TodoSearchFilter,
+        TodoOrderingFilter,
     ]
 
     search_fields = ["title", "description"]
     ordering_fields = ["date_created", "title", "completed"]
     ordering = ["-date_created"]
 
+    @property
+    def include_archived(self):
+        value = self.request.query_params.get("include_archived", "")
+        return value in serializers.BooleanField.TRUE_VALUES
+
+    @property
+    def filterset_class(self):
+        return TodoWithArchiveFilter if self.include_archived else TodoFilter
+
     def get_queryset(self):
+        # `?include_archived=true` reads the view over the todo and archive
+        # tables; the default keeps to the (small) todo table.
+        model = TodoWithArchive if self.include_archived else Todo
         if self.request.user.is_superuser:
-            return Todo.objects.all()
-        return Todo.objects.filter(owner=self.request.user)
+            return model.objects.all()
+        return model.objects.filter(owner_id=self.request.user.pk)
+
+
+class TodoListCreateAPIView(MetricsMixin, TodoQueryMixin, generics.ListCreateAPIView):
+    # queryset = Todo.objects.all()
+    serializer_class = TodoSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        # Superusers see everybody's todos, which no single counter covers.
+        if request.user.is_superuser:
+            return super().get(request, *args, **kwargs)
+
+        version, updated_at = get_collection_state(request.user)
+        etag = list_etag(request, version, updated_at)
+        last_modified = updated_at and int(updated_at.timestamp())
+        not_modified = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if not_modified is not None:
+            return not_modified
+
+        data = response_cache.get("list", etag)
+        if data is not None:
+            response = Response(data)
+        else:
+            response = super().get(request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                response_cache.set("list", etag, response.data)
+        response["ETag"] = etag
+        if last_modified:
+            response["Last-Modified"] = http_date(last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        if not getattr(settings, "TODO_FAST_SERIALIZATION", True):
+            with phase("serialize"):
+                return super().list(request, *args, **kwargs)
+
+        # Fetch only the serialized columns as tuples and render them with the
+        # precompiled row serializer instead of building model instances and
+        # running every DRF field per row.
+        rows = todo_rows.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        with phase("serialize"):
+            data = todo_rows.render(rows if page is None else page)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
 
     def perform_create(self, serializer):
-        serializer.save(owner=self.request.user)
+        serializer.save(owner_id=self.request.user.pk)
+
+    @property
+    def paginator(self):
+        """
+        Page-number pagination by default; keyset pagination when the client
+        opts in with `?pagination=cursor` (or follows a `cursor` link).
+        """
+        if not hasattr(self, "_paginator"):
+            params = self.request.query_params
+            if params.get("pagination") == "cursor" or "cursor" in params:
+                self._paginator = KeysetCursorPagination()
+            else:
+                self._paginator = super().paginator
+        return self._paginator
 
     # NOTE: changed to user generics instead of APIView, so no need to use, as they are built and better.
     # def get(self, request):
@@ -59,53 +158,307 @@ class TodoListCreateAPIView(generics.ListCreateAPIView):
     #     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class TodoRetrieveUpdateDestroyAPIView(APIView):
+class TodoExportView(MetricsMixin, TodoQueryMixin, generics.GenericAPIView):
+    """
+    The whole (filtered, searched, ordered) todo list as NDJSON or CSV, picked
+    with `?format=ndjson|csv` or the Accept header. Rows are read with a
+    chunked iterator and streamed out as they are rendered, so memory use does
+    not grow with the size of the list.
+    """
+
+    serializer_class = TodoSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = [NDJSONRenderer, CSVRenderer]
+    pagination_class = None
+    chunk_size = 2000
+
+    def get(self, request):
+        rows = todo_rows.values(self.filter_queryset(self.get_queryset()))
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream(todo_rows, rows.iterator(chunk_size=self.chunk_size)),
+            content_type=f"{renderer.media_type}; charset={renderer.charset}",
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="todos.{renderer.format}"'
+        )
+        return response
+
+
+class TodoImportView(MetricsMixin, APIView):
+    """
+    Create todos from an uploaded NDJSON or CSV `file` (multipart). The format
+    comes from the `format` form field or the file extension. Valid rows are
+    bulk-created in batches; invalid ones are reported by line number.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        upload = request.data.get("file")
+        if not hasattr(upload, "read"):
+            return Response(
+                {"file": ["No file was submitted."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        format = request.data.get("format") or guess_format(upload.name)
+        if format not in IMPORT_FORMATS:
+            return Response(
+                {"format": [f"Expected one of: {', '.join(IMPORT_FORMATS)}."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        report = import_todos(request.user, upload, format)
+        return Response(report, status=status.HTTP_200_OK)
+
+
+def parse_if_match(request, todo_id):
+    """
+    Return the todo version a client expects from its `If-Match` header: None
+    when there is no precondition, 0 when no listed ETag is for this todo.
+    """
+    header = request.headers.get("If-Match")
+    if not header or header.strip() == "*":
+        return None
+    for etag in header.split(","):
+        # Both the "<id>.<version>" ETags of write responses and the
+        # "<id>.<version>.<collection version>" ones of GET are accepted.
+        parts = etag.strip().removeprefix("W/").strip('"').split(".")
+        if len(parts) >= 2 and parts[0] == str(todo_id) and parts[1].isdigit():
+            return int(parts[1])
+    return 0
+
+
+class TodoRetrieveUpdateDestroyAPIView(MetricsMixin, APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, todo_id):
-        todo = get_object_or_404(Todo, id=todo_id, owner=request.user)
-        serializer = TodoDetailSerializer(todo)
-        return Response(serializer.data)
+        version, updated_at = get_collection_state(request.user)
+        cache_key = detail_key(request.user, todo_id, version, updated_at)
+        cached = response_cache.get("detail", cache_key)
+        if cached is None:
+            # Before any 304: the collection's state says nothing about
+            # whether this id is one of the user's todos.
+            todo = get_object_or_404(Todo, id=todo_id, owner_id=request.user.pk)
+
+        last_modified = updated_at and int(updated_at.timestamp())
+        if matches_detail_etag(request, todo_id, version) or (
+            "If-None-Match" not in request.headers
+            and not_modified_since(request, last_modified)
+        ):
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+
+        if cached is not None:
+            data, etag = cached
+        else:
+            with phase("serialize"):
+                data = TodoDetailSerializer(todo).data
+            etag = detail_etag(todo, version)
+            response_cache.set("detail", cache_key, (data, etag))
+
+        headers = {"ETag": etag}
+        if last_modified:
+            headers["Last-Modified"] = http_date(last_modified)
+        return Response(data, headers=headers)
 
     def put(self, request, todo_id):
-        todo = get_object_or_404(Todo, id=todo_id, owner=request.user)
+        todo = get_object_or_404(Todo, id=todo_id, owner_id=request.user.pk)
         serializer = TodoDetailSerializer(instance=todo, data=request.data)
         if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            if writebehind.enabled():
+                todo = writebehind.update(todo, serializer.validated_data)
+                if todo is None:
+                    raise Http404
+                serializer.instance = todo
+            else:
+                serializer.save()
+            return Response(
+                serializer.data, status=status.HTTP_200_OK, headers={"ETag": todo.etag}
+            )
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def delete(self, request, todo_id):
-        todo = get_object_or_404(Todo, id=todo_id, owner=request.user)
-        todo.delete()
+        todo = get_object_or_404(Todo, id=todo_id, owner_id=request.user.pk)
+        todo.soft_delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class TodoCompletedUpdateView(APIView):
+class TodoRestoreView(MetricsMixin, APIView):
+    """
+    Undo a delete: bring back a todo deleted less than
+    `TODO_DELETE_UNDO_SECONDS` ago.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, todo_id):
+        todo = get_object_or_404(
+            restorable(Todo.all_objects.filter(owner_id=request.user.pk)), id=todo_id
+        )
+        todo.restore()
+        return Response(
+            TodoSerializer(todo).data, status=status.HTTP_200_OK, headers={"ETag": todo.etag}
+        )
+
+
+class TodoCompletedUpdateView(MetricsMixin, APIView):
+    """
+    PUT flips the completion state, PATCH `{"completed": true|false}` sets it.
+    Either way it is one conditional UPDATE, so concurrent toggles never lose
+    updates; send `If-Match: <ETag>` to only apply it to the version you saw.
+    With TODO_WRITE_MODE = "write_behind" the UPDATE is queued and group
+    committed with other writes (todo.writebehind).
+    """
+
     permission_classes = [permissions.IsAuthenticated]
 
     def put(self, request, todo_id):
-        todo = get_object_or_404(Todo, id=todo_id, owner=request.user)
+        return self.set_completed(request, todo_id)
+
+    def patch(self, request, todo_id):
+        field = serializers.BooleanField()
+        try:
+            completed = field.run_validation(request.data.get("completed", empty))
+        except serializers.ValidationError as exc:
+            return Response(
+                {"completed": exc.detail}, status=status.HTTP_400_BAD_REQUEST
+            )
+        return self.set_completed(request, todo_id, completed)
+
+    def set_completed(self, request, todo_id, completed=None):
+        version = parse_if_match(request, todo_id)
+        set_completed = (
+            writebehind.set_completed
+            if writebehind.enabled()
+            else Todo.objects.set_completed
+        )
+        todo = set_completed(todo_id, request.user, completed=completed, version=version)
+        if todo is None:
+            # Only the failure path pays for a second query, to tell a stale
+            # version apart from a todo that does not exist (or is not yours).
+            if version is not None and Todo.objects.filter(
+                id=todo_id, owner_id=request.user.pk
+            ).exists():
+                return Response(status=status.HTTP_412_PRECONDITION_FAILED)
+            raise Http404
 
-        todo.completed = not todo.completed
-        todo.save()
         serializer = TodoSerializer(todo)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(
+            serializer.data, status=status.HTTP_200_OK, headers={"ETag": todo.etag}
+        )
+
+
+class ResponseCacheStatsView(MetricsMixin, APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(response_cache.stats())
+
+
+def metrics_view(request):
+    """
+    This process's request metrics in the Prometheus text format. A plain
+    Django view, so scrapes skip DRF's authentication and throttling; set
+    `TODO_METRICS_TOKEN` to require `Authorization: Bearer <token>`.
+    """
+    token = getattr(settings, "TODO_METRICS_TOKEN", None)
+    if token and not constant_time_compare(
+        request.headers.get("Authorization", ""), f"Bearer {token}"
+    ):
+        return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+    return HttpResponse(metrics.render(), content_type=CONTENT_TYPE)
+
+
+class TodoChangesView(MetricsMixin, APIView):
+    """
+    Delta sync: the todos created, updated or deleted since `?since=<token>`
+    (everything when omitted), plus a token to pass next time.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+    default_limit = 100
+    max_limit = 1000
+
+    def get(self, request):
+        since = None
+        token = request.query_params.get("since")
+        if token:
+            try:
+                since = read_token(request.user, token)
+            except signing.BadSignature:
+                return Response(
+                    {"since": ["Invalid or expired token."]},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+        try:
+            limit = int(request.query_params.get("limit", self.default_limit))
+        except ValueError:
+            limit = self.default_limit
+        limit = min(max(limit, 1), self.max_limit)
+
+        todos, deleted, sequence, has_more = get_changes(request.user, since, limit)
+        return Response(
+            {
+                "changed": todo_rows.render(todos),
+                "deleted": deleted,
+                "token": make_token(request.user, sequence),
+                "has_more": has_more,
+            }
+        )
+
+
+class TodoStatsView(MetricsMixin, APIView):
+    """
+    Todo counts and creation counts per day (`?days=`, default 30) and per
+    week (`?weeks=`, default 12), read from the incrementally maintained
+    summary tables rather than aggregated over the todos.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+    default_days = 30
+    default_weeks = 12
+
+    def get_int(self, name, default, maximum):
+        try:
+            value = int(self.request.query_params.get(name, default))
+        except ValueError:
+            value = default
+        return min(max(value, 1), maximum)
+
+    def get(self, request):
+        days = self.get_int("days", self.default_days, MAX_DAYS)
+        weeks = self.get_int("weeks", self.default_weeks, MAX_WEEKS)
+        return Response(get_stats(request.user, days=days, weeks=weeks))
+
+
+class TodoBulkView(MetricsMixin, APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = TodoBulkSerializer(data=request.data, context={"request": request})
+        if serializer.is_valid():
+            serializer.save()
+            return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 ## User Authentication
-class RegisterView(generics.CreateAPIView):
+class RegisterView(MetricsMixin, generics.CreateAPIView):
     queryset = User.objects.all()
     serializer_class = RegisterSerializer
     permission_classes = [permissions.AllowAny]
 
 
-class EmailLoginView(generics.CreateAPIView):
+class EmailLoginView(MetricsMixin, generics.CreateAPIView):
     permission_classes = [permissions.AllowAny]
     serializer_class = EmailLoginSerializer
 
     def post(self, request, *args, **kwargs):
-        serializer = EmailLoginSerializer(data=request.data)
+        serializer = EmailLoginSerializer(
+            data=request.data, context={"request": request}
+        )
         serializer.is_valid(raise_exception=True)
 
         validated_data = serializer.validated_data
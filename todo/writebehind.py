@@ -0,0 +1,239 @@
+import asyncio
+import copy
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from rest_framework import exceptions
+
+from .models import Todo
+from .signals import batch_todo_changes, notify_todos_changed
+from .transactions import write_atomic
+
+
+def enabled():
+    """Whether the toggle and edit views queue their writes (TODO_WRITE_MODE)."""
+    return getattr(settings, "TODO_WRITE_MODE", "direct") == "write_behind"
+
+
+class Write:
+    """
+    One queued change to a todo: a completion flip (`toggle`) or new field
+    values (`changes`), applied only at `version` when that is given. The
+    request waits on `future` for the todo as this write left it, or None.
+    """
+
+    __slots__ = ("todo_id", "owner_id", "toggle", "changes", "version", "future")
+
+    def __init__(self, todo_id, owner_id, toggle=False, changes=None, version=None):
+        self.todo_id = todo_id
+        self.owner_id = owner_id
+        self.toggle = toggle
+        self.changes = changes or {}
+        self.version = version
+        self.future = Future()
+
+
+class WriteBehindQueue:
+    """
+    Coalesces todo writes into group commits. A background thread takes the
+    writes that arrive within `TODO_WRITE_BEHIND_WINDOW` seconds of each
+    other (at most `TODO_WRITE_BEHIND_MAX_BATCH`) and applies them in one
+    transaction, one UPDATE per todo however many writes it got, so a burst
+    pays for one commit instead of queueing on SQLite's write lock one
+    transaction at a time. Requests are answered once their batch commits.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._pid = None
+
+    def submit(self, write):
+        """Queue `write`; returns its future."""
+        if self._pid != os.getpid() or not self._thread.is_alive():
+            self._start()
+        self._queue.put(write)
+        return write.future
+
+    def _start(self):
+        with self._lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                # Forked: the parent's worker thread does not run here.
+                self._queue = queue.SimpleQueue()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name="todo-write-behind", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            window = getattr(settings, "TODO_WRITE_BEHIND_WINDOW", 0.002)
+            limit = getattr(settings, "TODO_WRITE_BEHIND_MAX_BATCH", 256)
+            deadline = time.monotonic() + window
+            while len(batch) < limit:
+                try:
+                    batch.append(
+                        self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                    )
+                except queue.Empty:
+                    break
+            # Drop the writes whose requests gave up waiting; the rest can no
+            # longer be cancelled.
+            batch = [
+                write for write in batch if write.future.set_running_or_notify_cancel()
+            ]
+            if not batch:
+                continue
+            # This thread's connection outlives requests: recycle it like they do.
+            close_old_connections()
+            commit(batch)
+
+
+def commit(batch):
+    """
+    Apply `batch` in one transaction and resolve the writes' futures once
+    it commits. If the transaction fails, the writes are retried one by one
+    so that one bad write only fails its own request.
+    """
+    try:
+        results = apply(batch)
+    except Exception as exc:
+        if len(batch) == 1:
+            batch[0].future.set_exception(exc)
+            return
+        for write in batch:
+            commit([write])
+        return
+    for write, todo in results:
+        write.future.set_result(todo)
+
+
+def apply(batch):
+    """
+    Run the writes in order against the todos as read at the start of the
+    transaction, then save each todo's final state in one UPDATE. Every
+    write still gets its own version, so ETags and If-Match behave as if the
+    writes had been made one by one. Returns (write, todo or None) pairs.
+    """
+    now = timezone.now()
+    with write_atomic(), batch_todo_changes():
+        todos = (
+            Todo.objects.select_for_update()
+            .order_by()
+            .in_bulk({write.todo_id for write in batch})
+        )
+        results = []
+        # todo id -> the fields its writes changed.
+        changed = defaultdict(set)
+        for write in batch:
+            todo = todos.get(write.todo_id)
+            if (
+                todo is None
+                or todo.owner_id != write.owner_id
+                or write.version is not None and todo.version != write.version
+            ):
+                results.append((write, None))
+                continue
+            if write.toggle:
+                todo.completed = not todo.completed
+                changed[todo.pk].add("completed")
+            for name, value in write.changes.items():
+                setattr(todo, name, value)
+                changed[todo.pk].add(name)
+            todo.version += 1
+            todo.updated_at = now
+            results.append((write, copy.copy(todo)))
+
+        # Grouped by the fields written, so a toggle's UPDATE does not name
+        # the title and description and set off the search index triggers.
+        groups = defaultdict(list)
+        for todo_id, fields in changed.items():
+            groups[frozenset(fields)].append(todos[todo_id])
+        for fields, group in groups.items():
+            Todo.objects.bulk_update(group, [*sorted(fields), "version", "updated_at"])
+
+        updated = defaultdict(list)
+        for todo_id in changed:
+            updated[todos[todo_id].owner_id].append(todo_id)
+        for owner_id, ids in updated.items():
+            notify_todos_changed(Todo, owner_id, updated=ids)
+    return results
+
+
+write_behind = WriteBehindQueue()
+
+
+class WriteTimedOut(exceptions.APIException):
+    status_code = 503
+    default_detail = "The write was not applied in time and has been dropped."
+    default_code = "write_timed_out"
+
+
+def wait(future):
+    """
+    The write's result. After `TODO_WRITE_BEHIND_TIMEOUT` seconds a write
+    still queued is dropped (WriteTimedOut); one already being committed is
+    waited for, so the response never contradicts what was committed.
+    """
+    try:
+        return future.result(getattr(settings, "TODO_WRITE_BEHIND_TIMEOUT", 30))
+    except TimeoutError:
+        if future.cancel():
+            raise WriteTimedOut()
+        return future.result()
+
+
+async def await_result(future):
+    # Shielded: timing out must not cancel a write that is being committed.
+    waiting = asyncio.wrap_future(future)
+    try:
+        return await asyncio.wait_for(
+            asyncio.shield(waiting), getattr(settings, "TODO_WRITE_BEHIND_TIMEOUT", 30)
+        )
+    except TimeoutError:
+        if future.cancel():
+            raise WriteTimedOut()
+        return await waiting
+
+
+def completion_write(todo_id, owner, completed=None, version=None):
+    if completed is None:
+        return Write(todo_id, owner.pk, toggle=True, version=version)
+    return Write(todo_id, owner.pk, changes={"completed": completed}, version=version)
+
+
+def set_completed(todo_id, owner, completed=None, version=None):
+    """`Todo.objects.set_completed()`, through the write-behind queue."""
+    return wait(write_behind.submit(completion_write(todo_id, owner, completed, version)))
+
+
+async def aset_completed(todo_id, owner, completed=None, version=None):
+    return await await_result(
+        write_behind.submit(completion_write(todo_id, owner, completed, version))
+    )
+
+
+def update(todo, changes):
+    """
+    Save `changes` (validated field values) to `todo` through the queue.
+    Returns the todo after the write, or None if it was deleted meanwhile.
+    """
+    return wait(write_behind.submit(Write(todo.pk, todo.owner_id, changes=changes)))
+
+
+async def aupdate(todo, changes):
+    return await await_result(
+        write_behind.submit(Write(todo.pk, todo.owner_id, changes=changes))
+    )
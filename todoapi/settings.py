@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,6 +46,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'todo.middleware.metrics_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -52,6 +54,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'todo.middleware.replica_routing_middleware',
 ]
 
 ROOT_URLCONF = 'todoapi.urls'
@@ -76,14 +79,235 @@ WSGI_APPLICATION = 'todoapi.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+# TODO_SQLITE_PROFILE picks how SQLite is run: "default" (Django's defaults:
+# rollback journal and a new connection per request) or "tuned". "tuned" uses
+# WAL, so readers and the writer no longer block each other; synchronous=NORMAL,
+# which is durable in WAL mode except for the last transactions before a power
+# loss; a busy timeout, so concurrent writers queue for the lock instead of
+# failing with "database is locked"; a bigger page cache and memory-mapped
+# reads; and persistent, health-checked connections. WAL mode is stored in the
+# database file, so "tuned" is opt-in. Either way, transactions stay deferred
+# except on the write paths (todo.transactions.write_atomic).
+
+TODO_SQLITE_BUSY_TIMEOUT = int(os.environ.get('TODO_SQLITE_BUSY_TIMEOUT', 5000))  # ms
+TODO_SQLITE_CACHE_SIZE = int(os.environ.get('TODO_SQLITE_CACHE_SIZE', 64 * 1024))  # KiB
+TODO_SQLITE_MMAP_SIZE = int(os.environ.get('TODO_SQLITE_MMAP_SIZE', 256 * 1024**2))  # bytes
+TODO_SQLITE_CONN_MAX_AGE = int(os.environ.get('TODO_SQLITE_CONN_MAX_AGE', 600))  # s
+
+SQLITE_PROFILES = {
+    'default': {},
+    'tuned': {
+        'OPTIONS': {
+            'init_command': ';'.join([
+                f'PRAGMA busy_timeout={TODO_SQLITE_BUSY_TIMEOUT}',
+                'PRAGMA journal_mode=WAL',
+                'PRAGMA synchronous=NORMAL',
+                f'PRAGMA cache_size=-{TODO_SQLITE_CACHE_SIZE}',
+                f'PRAGMA mmap_size={TODO_SQLITE_MMAP_SIZE}',
+                'PRAGMA temp_store=MEMORY',
+            ]),
+        },
+        'CONN_MAX_AGE': TODO_SQLITE_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+    },
+}
+
+TODO_SQLITE_PROFILE = os.environ.get('TODO_SQLITE_PROFILE', 'default')
 
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        **SQLITE_PROFILES[TODO_SQLITE_PROFILE],
     }
 }
 
+# Read replicas
+# TODO_DATABASE_REPLICAS lists the DATABASES aliases holding copies of the
+# primary ("default"). todo.routers.ReplicaRouter sends the todo app's reads
+# to one of them and pins a user's reads to the primary for
+# TODO_REPLICA_PIN_SECONDS after they change their todos; set it above the
+# replicas' worst lag. TODO_SQLITE_REPLICAS (comma-separated file paths) adds
+# read-only SQLite copies for trying this locally, refreshed from the primary
+# by `manage.py sync_sqlite_replicas`.
+
+TODO_SQLITE_REPLICAS = [
+    path for path in os.environ.get('TODO_SQLITE_REPLICAS', '').split(',') if path
+]
+for number, path in enumerate(TODO_SQLITE_REPLICAS, 1):
+    options = {
+        key: value
+        for key, value in DATABASES['default'].get('OPTIONS', {}).items()
+        if key != 'transaction_mode'
+    }
+    options['init_command'] = ';'.join(
+        filter(None, [options.get('init_command'), 'PRAGMA query_only=ON'])
+    )
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'NAME': path,
+        'OPTIONS': options,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+TODO_DATABASE_REPLICAS = [f'replica{n}' for n in range(1, len(TODO_SQLITE_REPLICAS) + 1)]
+TODO_REPLICA_PIN_SECONDS = int(os.environ.get('TODO_REPLICA_PIN_SECONDS', 5))
+# CACHES alias holding the pins; share it between workers like TODO_AUTH_CACHE.
+TODO_REPLICA_CACHE = 'default'
+
+DATABASE_ROUTERS = ['todo.routers.ReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Serialized todo list/detail responses (see todo/cache.py). Local memory
+    # is per process and evicts least recently used entries first; point this
+    # at a shared backend (file, Memcached, Redis) when running several workers.
+    'todo_responses': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'todo-responses',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+
+if os.environ.get('TODO_RESPONSE_CACHE_DIR'):
+    CACHES['todo_responses'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ['TODO_RESPONSE_CACHE_DIR'],
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    }
+
+# CACHES alias used for todo responses; set to None to disable.
+TODO_RESPONSE_CACHE = 'todo_responses'
+
+# Render todo lists from plain rows instead of model instances + DRF fields.
+TODO_FAST_SERIALIZATION = True
+
+# Deleted todos are only marked deleted, can be restored for this long, and
+# are then removed for good by `manage.py purge_todos` (run it periodically).
+TODO_DELETE_UNDO_SECONDS = int(os.environ.get('TODO_DELETE_UNDO_SECONDS', 7 * 24 * 3600))
+
+# `manage.py archive_todos` moves todos completed longer ago than this out of
+# the todo table; `?include_archived=true` lists them again.
+TODO_ARCHIVE_AFTER_DAYS = int(os.environ.get('TODO_ARCHIVE_AFTER_DAYS', 90))
+
+
+# Authentication
+# Email logins are a case-insensitive point lookup on todo.UserEmail; anything
+# without an "@" falls back to the username (e.g. for the admin).
+
+AUTHENTICATION_BACKENDS = ['todo.backends.EmailBackend']
+
+
+# Password hashing
+# TODO_PASSWORD_HASHER picks the hasher for new passwords: "pbkdf2" (default),
+# "scrypt", "argon2" (needs `pip install argon2-cffi`), or "fast", a cheap
+# MD5 hash meant only for the test suite and load tests (the default under
+# `manage.py test`, see todo.test_runner). Hashes made by the other hashers keep verifying and are
+# re-hashed on the next login. The cost knobs below apply to new hashes.
+
+PASSWORD_HASHER_PROFILES = {
+    'pbkdf2': 'todo.hashers.TunablePBKDF2PasswordHasher',
+    'scrypt': 'todo.hashers.TunableScryptPasswordHasher',
+    'argon2': 'todo.hashers.TunableArgon2PasswordHasher',
+    'fast': 'django.contrib.auth.hashers.MD5PasswordHasher',
+}
+
+TODO_PASSWORD_HASHER = os.environ.get(
+    'TODO_PASSWORD_HASHER', 'pbkdf2'
+)
+
+PASSWORD_HASHERS = [PASSWORD_HASHER_PROFILES[TODO_PASSWORD_HASHER]] + [
+    hasher
+    for profile, hasher in PASSWORD_HASHER_PROFILES.items()
+    if profile not in (TODO_PASSWORD_HASHER, 'fast')
+]
+
+TODO_PBKDF2_ITERATIONS = int(os.environ.get('TODO_PBKDF2_ITERATIONS', 1_000_000))
+TODO_SCRYPT_WORK_FACTOR = int(os.environ.get('TODO_SCRYPT_WORK_FACTOR', 2**14))
+TODO_ARGON2_TIME_COST = int(os.environ.get('TODO_ARGON2_TIME_COST', 2))
+TODO_ARGON2_MEMORY_COST = int(os.environ.get('TODO_ARGON2_MEMORY_COST', 102400))
+
+
+# Metrics
+# Per-route latency, query and cache metrics (todo/metrics.py), served as
+# Prometheus text at /metrics. Set TODO_METRICS_TOKEN to require
+# `Authorization: Bearer <token>` there.
+
+TODO_METRICS_TOKEN = os.environ.get('TODO_METRICS_TOKEN') or None
+
+# The most queries one request to each route may make. Going over logs a
+# warning, or raises todo.metrics.QueryBudgetExceeded when
+# TODO_QUERY_BUDGET_STRICT is on (as under `manage.py test`), so an N+1 query
+# fails the tests.
+# Imports and exports are left out: their query counts grow with the file.
+# Write routes allow for a user's first write, which also creates their
+# collection version row (three more queries).
+TODO_QUERY_BUDGETS = {
+    'todos/': 8,
+    'todos/<int:todo_id>/': 9,
+    'todos/<int:todo_id>/complete/': 8,
+    'todos/<int:todo_id>/restore/': 9,
+    'todos/bulk/': 20,
+    'todos/changes/': 3,
+    'todos/stats/': 2,
+    'todos/events/': 1,
+    'async/todos/': 8,
+    'async/todos/<int:todo_id>/': 9,
+    'async/todos/<int:todo_id>/complete/': 8,
+    'register/': 5,
+    'login/': 10,
+    'refresh/': 1,
+    'async/register/': 5,
+    'async/login/': 9,
+    'async/refresh/': 1,
+}
+TODO_QUERY_BUDGET_STRICT = False
+
+# Turns TODO_QUERY_BUDGET_STRICT on and, unless TODO_PASSWORD_HASHER is set,
+# uses the "fast" hasher.
+TEST_RUNNER = 'todo.test_runner.TodoTestRunner'
+
+
+# Change notifications
+# GET /todos/events/ (todo.events) tells each user's open connections which
+# of their todos changed: a server-sent events stream under ASGI, a long poll
+# otherwise. Events are published in-process, so they only reach connections
+# served by the process that made the write.
+
+TODO_EVENTS_HEARTBEAT_SECONDS = 15
+# Streams close after this long; clients reconnect with Last-Event-ID.
+TODO_EVENTS_STREAM_SECONDS = 300
+TODO_EVENTS_LONG_POLL_SECONDS = 25
+# Events kept per user; a client further behind gets a `resync` event.
+TODO_EVENTS_BUFFER = 100
+TODO_EVENTS_MAX_USERS = 10000
+
+
+# Write-behind
+# "direct": completion toggles and PUT edits each commit their own
+# transaction. "write_behind": they are queued to a background thread that
+# commits the writes arriving within TODO_WRITE_BEHIND_WINDOW seconds of each
+# other in one transaction, one UPDATE per todo (todo.writebehind). Requests
+# still only get their response once that transaction commits.
+TODO_WRITE_MODE = os.environ.get('TODO_WRITE_MODE', 'direct')
+TODO_WRITE_BEHIND_WINDOW = float(os.environ.get('TODO_WRITE_BEHIND_WINDOW', 0.002))
+TODO_WRITE_BEHIND_MAX_BATCH = int(os.environ.get('TODO_WRITE_BEHIND_MAX_BATCH', 256))
+# How long a request waits for its write to be taken up; writes still queued
+# then are dropped (503), ones being committed are waited for.
+TODO_WRITE_BEHIND_TIMEOUT = 30
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -129,7 +353,10 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
         # This tells DRF to use JWT for authentication
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        # Stateless: the user comes from the token's claims, not the database.
+        # Use "rest_framework_simplejwt.authentication.JWTAuthentication" to
+        # load the user on every request instead.
+        "todo.authentication.StatelessJWTAuthentication",
         "rest_framework.authentication.SessionAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
@@ -142,16 +369,35 @@ REST_FRAMEWORK = {
     # --- THROTTLING ---
     "DEFAULT_THROTTLE_CLASSES": [
         # This one is for anonymous users (e.g., login/register)
-        "rest_framework.throttling.AnonRateThrottle",
+        "todo.throttling.GCRAAnonRateThrottle",
         # This one is for logged-in users
-        "rest_framework.throttling.UserRateThrottle",
+        "todo.throttling.GCRAUserRateThrottle",
     ],
     "DEFAULT_THROTTLE_RATES": {
         # Limit for anonymous users
         "anon": "20/minute",
         # Limit for logged-in users
         "user": "1000/day",
+        # Reconnects and long polls to /todos/events/, instead of "user"
+        "events": "120/minute",
     },
 }
 
+# Where throttle state lives: "memory" (per process), "sqlite" (a table in
+# a SQLite file shared by the workers of one host) or "shared_memory" (a
+# memory-mapped table shared the same way), or a dotted path to a store class.
+TODO_THROTTLE_STORE = os.environ.get('TODO_THROTTLE_STORE', 'memory')
+TODO_THROTTLE_STORE_OPTIONS = {}
+if os.environ.get('TODO_THROTTLE_STORE_PATH'):
+    TODO_THROTTLE_STORE_OPTIONS['path'] = os.environ['TODO_THROTTLE_STORE_PATH']
+
+SIMPLE_JWT = {
+    "TOKEN_USER_CLASS": "todo.authentication.LazyTokenUser",
+    "TOKEN_REFRESH_SERIALIZER": "todo.authentication.TodoTokenRefreshSerializer",
+}
+
+# CACHES alias holding revoked-token markers. Use a cache shared by all
+# workers (e.g. Redis or Memcached) when running more than one process.
+TODO_AUTH_CACHE = 'default'
+
 LOGIN_REDIRECT_URL = '/'
\ No newline at end of file
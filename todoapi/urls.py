@@ -24,6 +24,7 @@ from todo.views import RegisterView, EmailLoginView
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("", include("todo.urls")),
+    path("async/", include("todo.async_urls")),
     path("api-auth/", include("rest_framework.urls")),
     path("register/", RegisterView.as_view(), name="user-register"),
     # path("auth/login/", TokenObtainPairView.as_view(), name='token-obtain-pair'),